@@ -0,0 +1,53 @@
+# benchmarks/__init__.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used to run benchmarks and query plan checks.
+Every file ending with _benchmark.py in this folder is a benchmark, it must
+define a `name` and an async `run()` function. A benchmark fails by raising
+an AssertionError.
+"""
+
+import os
+import time
+import importlib
+from src.utils.logging import Logging
+
+logger = Logging(level="DEBUG")
+
+
+async def benchmark(name=None) -> int:
+    """Run all benchmarks (or the one called `name`), return the failure count"""
+    failures = 0
+
+    # Get all benchmarks and sort them by file name
+    benchmark_files = [
+        file
+        for file in os.listdir(os.path.dirname(__file__))
+        if file.endswith("_benchmark.py")
+    ]
+    benchmark_files.sort()
+
+    for file in benchmark_files:
+        module = importlib.import_module(f".{file[:-3]}", "benchmarks")
+
+        # If name is provided, run that benchmark only
+        if name and getattr(module, "name", None) != name:
+            continue
+
+        start_time = time.perf_counter()
+        try:
+            await module.run()
+            logger.log(
+                "info",
+                f"Benchmark {module.name} passed after {time.perf_counter() - start_time:.3f}s.",
+            )
+        except AssertionError as e:
+            failures += 1
+            logger.log("error", f"Benchmark {module.name} failed: {e}")
+        except Exception as e:
+            failures += 1
+            logger.log("error", f"Benchmark {module.name} could not run: {e}")
+
+    return failures
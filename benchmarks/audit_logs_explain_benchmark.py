@@ -0,0 +1,95 @@
+# benchmarks/audit_logs_explain_benchmark.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+EXPLAIN based check that the hot audit_logs queries can use an index.
+Sequential scans are disabled for the check, so a small (or empty) table
+still reports the plan the indexes make possible.
+"""
+
+import json
+from sync.setup import get_db_connection
+from src.utils.logging import Logging
+
+name = "audit_logs_indexes"
+
+logger = Logging(level="DEBUG")
+
+# The hot queries, written the same way the services/ORM build them
+QUERIES = {
+    # ActivityLog: existing log for action_id + record_id + model_name
+    "activity_log": """
+        SELECT id FROM audit_logs
+        WHERE action_id = 3 AND record_id = '1' AND model_name = 'mst_menus'
+    """,
+    # AuditLog.is_trashed correlated EXISTS used by every list endpoint
+    "is_trashed": """
+        SELECT mst_menus.id FROM mst_menus
+        WHERE NOT (EXISTS (
+            SELECT 1 FROM audit_logs
+            WHERE audit_logs.record_id = CAST(mst_menus.id AS VARCHAR)
+            AND audit_logs.action_id = 3
+            AND audit_logs.model_name = 'mst_menus'
+        ))
+    """,
+    # Per-model audit_logs relationship (joinedload)
+    "relationship": """
+        SELECT id FROM audit_logs
+        WHERE record_id = '1' AND model_name = 'mst_menus'
+    """,
+    # AuditLogService.own_activities
+    "own_activities": """
+        SELECT id FROM audit_logs
+        WHERE user_id = 1
+        ORDER BY id DESC
+        LIMIT 10
+    """,
+    # AuditLogService.all keyword filter
+    "model_name_search": """
+        SELECT id FROM audit_logs
+        WHERE model_name ILIKE '%menus%'
+    """,
+}
+
+
+def scans(plan: dict) -> list:
+    """Flatten an EXPLAIN (FORMAT JSON) plan into (node type, relation) tuples"""
+    nodes = [(plan.get("Node Type"), plan.get("Relation Name"))]
+    for child in plan.get("Plans", []):
+        nodes.extend(scans(child))
+    return nodes
+
+
+async def run():
+    connection = await get_db_connection()
+    try:
+        failed = []
+        async with connection.transaction():
+            # Force the planner to show whether an index path exists at all
+            await connection.execute("SET LOCAL enable_seqscan = off")
+
+            for label, query in QUERIES.items():
+                result = await connection.fetchval(f"EXPLAIN (FORMAT JSON) {query}")
+                plan = json.loads(result)[0]["Plan"]
+                nodes = scans(plan)
+
+                # Partitions are named audit_logs_yyyy_mm, so match the prefix
+                seq_scans = [
+                    relation
+                    for node_type, relation in nodes
+                    if node_type == "Seq Scan"
+                    and relation
+                    and relation.startswith("audit_logs")
+                ]
+
+                logger.log(
+                    "debug",
+                    f"{label}: {' -> '.join(node_type for node_type, _ in nodes)}",
+                )
+                if seq_scans:
+                    failed.append(f"{label} ({', '.join(seq_scans)})")
+
+        assert not failed, f"Sequential scan on audit_logs for: {', '.join(failed)}"
+    finally:
+        await connection.close()
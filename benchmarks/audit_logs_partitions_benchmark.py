@@ -0,0 +1,51 @@
+# benchmarks/audit_logs_partitions_benchmark.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+EXPLAIN based check that an actioned_at range on audit_logs is pruned to
+the monthly partitions it covers instead of scanning every partition.
+"""
+
+import json
+from datetime import date
+from sync.setup import get_db_connection
+from sync.partitions import add_months, partition_name
+from src.utils.logging import Logging
+from .audit_logs_explain_benchmark import scans
+
+name = "audit_logs_partitions"
+
+logger = Logging(level="DEBUG")
+
+
+async def run():
+    current_month = date.today().replace(day=1)
+    connection = await get_db_connection()
+    try:
+        # AuditLogService.all with start_date/end_date for the current month
+        result = await connection.fetchval(
+            f"""
+            EXPLAIN (FORMAT JSON)
+            SELECT id FROM audit_logs
+            WHERE actioned_at >= '{current_month.isoformat()}'
+            AND actioned_at < '{add_months(current_month, 1).isoformat()}'
+            ORDER BY id DESC
+            LIMIT 10
+            """
+        )
+        plan = json.loads(result)[0]["Plan"]
+        relations = sorted(
+            {
+                relation
+                for _, relation in scans(plan)
+                if relation and relation.startswith("audit_logs")
+            }
+        )
+
+        logger.log("debug", f"scanned: {', '.join(relations)}")
+        assert relations == [partition_name(current_month)], (
+            f"Expected only {partition_name(current_month)} to be scanned, got {', '.join(relations)}"
+        )
+    finally:
+        await connection.close()
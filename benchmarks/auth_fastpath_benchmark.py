@@ -0,0 +1,73 @@
+# benchmarks/auth_fastpath_benchmark.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+CPU per request of the authentication hot queries (the login lookup, the
+profile and the permission check), through the ORM as the services run them
+with DB_FASTPATH=false, against the raw asyncpg queries of the fast path.
+Only the CPU time of this process is counted (time.process_time), the
+database round trip is the same for both. Needs a seeded database.
+"""
+
+import time
+from src.databases import db
+from src.databases.fastpath import fastpath
+from src.routers import routers  # Maps the models of every module, their relationships cross the modules
+from src.modules.authentications.auth.schemas import AuthSchema
+from src.modules.authentications.auth.services import USER_EXISTS
+from src.utils.dependency import RolePermissionBearer
+from src.utils.logging import Logging
+
+name = "auth_fastpath"
+
+logger = Logging(level="DEBUG")
+
+ROUNDS = 300
+
+
+async def measure(query) -> float:
+    """CPU microseconds per call of `query()`, after a warm up call"""
+    await query()
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        await query()
+    return (time.process_time() - start) / ROUNDS * 1e6
+
+
+async def run():
+    pool = await fastpath.connect()
+    row = await pool.fetchrow(
+        "SELECT u.id, u.email, ur.role_id FROM mst_users u JOIN ref_user_roles ur ON ur.user_id = u.id LIMIT 1"
+    )
+    assert row is not None, "no user with a role, run the seeders first"
+    permission_ids = [1, 2, 3]
+    bearer_statement = RolePermissionBearer(permission_ids=permission_ids).statement(True)
+
+    async with db.session_maker() as session:
+
+        async def orm_user():
+            result = await session.execute(USER_EXISTS, {"email": row["email"]})
+            return AuthSchema(**result.first()._mapping)
+
+        async def orm_permission():
+            result = await session.execute(
+                bearer_statement, {"role_id": row["role_id"], "permissions": permission_ids}
+            )
+            return result.scalar()
+
+        cases = {
+            "user_exists": (orm_user, lambda: fastpath.user_by_email(row["email"])),
+            "profile": (orm_user, lambda: fastpath.user_by_id(row["id"])),
+            "permission": (orm_permission, lambda: fastpath.has_permission(row["role_id"], permission_ids)),
+        }
+
+        try:
+            for label, (orm, fast) in cases.items():
+                orm_us = await measure(orm)
+                fast_us = await measure(fast)
+                logger.log("debug", f"{label}: orm {orm_us:.0f}us cpu, fast path {fast_us:.0f}us cpu per request")
+                assert fast_us < orm_us, f"{label} fast path uses more CPU than the ORM query"
+        finally:
+            await session.rollback()
+            await fastpath.close()
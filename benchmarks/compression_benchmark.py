@@ -0,0 +1,144 @@
+# benchmarks/compression_benchmark.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+Response compression of a list endpoint with nested audit_logs, called
+through CompressionMiddleware as an ASGI app: the compressed size per
+encoding, the time per request when the body is compressed on every
+request against the compressed body served from the ETag cache, the size
+threshold, the 304 on a matching If-None-Match and a streamed response.
+Needs no database.
+"""
+
+import time
+import zlib
+import asyncio
+from datetime import datetime, timedelta
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, StreamingResponse
+from src.midlewares.compression import AVAILABLE, CompressionMiddleware
+from src.utils.logging import Logging
+
+name = "compression"
+
+logger = Logging(level="DEBUG")
+
+ROUNDS = 200
+NOW = datetime(2026, 1, 1)
+# A page of /account-types, 5 audit logs per row (CREATE, UPDATE... with the user and the action)
+PAYLOAD = {
+    "data": [
+        {
+            "id": id,
+            "name": f"Account Type {id}",
+            "audit_logs": [
+                {
+                    "id": id * 10 + log,
+                    "user_id": log + 1,
+                    "action_id": log % 3 + 1,
+                    "record_id": str(id),
+                    "ip_address": f"10.0.{log}.{id % 255}",
+                    "model_name": "mst_account_types",
+                    "notes": f"User user{log + 1}@example.com has performed an action",
+                    "actioned_at": (NOW - timedelta(hours=id * 5 + log)).isoformat(),
+                    "user": {"id": log + 1, "name": f"User {log + 1}", "email": f"user{log + 1}@example.com"},
+                    "action": {"id": log % 3 + 1, "name": ("CREATE", "UPDATE", "DELETE")[log % 3]},
+                }
+                for log in range(5)
+            ],
+        }
+        for id in range(1, 101)
+    ],
+    "page": 1,
+    "per_page": 100,
+    "total": 100,
+}
+
+
+async def endpoint(scope, receive, send):
+    await JSONResponse(PAYLOAD)(scope, receive, send)
+
+
+async def small(scope, receive, send):
+    await JSONResponse({"detail": "ok"})(scope, receive, send)
+
+
+async def stream(scope, receive, send):
+    async def chunks():
+        for row in PAYLOAD["data"]:
+            yield JSONResponse(row).body + b"\n"
+
+    await StreamingResponse(chunks(), media_type="application/json")(scope, receive, send)
+
+
+async def call(app, headers: dict) -> tuple:
+    """(status, headers, body) of a GET through `app`"""
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.Event().wait()  # The client never disconnects, the stream ends first
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "query_string": b"",
+        "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()],
+    }
+    await app(scope, receive, send)
+    return messages[0]["status"], Headers(raw=messages[0]["headers"]), b"".join(m.get("body", b"") for m in messages[1:])
+
+
+async def per_request(app, headers: dict) -> float:
+    await call(app, headers)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await call(app, headers)
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+async def run():
+    identity = JSONResponse(PAYLOAD).body
+    cached = CompressionMiddleware(endpoint, encodings=("gzip",))
+    uncached = CompressionMiddleware(endpoint, encodings=("gzip",), cache_size=0)
+    gzip = {"Accept-Encoding": "gzip"}
+
+    status, headers, body = await call(cached, gzip)
+    assert headers.get("content-encoding") == "gzip", "the list is not compressed"
+    assert zlib.decompress(body, 31) == identity, "the compressed body is not the response"
+    assert len(body) < len(identity) * 0.3, "the list compresses to more than 30%"
+
+    sizes = []
+    for encoding in [encoding for encoding, available in AVAILABLE.items() if available]:
+        _, _, compressed = await call(CompressionMiddleware(endpoint, encodings=(encoding,)), {"Accept-Encoding": encoding})
+        sizes.append(f"{encoding} {len(compressed) / 1024:.1f}kB ({len(compressed) / len(identity):.0%})")
+    logger.log("debug", f"list: {len(identity) / 1024:.1f}kB, {', '.join(sizes)}")
+
+    uncached_us = await per_request(uncached, gzip)
+    cached_us = await per_request(cached, gzip)
+    logger.log(
+        "debug",
+        f"per request: compressed every time {uncached_us:.0f}us, from the ETag cache {cached_us:.0f}us "
+        f"({cached.cache.hits} hits, {cached.cache.used / 1024:.1f}kB cached)",
+    )
+    assert cached_us < uncached_us, "the ETag cache is not faster than compressing"
+
+    status, _, body = await call(cached, {**gzip, "If-None-Match": headers["etag"]})
+    assert status == 304 and body == b"", "a matching If-None-Match is not answered 304"
+
+    _, headers, body = await call(CompressionMiddleware(small), gzip)
+    assert "content-encoding" not in headers and body == JSONResponse({"detail": "ok"}).body, "a small body is compressed"
+
+    _, headers, body = await call(CompressionMiddleware(stream, encodings=("gzip",)), gzip)
+    expected = b"".join(JSONResponse(row).body + b"\n" for row in PAYLOAD["data"])
+    assert headers.get("content-encoding") == "gzip" and zlib.decompress(body, 31) == expected, "the stream is not compressed"
+
+    _, headers, body = await call(cached, {"Accept-Encoding": "identity"})
+    assert "content-encoding" not in headers and body == identity, "a client without gzip gets a compressed body"
@@ -0,0 +1,79 @@
+# benchmarks/jwt_claims_benchmark.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+Authorization header size and decode time of the compact token claims
+(sub, rid, pv, sid) against the former tokens embedding the whole user
+row. Needs no database, both tokens are signed with the configured key.
+"""
+
+import time
+import uuid
+import jwt
+from datetime import datetime, timedelta
+from src.configs import Config
+from src.utils.keys import keyset
+from src.utils.logging import Logging
+
+name = "jwt_claims"
+
+logger = Logging(level="DEBUG")
+
+ROUNDS = 5000
+
+# The AuthSchema row the tokens used to carry (bcrypt hash included)
+USER = {
+    "id": 1,
+    "name": "Administrator",
+    "email": "administrator@example.com",
+    "password": "JDJiJDEyJDZ2Yy5xWm5mQUZNQzBKT3A3Y0NQbGVDRm9iY1pxY1h0QnR2aS5QbkZ0S2V4d0xxVkF1dTJX",
+    "role_id": 1,
+    "role": "Super Admin",
+    "active": True,
+    "last_logged_in": "2024-12-13T08:00:00",
+    "failed_login_attempts": 0,
+}
+
+
+def token(claims: dict) -> str:
+    kid, key = keyset.signing_key()
+    payload = {
+        **claims,
+        "exp": datetime.now() + timedelta(seconds=Config.JWT_EXPIRY),
+        "jti": str(uuid.uuid4()),
+        "sid": str(uuid.uuid4()),
+        "refresh": False,
+    }
+    return jwt.encode(
+        payload, key, Config.JWT_ALGORITHM, headers={"kid": kid} if kid else None
+    )
+
+
+def decode_cost(value: str) -> float:
+    """Average microseconds of one verification"""
+    kid = jwt.get_unverified_header(value).get("kid")
+    key = keyset.verification_key(kid)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        jwt.decode(value, key, algorithms=[Config.JWT_ALGORITHM])
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+async def run():
+    tokens = {
+        "full user row": token({"user": USER}),
+        "compact claims": token({"sub": str(USER["id"]), "rid": USER["role_id"], "pv": [0, 0]}),
+    }
+
+    sizes = {}
+    for label, value in tokens.items():
+        sizes[label] = len(f"Authorization: Bearer {value}")
+        logger.log(
+            "debug",
+            f"{label}: {sizes[label]} header bytes, {decode_cost(value):.1f}us per decode",
+        )
+
+    assert sizes["compact claims"] < sizes["full user row"] / 2, (
+        "Compact claims are not half the size of the full user row"
+    )
@@ -0,0 +1,66 @@
+# benchmarks/jwt_verify_benchmark.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+Token verification cost per algorithm (HS256, RS256, EdDSA), and what
+the key set saves by keeping parsed key objects instead of parsing the
+PEM on every verification. Needs no database, the keys are generated in
+a temporary directory.
+"""
+
+import time
+import tempfile
+import jwt
+from cryptography.hazmat.primitives import serialization
+from src.utils.keys import KeySet
+from src.utils.logging import Logging
+
+name = "jwt_verify"
+
+logger = Logging(level="DEBUG")
+
+ROUNDS = 2000
+PAYLOAD = {"user": {"id": 1, "email": "admin@example.com", "role_id": 1}}
+
+
+def per_call(function) -> float:
+    """Average microseconds of one call"""
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        function()
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+async def run():
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for algorithm in ("HS256", "RS256", "EdDSA"):
+            keys = KeySet(algorithm, directory=f"{directory}/{algorithm}", secret="secret" * 8)
+            if keys.asymmetric:
+                keys.generate()
+
+            kid, key = keys.signing_key()
+            token = jwt.encode(PAYLOAD, key, algorithm, headers={"kid": kid} if kid else None)
+
+            def verify():
+                kid = jwt.get_unverified_header(token).get("kid")
+                jwt.decode(token, keys.verification_key(kid), algorithms=[algorithm])
+
+            results[algorithm] = per_call(verify)
+
+            if keys.asymmetric:
+                assert keys.verification_key(kid) is keys.verification_key(kid), (
+                    f"{algorithm} key is parsed again on every verification"
+                )
+
+                pem = keys.verification_key(kid).public_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PublicFormat.SubjectPublicKeyInfo,
+                )
+                results[f"{algorithm} (PEM per call)"] = per_call(
+                    lambda: jwt.decode(token, pem, algorithms=[algorithm])
+                )
+
+    for label, cost in results.items():
+        logger.log("debug", f"{label}: {cost:.1f}us per verification")
@@ -0,0 +1,58 @@
+# benchmarks/search_explain_benchmark.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+EXPLAIN based check that the keyword search of the list endpoints
+(src/utils/search.py) can use the pg_trgm GIN indexes.
+"""
+
+import json
+from sync.setup import get_db_connection
+from src.utils.logging import Logging
+from .audit_logs_explain_benchmark import scans
+
+name = "search_indexes"
+
+logger = Logging(level="DEBUG")
+
+# (table, column) pairs searched by the services
+COLUMNS = [
+    ("mst_menus", "name"),
+    ("mst_users", "name"),
+    ("mst_users", "email"),
+    ("mst_roles", "name"),
+    ("mst_permissions", "name"),
+    ("mst_actions", "name"),
+    ("mst_account_types", "name"),
+    ("audit_logs", "model_name"),
+]
+
+
+async def run():
+    connection = await get_db_connection()
+    try:
+        failed = []
+        async with connection.transaction():
+            # Force the planner to show whether an index path exists at all
+            await connection.execute("SET LOCAL enable_seqscan = off")
+
+            for table, column in COLUMNS:
+                result = await connection.fetchval(
+                    f"""
+                    EXPLAIN (FORMAT JSON)
+                    SELECT * FROM {table} WHERE {column} ILIKE '%admin%' ESCAPE '/'
+                    """
+                )
+                nodes = scans(json.loads(result)[0]["Plan"])
+
+                logger.log(
+                    "debug",
+                    f"{table}.{column}: {' -> '.join(node_type for node_type, _ in nodes)}",
+                )
+                if any(node_type == "Seq Scan" for node_type, _ in nodes):
+                    failed.append(f"{table}.{column}")
+
+        assert not failed, f"Sequential scan on search for: {', '.join(failed)}"
+    finally:
+        await connection.close()
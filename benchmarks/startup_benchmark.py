@@ -0,0 +1,65 @@
+# benchmarks/startup_benchmark.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+Cold start of the server process, measured like `python -X importtime`:
+the application is imported in a fresh interpreter and the self import
+time is summed per package. Fails when the import exceeds the budget or
+when the server process imports tooling-only packages. Needs no database.
+"""
+
+import sys
+import subprocess
+from collections import defaultdict
+from src.utils.logging import Logging
+
+name = "startup"
+
+logger = Logging(level="DEBUG")
+
+BUDGET = 5.0  # Seconds to import src.main, generous for slow CI machines
+TOP = 15
+# Imported by the tooling (permissions/*.py, templates) only, never at startup
+FORBIDDEN = ("pandas", "openpyxl", "jinja2")
+
+
+def package(module: str) -> str:
+    """src.modules.logs.audit_logs.routers -> src.modules.logs.audit_logs, sqlalchemy.orm -> sqlalchemy"""
+    parts = module.split(".")
+    if parts[0] == "src" and len(parts) > 1:
+        return ".".join(parts[:4] if parts[1] == "modules" else parts[:2])
+    return parts[0]
+
+
+async def run():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import sys, src.main; print('modules:', *sys.modules)"],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr.strip().splitlines()[-1:]
+
+    packages = defaultdict(int)
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = (part.strip() for part in line[len("import time:"):].split("|"))
+        packages[package(module)] += int(self_us)
+        if module == "src.main":
+            total = int(cumulative_us) / 1e6
+
+    for label, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:TOP]:
+        logger.log("debug", f"{label}: {self_us / 1000:.1f}ms")
+    logger.log("debug", f"import src.main: {total:.3f}s")
+
+    loaded = {
+        module
+        for line in result.stdout.splitlines()
+        if line.startswith("modules:")
+        for module in line.split()[1:]
+    }
+    imported = [module for module in FORBIDDEN if module in loaded]
+    assert not imported, f"{', '.join(imported)} imported by the server process"
+    assert total < BUDGET, f"import src.main took {total:.3f}s, the budget is {BUDGET}s"
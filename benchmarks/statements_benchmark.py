@@ -0,0 +1,109 @@
+# benchmarks/statements_benchmark.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+Statement construction and compilation per request of the hot queries
+(BaseService.find with is_trashed, user_exists, the permission check),
+rebuilt on every request as before against the prebuilt statements with
+bindparams. Both go through the compiled cache lookup the engine does on
+execute, the hit rate is the one counted by db.cache_stats. Needs no
+database, the asyncpg dialect compiles without a connection.
+"""
+
+import time
+from sqlalchemy import cast, String
+from sqlalchemy.orm import joinedload
+from sqlalchemy.util import LRUCache
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlmodel import select
+from src.databases.db import engine
+from src.routers import routers  # Maps the models of every module, their relationships cross the modules
+from src.modules.logs.audit_logs.models import AuditLog
+from src.modules.masters.account_types.models import AccountType
+from src.modules.masters.account_types.services import AccountTypeService
+from src.modules.authentications.auth.services import USER_EXISTS
+from src.modules.authentications.roles.models import RolePermission
+from src.utils.dependency import RolePermissionBearer
+from src.utils.logging import Logging
+
+name = "statements"
+
+logger = Logging(level="DEBUG")
+
+ROUNDS = 500
+
+
+def find_rebuilt(id: int):
+    """BaseService.find before the prebuilt statements"""
+    trashed = (
+        select(AuditLog)
+        .filter(
+            AuditLog.record_id == cast(AccountType.id, String),
+            AuditLog.action_id == 3,
+            AuditLog.model_name == AccountType.__tablename__,
+        )
+        .exists()
+        .correlate(AccountType)
+    )
+    return (
+        select(AccountType)
+        .filter(~trashed)
+        .options(
+            joinedload(AccountType.audit_logs),
+            joinedload(AccountType.audit_logs).joinedload(AuditLog.user),
+            joinedload(AccountType.audit_logs).joinedload(AuditLog.action),
+        )
+        .where(AccountType.id == id)
+    )
+
+
+def permission_rebuilt(role_id: int, ids: list):
+    return (
+        select(RolePermission.permission_id)
+        .where(RolePermission.role_id == role_id)
+        .where(RolePermission.permission_id.in_(ids))
+        .limit(1)
+    )
+
+
+def user_rebuilt(email: str):
+    return USER_EXISTS.where(USER_EXISTS.selected_columns.email == email)  # A new construct per call
+
+
+def measure(build) -> tuple:
+    """(microseconds per request, cache hit rate) of building and compiling `build(i)`"""
+    cache = LRUCache(500)
+    hits = 0
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        statement = build(i)
+        _, _, stats = statement._compile_w_cache(
+            engine.dialect, compiled_cache=cache, column_keys=[], for_executemany=False
+        )
+        hits += stats == CacheStats.CACHE_HIT
+    return (time.perf_counter() - start) / ROUNDS * 1e6, hits / ROUNDS
+
+
+async def run():
+    service = AccountTypeService()
+
+    prepared_find = await service.find_query(False)
+    bearer_statement = RolePermissionBearer(permission_ids=[1]).statement(True)
+
+    cases = {
+        "find": (lambda i: find_rebuilt(i), lambda i: prepared_find),
+        "user_exists": (lambda i: user_rebuilt(f"user{i}@mail.com"), lambda i: USER_EXISTS),
+        "permission": (lambda i: permission_rebuilt(i % 5, [1, 2, 3]), lambda i: bearer_statement),
+    }
+
+    for label, (rebuilt, prepared) in cases.items():
+        rebuilt_us, rebuilt_hits = measure(rebuilt)
+        prepared_us, prepared_hits = measure(prepared)
+        logger.log(
+            "debug",
+            f"{label}: rebuilt {rebuilt_us:.1f}us ({rebuilt_hits:.0%} cache hits), "
+            f"prepared {prepared_us:.1f}us ({prepared_hits:.0%} cache hits)",
+        )
+        assert prepared_hits >= 0.99, f"{label} prepared statement misses the compiled cache"
+        assert prepared_us < rebuilt_us, f"{label} prepared statement is not cheaper than rebuilding it"
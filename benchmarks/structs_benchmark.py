@@ -0,0 +1,107 @@
+# benchmarks/structs_benchmark.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+Per request cost of the auth context and of the menu hierarchy response:
+the nested claims dict mutated with the ip address and the Pydantic
+MenuHierarchySchema tree serialized by FastAPI, against the immutable
+structs of src/utils/structs.py encoded directly. Reports the time and the
+memory held or allocated per request (tracemalloc). Needs no database.
+"""
+
+import time
+import tracemalloc
+from types import SimpleNamespace
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from src.utils.structs import AuthContext, encode
+from src.modules.authentications.menus.schemas import MenuHierarchySchema, MenuNode
+from src.utils.logging import Logging
+
+name = "structs"
+
+logger = Logging(level="DEBUG")
+
+ROUNDS = 200
+CLAIMS = {"sub": "1", "rid": 1, "pv": [3, 7], "exp": 1767225600, "jti": "6f1c", "sid": "a93e", "refresh": False}
+# 5 roots x 5 children x 5 grandchildren, the synthetic dataset default
+MENUS = [
+    SimpleNamespace(id=id, parent_id=None if id <= 5 else (id - 6) // 5 + 1, name=f"Menu {id}",
+                    alias=f"menu:{id}", link=f"/menus/{id}", icon="MenuIcon", ordering=id % 5 + 1)
+    for id in range(1, 156)
+]
+
+
+def claims_dict(ip_address: str):
+    """verify_token and the authorization middleware before the structs"""
+    payload = dict(CLAIMS)  # Decoded by jwt.decode
+    payload["user"] = {"id": int(payload["sub"]), "role_id": payload.get("rid")}
+    payload["ip_address"] = ip_address
+    return payload
+
+
+def tree(node, fields: dict):
+    children = {}
+    for menu in MENUS:
+        children.setdefault(menu.parent_id, []).append(menu)
+
+    def build(menu):
+        return node(**{field: getattr(menu, field) for field in fields}, children=[build(child) for child in children.get(menu.id, [])])
+
+    return [build(menu) for menu in children[None]]
+
+
+FIELDS = dict.fromkeys(("id", "parent_id", "name", "alias", "link", "icon", "ordering"))
+
+
+def hierarchy_schema():
+    # response_model serialization of FastAPI: validate, jsonable_encoder, JSONResponse
+    return JSONResponse(jsonable_encoder(tree(MenuHierarchySchema, FIELDS))).body
+
+
+def hierarchy_structs():
+    return encode(tree(MenuNode, FIELDS))
+
+
+def measure(call) -> tuple:
+    """(microseconds per call, bytes held by a result, peak bytes allocated by a call)"""
+    call()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        call()
+    elapsed = (time.perf_counter() - start) / ROUNDS * 1e6
+
+    tracemalloc.start()
+    results = [call() for _ in range(ROUNDS)]
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.clear_traces()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+    return elapsed, held / ROUNDS, peak
+
+
+async def run():
+    assert hierarchy_schema() == hierarchy_structs(), "the structs encode another JSON than the schema"
+
+    # The context lives for the whole request, what counts is the memory it holds
+    before_us, before_held, _ = measure(lambda: claims_dict("10.0.0.1"))
+    after_us, after_held, _ = measure(lambda: AuthContext.from_claims(dict(CLAIMS), "10.0.0.1"))
+    logger.log(
+        "debug",
+        f"auth context: dict {before_us:.1f}us {before_held:.0f}B held, structs {after_us:.1f}us {after_held:.0f}B held",
+    )
+    assert after_held < before_held, "the auth context holds more memory than the claims dict"
+
+    # The tree only lives until it is encoded, what counts is the time and the garbage
+    before_us, _, before_peak = measure(hierarchy_schema)
+    after_us, _, after_peak = measure(hierarchy_structs)
+    logger.log(
+        "debug",
+        f"menu hierarchy ({len(MENUS)} menus): pydantic {before_us:.0f}us {before_peak / 1024:.0f}kB peak, "
+        f"structs {after_us:.0f}us {after_peak / 1024:.0f}kB peak",
+    )
+    assert after_us < before_us, "the structs hierarchy is slower than the schema"
+    assert after_peak < before_peak, "the structs hierarchy allocates more than the schema"
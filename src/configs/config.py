@@ -24,6 +24,17 @@ class Settings(BaseSettings):
     APP_ENV: str = "development"
     APP_HOST: str = "0.0.0.0"
     APP_PORT: str = 8000
+    APP_MODULES: str = ""  # Tags of the modules served (src/routers.py), comma separated, empty serves all
+    STATIC_MAX_AGE: int = 3600  # seconds the browsers cache /docs/*, /static/* and the index page before revalidating
+
+    COMPRESSION: bool = True  # src/midlewares/compression.py
+    COMPRESSION_ENCODINGS: str = "zstd,br,gzip"  # preference order, zstd and br need their optional package
+    COMPRESSION_TYPES: str = "application/json,text/html,text/plain,text/markdown,text/css,application/javascript,image/svg+xml"
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # bytes, smaller bodies are sent as is
+    COMPRESSION_GZIP_LEVEL: int = 6  # 1-9
+    COMPRESSION_BROTLI_QUALITY: int = 4  # 0-11
+    COMPRESSION_ZSTD_LEVEL: int = 3  # 1-22
+    COMPRESSION_CACHE_SIZE: int = 32  # MB of compressed GET bodies kept by ETag
 
     SECRET_KEY: str = "secret"
 
@@ -31,11 +42,24 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRY: int = 3600  # seconds
     JWT_REFRESH_EXPIRY: int = 172800  # seconds / 2 days
+    JWT_KEYS_DIR: str = "storage/keys"  # private keys of RS256/RS384/RS512/EdDSA
+    JWT_KEY_ACTIVATION: int = 300  # seconds a new key is published before it signs
+    JWT_KEYS_RELOAD: int = 60  # seconds between two reads of JWT_KEYS_DIR
+
+    PROFILE_CACHE_TTL: int = 300  # seconds the user profile of the tokens is cached
+    JWT_PERMISSION_BITMAP: bool = False  # carry the permissions in the access token
 
     DB_REDIS_HOST: str = "localhost"
     DB_REDIS_PORT: int = 6379
     DB_REDIS_PASSWORD: str = "secret"
 
+    REVOCATION_FILTER_CAPACITY: int = 100000  # revoked sessions before the error rate grows
+    REVOCATION_FILTER_ERROR_RATE: float = 0.001
+    REVOCATION_SYNC_INTERVAL: int = 60  # seconds between two snapshots
+
+    RATE_LIMIT_ENABLED: bool = True  # policies on src/utils/ratelimit.py
+    LOGIN_FAILURE_WINDOW: int = 900  # seconds the failed logins of a user are counted
+
     DB_SECRET_KEY: str = "secret"
     DB_DRIVER: str = "asyncpg"
     DB_CONNECTION: str = "postgresql"
@@ -46,6 +70,16 @@ class Settings(BaseSettings):
     DB_NAME: str = "db"
     DATABASE_URL: str = ""
 
+    DB_REPLICA_HOSTS: str = ""  # host:port of the read replicas, comma separated
+    DB_REPLICA_RETRY: int = 30  # seconds a failed replica is skipped
+    DB_FASTPATH: bool = True  # asyncpg prepared statements for the auth hot queries (src/databases/fastpath.py)
+    DB_FASTPATH_POOL_SIZE: int = 5
+    DATABASE_REPLICA_URLS: list = []
+
+    AUDIT_LOG_PARTITION_AHEAD: int = 3  # months
+    AUDIT_LOG_RETENTION_MONTHS: int = 12  # 0 keeps everything
+    AUDIT_LOG_ARCHIVE_DIR: str = "storage/archives/audit_logs"
+
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", extra="ignore"
     )
@@ -59,3 +93,8 @@ Config.DB_REDIS_PASSWORD = decrypt_password(
 )
 Config.DB_PASSWORD = decrypt_password(Config.DB_PASSWORD, Config.DB_SECRET_KEY)
 Config.DATABASE_URL = f"{Config.DB_CONNECTION}+{Config.DB_DRIVER}://{Config.DB_USER}:{Config.DB_PASSWORD}@{Config.DB_HOST}:{Config.DB_PORT}/{Config.DB_NAME}"
+Config.DATABASE_REPLICA_URLS = [
+    f"{Config.DB_CONNECTION}+{Config.DB_DRIVER}://{Config.DB_USER}:{Config.DB_PASSWORD}@{host.strip()}/{Config.DB_NAME}"
+    for host in Config.DB_REPLICA_HOSTS.split(",")
+    if host.strip()
+]
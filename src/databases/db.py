@@ -2,11 +2,17 @@
 # -*- coding: utf-8 -*-
 # Copyright 2024 - Ika Raya Sentausa
 
+import time
 import logging
+from itertools import count
+from collections import Counter
+from fastapi import Request
 from fastapi.exceptions import HTTPException
 from sqlmodel import create_engine, SQLModel
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session as SyncSession
+from sqlalchemy.sql import Select
 from src.configs import Config
 from src.utils.logging import Logging
 
@@ -14,6 +20,9 @@ from src.utils.logging import Logging
 logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
 logging.getLogger("sqlalchemy.pool").setLevel(logging.WARNING)
 
+# Request methods whose sessions may read from the replicas
+READ_METHODS = ("GET", "HEAD")
+
 # Create engine
 engine = AsyncEngine(
     create_engine(
@@ -22,12 +31,129 @@ engine = AsyncEngine(
     )
 )
 
-Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+class CacheStats:
+    """
+    Compiled cache lookups of the executed statements (hit, miss, no key...),
+    counted per engine. A statement rebuilt with different literals, or one
+    without a cache key, shows up as misses.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def listen(self, engine: AsyncEngine):
+        event.listen(engine.sync_engine, "before_cursor_execute", self.count)
+
+    def count(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None and context.compiled is not None:
+            self.counts[context.cache_hit.name.lower()] += 1
+
+    def ratio(self) -> float:
+        total = sum(self.counts.values())
+        return self.counts["cache_hit"] / total if total else 0.0
+
+    def metrics(self) -> dict:
+        return {"counts": dict(self.counts), "hit_ratio": self.ratio()}
+
+
+cache_stats = CacheStats()
+cache_stats.listen(engine)
+
+
+class Replicas:
+    """
+    Read replicas picked round-robin. A replica that fails to connect (or
+    drops its connection) is skipped for DB_REPLICA_RETRY seconds, then
+    tried again. Without healthy replicas the reads go to the primary.
+    """
+
+    def __init__(self, urls: list, retry: int = 30):
+        self.engines = [
+            AsyncEngine(create_engine(url=url, echo=False, pool_pre_ping=True))
+            for url in urls
+        ]
+        self.retry = retry
+        self.down = {}  # {engine index: retry at}
+        self.cursor = count()
+        self.logger = Logging(level="DEBUG")
+
+        for index, replica in enumerate(self.engines):
+            event.listen(replica.sync_engine, "do_connect", self.on_connect(index))
+            event.listen(replica.sync_engine, "handle_error", self.on_error(index))
+            cache_stats.listen(replica)
+
+    def on_connect(self, index: int):
+        def do_connect(dialect, connection_record, cargs, cparams):
+            try:
+                return dialect.connect(*cargs, **cparams)
+            except Exception as e:
+                self.mark_down(index, e)
+                raise
+
+        return do_connect
+
+    def on_error(self, index: int):
+        def handle_error(context):
+            # A replica that drops its connections is skipped as well
+            if context.is_disconnect:
+                self.mark_down(index, context.original_exception)
+
+        return handle_error
+
+    def mark_down(self, index: int, error=None):
+        self.down[index] = time.monotonic() + self.retry
+        self.logger.log(
+            "error", f"Replica {index} is unavailable for {self.retry}s: {error}"
+        )
+
+    def choose(self):
+        """Next healthy replica, None when every replica is down"""
+        now = time.monotonic()
+        for _ in range(len(self.engines)):
+            index = next(self.cursor) % len(self.engines)
+            if self.down.get(index, 0) <= now:
+                self.down.pop(index, None)
+                return self.engines[index]
+        return None
+
+
+replicas = Replicas(Config.DATABASE_REPLICA_URLS, Config.DB_REPLICA_RETRY)
+
+
+class RoutingSession(SyncSession):
+    """
+    Send the SELECTs of read-only sessions (GET/HEAD requests) to a replica,
+    everything else to the primary. Once a session flushes or executes a
+    write it stays on the primary, so a request reads its own writes.
+    Set session.info["primary"] = True to force the primary for a session.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or (clause is not None and not isinstance(clause, Select)):
+            # Writes (and raw statements) always go to the primary
+            self.info["primary"] = True
+
+        if self.info.get("read_only") and not self.info.get("primary"):
+            # A session sticks to one replica, its reads share a snapshot
+            replica = self.info.get("replica") or replicas.choose()
+            if replica is not None:
+                self.info["replica"] = replica
+                return replica.sync_engine
+
+        return engine.sync_engine
+
+
+Session = sessionmaker(
+    class_=AsyncSession, sync_session_class=RoutingSession, expire_on_commit=False
+)
 
 
 class Database:
     def __init__(self):
         self.engine = engine
+        self.replicas = replicas
+        self.cache_stats = cache_stats
         self.session_maker = Session
 
     # for checking the connection
@@ -41,12 +167,19 @@ class Database:
             )
 
     # for getting the session
-    async def session(self) -> AsyncSession:
+    async def session(self, request: Request) -> AsyncSession:
         # try:
         async with self.session_maker() as session:
+            # Reads of GET/HEAD requests may be served by a replica
+            session.info["read_only"] = request.method in READ_METHODS
             try:
                 yield session
             finally:
                 await session.close()
         # except Exception as e:
         #     raise HTTPException(status_code=500, detail=f"Failed to get session: {e}")
+
+    # for reading your own writes in a read-only session
+    def use_primary(self, session: AsyncSession) -> AsyncSession:
+        session.info["primary"] = True
+        return session
@@ -0,0 +1,107 @@
+# src/databases/fastpath.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used as a thin data access layer for the few queries that
+run on (almost) every request: the permission check, the profile of the
+token user (/auth/me, activity logs) and the login lookup by email.
+They bypass the ORM, asyncpg runs them as prepared statements (cached per
+connection) on a small pool of the primary, and the rows come back as
+compact __slots__ records instead of hydrated models. CRUD keeps the ORM.
+Disable it with DB_FASTPATH=false, the services then use the ORM queries.
+"""
+
+import asyncio
+import asyncpg
+from src.configs import Config
+
+PERMISSION_BY_IDS = """
+    SELECT 1 FROM ref_role_permissions
+    WHERE role_id = $1 AND permission_id = ANY($2::bigint[])
+    LIMIT 1
+"""
+
+PERMISSION_BY_NAMES = """
+    SELECT 1 FROM ref_role_permissions rp
+    JOIN mst_permissions p ON p.id = rp.permission_id
+    WHERE rp.role_id = $1 AND p.name = ANY($2::text[])
+    LIMIT 1
+"""
+
+USER = """
+    SELECT u.id, u.name, u.email, u.password, r.id AS role_id, r.name AS role,
+        u.active, u.last_logged_in, u.failed_login_attempts
+    FROM mst_users u
+    JOIN ref_user_roles ur ON ur.user_id = u.id
+    JOIN mst_roles r ON r.id = ur.role_id
+    WHERE {condition}
+    LIMIT 1
+"""
+
+
+class Record:
+    """Row with attribute access and dict(), without per instance __dict__"""
+
+    __slots__ = ()
+
+    def __init__(self, row):
+        for name, value in zip(self.__slots__, row):
+            setattr(self, name, value)
+
+    def dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class UserRecord(Record):
+    __slots__ = (
+        "id",
+        "name",
+        "email",
+        "password",
+        "role_id",
+        "role",
+        "active",
+        "last_logged_in",
+        "failed_login_attempts",
+    )
+
+
+class FastPath:
+    def __init__(self, url: str, size: int = 5):
+        self.url = url.replace("+asyncpg", "")
+        self.size = size
+        self.pool = None
+        self.lock = None
+
+    async def connect(self) -> asyncpg.Pool:
+        # Created by the startup (or the first query) in the event loop of the server
+        if self.pool is None:
+            self.lock = self.lock or asyncio.Lock()
+            async with self.lock:
+                if self.pool is None:
+                    self.pool = await asyncpg.create_pool(self.url, min_size=1, max_size=self.size)
+        return self.pool
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def has_permission(self, role_id: int, permissions: list, by_ids: bool = True) -> bool:
+        pool = await self.connect()
+        query = PERMISSION_BY_IDS if by_ids else PERMISSION_BY_NAMES
+        return await pool.fetchval(query, role_id, list(permissions)) is not None
+
+    async def user_by_email(self, email: str):
+        pool = await self.connect()
+        row = await pool.fetchrow(USER.format(condition="u.email = $1"), email)
+        return UserRecord(row) if row is not None else None
+
+    async def user_by_id(self, user_id: int):
+        pool = await self.connect()
+        row = await pool.fetchrow(USER.format(condition="u.id = $1"), user_id)
+        return UserRecord(row) if row is not None else None
+
+
+fastpath = FastPath(Config.DATABASE_URL, Config.DB_FASTPATH_POOL_SIZE)
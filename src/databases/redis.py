@@ -2,32 +2,322 @@
 # -*- coding: utf-8 -*-
 # Copyright 2024 - Ika Raya Sentausa
 
+"""
+This module is used to store the login sessions in Redis.
+A login creates a session family, one small hash `session:{sid}` holding
+the user, the jti of the current refresh token and the user epoch. Every
+token of the login carries the sid, so logging out deletes one key and
+"log out everywhere" increments `user_epoch:{user_id}`, both O(1)
+whatever the number of issued tokens.
+
+Revocations are also recorded in the `revocations` sorted set and
+published on the `revocations` channel. Every process keeps a bloom
+filter of them (RevocationFilter), so the tokens of sessions that were
+never revoked, almost all of them, are accepted without a Redis call.
+"""
+
+import time
+import json
 import redis
+import redis.asyncio
+import threading
+from datetime import datetime
+from fastapi.exceptions import HTTPException
 from src.configs import Config
+from src.utils.bloom import BloomFilter
+from src.utils.logging import Logging
+from src.utils.structs import AuthContext
 
-JTI_EXPIRY = 3600
+SESSION_EXPIRY = Config.JWT_REFRESH_EXPIRY  # A family lives as long as its refresh token
+REVOCATIONS = "revocations"  # Sorted set {item: expires at} and pub/sub channel
+PERMISSION_VERSION = "permission_version"  # Bumped by mst_permissions changes, :role:{id} and :user:{id} by the grants
+
+client = redis.Redis(
+    host=Config.DB_REDIS_HOST,
+    port=Config.DB_REDIS_PORT,
+    db=0,
+    decode_responses=True,
+)
 
-token_blocklist = redis.Redis(
+# The asyncio client of the calls made on every request of a route (rate
+# limits, login attempts), they don't block the event loop
+aclient = redis.asyncio.Redis(
     host=Config.DB_REDIS_HOST,
     port=Config.DB_REDIS_PORT,
     db=0,
     decode_responses=True,
 )
 
+# Compare-and-set of the refresh jti, 1 rotated, 0 revoked, -1 reused.
+# Presenting an already rotated refresh token revokes the whole family.
+ROTATE_SESSION = client.register_script(
+    """
+    local session = redis.call('HMGET', KEYS[1], 'refresh', 'epoch')
+    if not session[1] then
+        return 0
+    end
+    if session[2] ~= (redis.call('GET', KEYS[2]) or '0') then
+        redis.call('DEL', KEYS[1])
+        return 0
+    end
+    if session[1] ~= ARGV[1] then
+        redis.call('DEL', KEYS[1])
+        return -1
+    end
+    redis.call('HSET', KEYS[1], 'refresh', ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return 1
+    """
+)
+
+
+class RevocationFilter:
+    """
+    Bloom filter of the revoked items (`sid:{sid}` and `user:{user_id}`).
+    A daemon thread loads a snapshot of the `revocations` set, adds the
+    published revocations as they come and rebuilds the filter every
+    REVOCATION_SYNC_INTERVAL seconds, dropping the expired items. While
+    the thread is not synchronized every check falls through to Redis.
+    """
+
+    def __init__(
+        self, capacity: int = 100000, error_rate: float = 0.001, interval: int = 60
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.interval = interval
+        self.filter = BloomFilter(capacity, error_rate)
+        self.logger = Logging(level="DEBUG")
+        self.thread = None
+        self.running = False
+        self.synced_at = 0.0  # monotonic time of the last snapshot
+        self.lag = 0.0  # seconds between the last publish and its receipt
+        self.skipped = 0  # checks answered by the filter
+        self.hits = 0  # checks passed to Redis
+        self.false_positives = 0  # hits Redis found active
+
+    def start(self) -> None:
+        if self.thread is None:
+            self.running = True
+            self.thread = threading.Thread(
+                target=self.listen, name="revocation-filter", daemon=True
+            )
+            self.thread.start()
+
+    def stop(self) -> None:
+        self.running = False
+        self.synced_at = 0.0
+
+    def listen(self) -> None:
+        while self.running:
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(REVOCATIONS)
+                # Snapshot after subscribing, so no revocation is missed
+                self.snapshot()
+
+                while self.running:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message:
+                        item, published_at = message["data"].rsplit(" ", 1)
+                        self.filter.add(item)
+                        self.lag = max(0.0, time.time() - float(published_at))
+
+                    if time.monotonic() - self.synced_at >= self.interval:
+                        self.snapshot()
+
+                pubsub.close()
+            except Exception as e:
+                self.synced_at = 0.0
+                self.logger.log("error", f"Revocation filter sync failed: {e}")
+                time.sleep(1)
+
+        self.thread = None
+
+    def snapshot(self) -> None:
+        client.zremrangebyscore(REVOCATIONS, "-inf", time.time())
+        items = client.zrange(REVOCATIONS, 0, -1)
+
+        revoked = BloomFilter(max(self.capacity, len(items) * 2), self.error_rate)
+        for item in items:
+            revoked.add(item)
+
+        self.filter = revoked
+        self.synced_at = time.monotonic()
+
+    def synced(self) -> bool:
+        return (
+            self.synced_at > 0
+            and time.monotonic() - self.synced_at < self.interval * 2
+        )
+
+    def may_contain(self, *items: str) -> bool:
+        """False only when none of the items can have been revoked"""
+        if not self.synced():
+            return True
+
+        if any(item in self.filter for item in items):
+            self.hits += 1
+            return True
+
+        self.skipped += 1
+        return False
+
+    def metrics(self) -> dict:
+        negatives = self.skipped + self.false_positives
+        return {
+            "synced": self.synced(),
+            "items": self.filter.count,
+            "skipped": self.skipped,
+            "hits": self.hits,
+            "false_positives": self.false_positives,
+            "false_positive_rate": self.false_positives / negatives if negatives else 0.0,
+            "estimated_false_positive_rate": self.filter.estimated_error_rate(),
+            "snapshot_age": time.monotonic() - self.synced_at if self.synced_at else None,
+            "sync_lag": self.lag,
+        }
+
+
+revocation_filter = RevocationFilter(
+    Config.REVOCATION_FILTER_CAPACITY,
+    Config.REVOCATION_FILTER_ERROR_RATE,
+    Config.REVOCATION_SYNC_INTERVAL,
+)
+
 
 class RedisDB:
-    async def add_jti_to_blocklist(self, jti: str) -> None:
-        token_blocklist.set(jti, "", ex=JTI_EXPIRY)
+    def session_key(self, sid: str) -> str:
+        return f"session:{sid}"
+
+    def epoch_key(self, user_id: int) -> str:
+        return f"user_epoch:{user_id}"
+
+    async def create_session(
+        self, sid: str, user_id: int, refresh_jti: str, ip_address: str = None
+    ) -> None:
+        epoch = client.get(self.epoch_key(user_id)) or "0"
+        pipe = client.pipeline()
+        pipe.hset(
+            self.session_key(sid),
+            mapping={
+                "user_id": user_id,
+                "refresh": refresh_jti,
+                "epoch": epoch,
+                "ip_address": ip_address or "",
+                "created_at": datetime.now().isoformat(),
+            },
+        )
+        pipe.expire(self.session_key(sid), SESSION_EXPIRY)
+        pipe.execute()
+
+    async def rotate_session(
+        self, sid: str, user_id: int, refresh_jti: str, new_refresh_jti: str
+    ) -> int:
+        rotated = ROTATE_SESSION(
+            keys=[self.session_key(sid), self.epoch_key(user_id)],
+            args=[refresh_jti, new_refresh_jti, SESSION_EXPIRY],
+        )
+        if rotated < 1:
+            # The script deleted the session, let the other processes know
+            await self.revoke_session(sid)
+        return rotated
+
+    async def session_active(self, token: AuthContext) -> bool:
+        """The session of the token exists and the user did not log out everywhere"""
+        sid = token.sid
+        if sid is None:
+            return False
+
+        user_id = token.user.id
+        if not revocation_filter.may_contain(f"sid:{sid}", f"user:{user_id}"):
+            return True
+
+        pipe = client.pipeline(transaction=False)
+        pipe.hmget(self.session_key(sid), "user_id", "epoch")
+        pipe.get(self.epoch_key(user_id))
+        (session_user_id, epoch), user_epoch = pipe.execute()
+
+        active = session_user_id == str(user_id) and epoch == (user_epoch or "0")
+        if active and revocation_filter.synced():
+            revocation_filter.false_positives += 1
+        return active
+
+    def revoke(self, pipe, item: str) -> None:
+        """Record a revocation until the tokens it covers expire, then publish it"""
+        now = time.time()
+        pipe.zadd(REVOCATIONS, {item: now + SESSION_EXPIRY})
+        pipe.publish(REVOCATIONS, f"{item} {now}")
+
+    async def revoke_session(self, sid: str) -> None:
+        pipe = client.pipeline()
+        pipe.delete(self.session_key(sid))
+        self.revoke(pipe, f"sid:{sid}")
+        pipe.execute()
+
+    async def revoke_user_sessions(self, user_id: int) -> None:
+        pipe = client.pipeline()
+        pipe.incr(self.epoch_key(user_id))
+        self.revoke(pipe, f"user:{user_id}")
+        pipe.execute()
+
+    async def get_profile(self, user_id: int):
+        profile = client.get(f"profile:{user_id}")
+        return json.loads(profile) if profile else None
+
+    async def set_profile(self, user_id: int, profile: dict) -> None:
+        client.set(f"profile:{user_id}", json.dumps(profile), ex=Config.PROFILE_CACHE_TTL)
+
+    async def forget_profile(self, user_id: int) -> None:
+        client.delete(f"profile:{user_id}")
+
+    async def permission_versions(self, role_id: int, user_id: int) -> list:
+        """
+        [permissions, role, user] versions. The first one changes with
+        mst_permissions (the bits of the names), the others with the grants
+        of the role and of the user, so a grant only outdates their tokens.
+        """
+        versions = client.mget(
+            PERMISSION_VERSION,
+            f"{PERMISSION_VERSION}:role:{role_id}",
+            f"{PERMISSION_VERSION}:user:{user_id}",
+        )
+        return [int(version or 0) for version in versions]
+
+    async def bump_permission_version(self, role_id: int = None, user_id: int = None) -> None:
+        """Bump the version of the role and/or the user, of mst_permissions without both"""
+        if role_id is None and user_id is None:
+            client.incr(PERMISSION_VERSION)
+            return
+
+        pipe = client.pipeline()
+        if role_id is not None:
+            pipe.incr(f"{PERMISSION_VERSION}:role:{role_id}")
+        if user_id is not None:
+            pipe.incr(f"{PERMISSION_VERSION}:user:{user_id}")
+        pipe.execute()
+
+    async def login_attempt(self, user_id: int) -> int:
+        """
+        Count a login attempt before its password is checked and return the
+        count, cleared by a successful login. INCR is atomic, concurrent
+        attempts get distinct counts. The counter expires LOGIN_FAILURE_WINDOW
+        after the last attempt.
+        """
+        async with aclient.pipeline() as pipe:
+            pipe.incr(f"login_failures:{user_id}")
+            pipe.expire(f"login_failures:{user_id}", Config.LOGIN_FAILURE_WINDOW)
+            fails, _ = await pipe.execute()
+        return fails
 
-    async def token_in_blocklist(self, jti: str) -> bool:
-        return token_blocklist.get(jti) is not None
+    async def clear_login_failures(self, user_id: int) -> None:
+        await aclient.delete(f"login_failures:{user_id}")
 
-    async def clear_blocklist(self) -> None:
-        token_blocklist.flushdb()
+    async def clear_sessions(self) -> None:
+        client.flushdb()
 
     async def is_connected(self) -> bool:
         try:
-            token_blocklist.ping()
+            client.ping()
             return True
         except redis.ConnectionError:
             return False
@@ -2,15 +2,17 @@
 # -*- coding: utf-8 -*-
 # Copyright 2024 - Ika Raya Sentausa
 
-import os
+from functools import lru_cache
 from fastapi import FastAPI, HTTPException
-from fastapi.templating import Jinja2Templates
 from fastapi.requests import Request
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse
 from src.routers import routers
 from src.startup import on_startup, on_shutdown
 from .utils.errors import register_all_errors
 from .midlewares.middleware import Middleware
+from .utils.keys import keyset
+from .utils.static import ASSETS, Assets, Page
+from .configs import Config
 
 version = "v1"
 
@@ -23,8 +25,26 @@ app = FastAPI(
     redoc_url=f"/redoc",
 )
 
-# Setup Jinja2Templates
-templates = Jinja2Templates(directory="templates")
+@lru_cache
+def landing() -> Page:
+    """
+    The index page, rendered once by the startup (jinja2 stays out of the
+    import of the app) and served from memory with its compressed bodies.
+    """
+    from fastapi.templating import Jinja2Templates
+
+    data = {
+        "title": "Welcome to FastAPI",
+        "description": "FastAPI is a modern, fast (high-performance), web framework for building APIs with Python 3.6+ based on standard Python type hints.",
+        "fastapi": "https://fastapi.tiangolo.com",
+        "docs": f"/docs",
+        "redoc": f"/redoc",
+        "convention_id": "/docs/convention-id.md",
+        "convention_en": "/docs/convention-en.md",
+        "by": "Ika Raya Sentausa",
+    }
+    html = Jinja2Templates(directory="templates").get_template("index.html").render(data=data)
+    return Page(html.encode("utf-8"), max_age=Config.STATIC_MAX_AGE)
 
 # Register middleware
 middleware = Middleware(app, parent_url=f"/api/{version}")
@@ -33,34 +53,31 @@ middleware.register_middleware()
 # Register all errors
 register_all_errors(app)
 
+# Static files, the gzip/br variants are written by `python madhai --static`
+docs = Assets("docs", ASSETS["docs"], Config.STATIC_MAX_AGE)
+assets = Assets("templates", ASSETS["templates"], Config.STATIC_MAX_AGE)
+app.mount("/docs", docs, name="docs")  # After the Swagger UI routes, /docs itself stays theirs
+app.mount("/static", assets, name="static")
+
+
 @app.get("/favicon.ico")
-async def favicon():
-    return FileResponse("templates/fastapi.svg")
+async def favicon(request: Request):
+    return await assets.get_response("fastapi.svg", request.scope)
 
 
 @app.get("/")
 async def root(request: Request):
-    data = {
-        "request": request,
-        "title": "Welcome to FastAPI",
-        "description": "FastAPI is a modern, fast (high-performance), web framework for building APIs with Python 3.6+ based on standard Python type hints.",
-        "fastapi": "https://fastapi.tiangolo.com",
-        "docs": f"/docs",
-        "redoc": f"/redoc",
-        "convention_id": "/docs/convention-id.md",
-        "convention_en": "/docs/convention-en.md",
-        "by": "Ika Raya Sentausa",
-    }
-    return templates.TemplateResponse("index.html", {"request": request, "data": data})
+    return landing().response(request)
+
 
+@app.get("/.well-known/jwks.json")
+async def jwks():
+    # Public keys verifying our tokens, consumers may cache them until the next reload
+    return JSONResponse(
+        content=keyset.jwks(),
+        headers={"Cache-Control": f"public, max-age={Config.JWT_KEYS_RELOAD}"},
+    )
 
-@app.get("/docs/{filename}")
-async def get_docs(filename: str):
-    file_path = f"docs/{filename}"
-    if os.path.exists(file_path):
-        return FileResponse(file_path)
-    else:
-        raise HTTPException(status_code=404, detail="File not found")
 
 try:
     app.include_router(routers, prefix=f"/api/{version}")
@@ -74,7 +91,8 @@ except Exception as e:
 
 @app.on_event("startup")
 async def startup():
-    await on_startup()
+    landing()
+    await on_startup(app)
 
 
 @app.on_event("shutdown")
@@ -0,0 +1,245 @@
+# src/midlewares/compression.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used to compress the responses with the first encoding of
+COMPRESSION_ENCODINGS the client accepts (zstd, br, gzip). Only the
+COMPRESSION_TYPES bodies of COMPRESSION_MINIMUM_SIZE bytes or more are
+compressed, an already encoded response (the precompressed static files)
+is sent as is.
+
+A response with a Content-Length (JSONResponse) is already in memory, up
+to BUFFERED bytes it is buffered: the digest of the body is its ETag and
+the compressed bodies of the GET responses are kept in an LRU cache keyed
+by that digest, so the same list served again is not compressed again,
+and a matching If-None-Match is answered 304. The other responses
+(StreamingResponse, large files) are compressed chunk by chunk as they
+stream.
+"""
+
+import zlib
+import hashlib
+from collections import OrderedDict
+from starlette.datastructures import Headers, MutableHeaders
+from src.utils.static import accepted
+
+try:
+    import brotli  # Optional, see requirements.txt
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard  # Optional, see requirements.txt
+except ImportError:
+    zstandard = None
+
+AVAILABLE = {"zstd": zstandard is not None, "br": brotli is not None, "gzip": True}
+
+BUFFERED = 4 * 1024 * 1024  # Bytes, a larger response (a file) is compressed while it streams
+
+
+class Brotli:
+    """brotli.Compressor with the compress/flush interface of zlib"""
+
+    def __init__(self, quality: int):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.finish()
+
+
+def compressor(encoding: str, level: int):
+    if encoding == "gzip":
+        return zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip header and trailer
+    if encoding == "br":
+        return Brotli(level)
+    return zstandard.ZstdCompressor(level=level).compressobj()
+
+
+def add_vary(headers: MutableHeaders, token: str) -> None:
+    """Add `token` to the Vary header unless it is already there (the static files set it)"""
+    vary = headers.get("vary")
+    if vary is None:
+        headers["Vary"] = token
+    elif token.lower() not in {value.strip().lower() for value in vary.split(",")}:
+        headers["Vary"] = f"{vary}, {token}"
+
+
+class CompressedCache:
+    """LRU of the compressed bodies, {(digest, encoding): body} up to `size` bytes"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.used = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> bytes:
+        body = self.entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def set(self, key: tuple, body: bytes) -> None:
+        if key in self.entries or len(body) > self.size:
+            return
+        self.entries[key] = body
+        self.used += len(body)
+        while self.used > self.size:
+            _, evicted = self.entries.popitem(last=False)
+            self.used -= len(evicted)
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        encodings: tuple = ("zstd", "br", "gzip"),
+        levels: dict = None,
+        minimum_size: int = 1024,
+        types: tuple = ("application/json",),
+        cache_size: int = 32 * 1024 * 1024,
+    ):
+        self.app = app
+        # Preference order, the encodings without their package are skipped
+        self.encodings = [encoding for encoding in encodings if AVAILABLE.get(encoding)]
+        self.levels = {"zstd": 3, "br": 4, "gzip": 6, **(levels or {})}
+        self.minimum_size = minimum_size
+        self.types = set(types)
+        self.cache = CompressedCache(cache_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encodings = accepted(request_headers.get("accept-encoding", ""), self.encodings)
+        if not encodings:
+            await self.app(scope, receive, send)
+            return
+
+        responder = CompressionResponder(self, send, encodings[0], scope["method"], request_headers)
+        await self.app(scope, receive, responder)
+
+
+class CompressionResponder:
+    """The state of one response, the start message is held until the body decides"""
+
+    def __init__(self, middleware: CompressionMiddleware, send, encoding: str, method: str, request_headers: Headers):
+        self.middleware = middleware
+        self.send = send
+        self.encoding = encoding
+        self.method = method
+        self.request_headers = request_headers
+        self.start = None
+        self.skip = False
+        self.buffered = False
+        self.buffer = []
+        self.compressor = None
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            length = int(headers.get("content-length", BUFFERED + 1))
+            self.buffered = length <= BUFFERED
+            self.skip = (
+                "content-encoding" in headers
+                or message["status"] < 200
+                or message["status"] in (204, 304)
+                or headers.get("content-type", "").split(";")[0].strip() not in self.middleware.types
+                or "no-transform" in headers.get("cache-control", "")
+                or length < self.middleware.minimum_size
+                # A large file with its own ETag, precompress it instead (src/utils/static.py)
+                or (not self.buffered and "etag" in headers)
+            )
+            if self.skip:
+                await self.send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.skip:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.buffered:
+            self.buffer.append(body)
+            if not more_body:
+                await self.send_whole(b"".join(self.buffer))
+            return
+
+        await self.send_chunk(body, more_body)
+
+    async def send_whole(self, body: bytes) -> None:
+        if len(body) < self.middleware.minimum_size:
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": body})
+            return
+
+        cacheable = self.method == "GET" and self.start["status"] == 200
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        key = (digest, self.encoding)
+        compressed = self.middleware.cache.get(key) if cacheable else None
+        if compressed is None:
+            stream = compressor(self.encoding, self.middleware.levels[self.encoding])
+            compressed = stream.compress(body) + stream.flush()
+            if cacheable:
+                self.middleware.cache.set(key, compressed)
+
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers["Content-Length"] = str(len(compressed))
+        add_vary(headers, "Accept-Encoding")
+
+        # Every representation has its own ETag
+        etag = headers.get("etag")
+        if etag:
+            etag = f'{etag[:-1]}-{self.encoding}"'
+        elif cacheable:
+            etag = f'"{digest}-{self.encoding}"'
+        if etag:
+            headers["ETag"] = etag
+
+        tags = [tag.strip().removeprefix("W/") for tag in self.request_headers.get("if-none-match", "").split(",")]
+        if cacheable and etag and etag.removeprefix("W/") in tags:
+            self.start["status"] = 304
+            del headers["Content-Length"]
+            del headers["Content-Encoding"]
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": b""})
+            return
+
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": compressed})
+
+    async def send_chunk(self, body: bytes, more_body: bool) -> None:
+        if self.compressor is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                # The whole body in one small message
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+
+            self.compressor = compressor(self.encoding, self.middleware.levels[self.encoding])
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            add_vary(headers, "Accept-Encoding")
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            await self.send(self.start)
+
+        data = self.compressor.compress(body)
+        if not more_body:
+            data += self.compressor.flush()
+        if data or not more_body:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -10,9 +10,13 @@ from src.utils.logging import Logging
 from fastapi.responses import JSONResponse
 import time
 from src.utils.dependency import AccessTokenBearer
+from src.utils.ratelimit import RateLimiter
+from src.midlewares.compression import CompressionMiddleware
+from src.configs import Config
 from fastapi.exceptions import HTTPException
 
 logger = Logging(level="DEBUG")
+rate_limiter = RateLimiter()
 """
 Middleware class to handle all middleware for the FastAPI application,
 You can add more middleware to this class as needed.
@@ -40,6 +44,38 @@ class Middleware:
 
     # Register middleware for the FastAPI application
     def register_middleware(self):
+        # Registered first so it runs last, after the authorization of the user
+        @self.app.middleware("http")
+        async def rate_limit(request: Request, call_next):
+            path = request.url.path
+            if not Config.RATE_LIMIT_ENABLED or not path.startswith(self.parent_url):
+                return await call_next(request)
+
+            policies = rate_limiter.match(request.method, path[len(self.parent_url):])
+            if not policies:
+                return await call_next(request)
+
+            try:
+                allowed, headers = await rate_limiter.hit(request, policies)
+            except Exception as e:
+                # Fail open, Redis being down must not take the API down
+                logger.log("error", f"Rate limit check failed: {e}")
+                return await call_next(request)
+
+            if not allowed:
+                return JSONResponse(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    content={
+                        "message": "Too many requests",
+                        "resolution": f"Please retry after {headers['Retry-After']} seconds",
+                    },
+                    headers=headers,
+                )
+
+            response = await call_next(request)
+            response.headers.update(headers)
+            return response
+
         @self.app.middleware("http")
         async def add_process_time_header(request: Request, call_next):
             start_time = time.time()
@@ -61,7 +97,7 @@ class Middleware:
         @self.app.middleware("http")
         async def authorization(request: Request, call_next):
             try:
-                # Skip the Authorization check for the /auth/login and /auth/register paths
+                # Skip the Authorization check for the /auth/login, /auth/register and /auth/refresh paths
                 if ExceptRoute(parent_url=self.parent_url).except_route(request):
                     response = await call_next(request)
                     return response
@@ -78,8 +114,7 @@ class Middleware:
                 # get current user
                 authorize = await AccessTokenBearer()(request)
                 if authorize:
-                    request.state.authorize = authorize
-                    request.state.authorize["ip_address"] = request.client.host
+                    request.state.authorize = authorize  # AuthContext, with the client ip
 
                 response = await call_next(request)
                 return response
@@ -105,6 +140,21 @@ class Middleware:
         # Add TrustedHostMiddleware
         self.app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
 
+        # Add CompressionMiddleware, added last it wraps the others and sees the final body
+        if Config.COMPRESSION:
+            self.app.add_middleware(
+                CompressionMiddleware,
+                encodings=tuple(Config.COMPRESSION_ENCODINGS.split(",")),
+                levels={
+                    "gzip": Config.COMPRESSION_GZIP_LEVEL,
+                    "br": Config.COMPRESSION_BROTLI_QUALITY,
+                    "zstd": Config.COMPRESSION_ZSTD_LEVEL,
+                },
+                minimum_size=Config.COMPRESSION_MINIMUM_SIZE,
+                types=tuple(Config.COMPRESSION_TYPES.split(",")),
+                cache_size=Config.COMPRESSION_CACHE_SIZE * 1024 * 1024,
+            )
+
 
 """
 For handling exceptions, you can create a class that inherits from the Exception class.
@@ -118,16 +168,19 @@ class ExceptRoute:
         self.version = parent_url.split("/")[-1]
 
     def except_route(self, request: Request):
+        if request.url.path.startswith(("/docs/", "/static/")):
+            return True  # Static files mounted by src/main.py
+
         if request.url.path in [
             "/",
             "/favicon.ico",
+            "/.well-known/jwks.json",
             "/docs",
             "/redoc",
             f"/openapi/{self.version}.json",
-            "/docs/convention-id.md",
-            "/docs/convention-en.md",
             f"{self.parent_url}/auth/login",
             f"{self.parent_url}/auth/register",
+            f"{self.parent_url}/auth/refresh",  # RefreshTokenBearer verifies the refresh token on the route
         ]:
             return True
         return False
@@ -21,6 +21,7 @@ from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from src.utils.security import verify_password, generate_token
 from src.configs import Config
+from src.utils.structs import AuthContext
 from src.utils.dependency import (
     AccessTokenBearer, 
     RefreshTokenBearer,
@@ -50,7 +51,7 @@ async def register(
 @router.get("/me", response_model=AuthSchema, status_code=status.HTTP_200_OK, dependencies=[Depends(AccessTokenBearer())])
 async def me(
     request: Request,
-    user: dict = Depends(AccessTokenBearer()), 
+    user: AuthContext = Depends(AccessTokenBearer()), 
     session: AsyncSession = Depends(session)
 ):
     return await service.me(request, user, session)
@@ -63,7 +64,7 @@ async def me(
 )
 async def switch(
     request: Request,
-    user: dict = Depends(AccessTokenBearer()),
+    user: AuthContext = Depends(AccessTokenBearer()),
     body: SwitchAccountRequestSchema = None,
     session: AsyncSession = Depends(session),
     _: bool = Depends(AccessControlBearer(permissions=["manage:auth", "switch:auth"]))
@@ -78,7 +79,7 @@ async def switch(
 )
 async def change_password(
     request: Request,
-    user: dict = Depends(AccessTokenBearer()),
+    user: AuthContext = Depends(AccessTokenBearer()),
     body: ChangePasswordRequestSchema = None,
     session: AsyncSession = Depends(session)
 ):
@@ -91,11 +92,23 @@ async def change_password(
 )
 async def logout(
     request: Request,
-    user: dict = Depends(AccessTokenBearer()), 
+    user: AuthContext = Depends(AccessTokenBearer()), 
     session: AsyncSession = Depends(session)
 ):
     return await service.logout(request, user, session)
 
+@router.post(
+    "/logout-all",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(AccessTokenBearer())],
+)
+async def logout_all(
+    request: Request,
+    user: AuthContext = Depends(AccessTokenBearer()), 
+    session: AsyncSession = Depends(session)
+):
+    return await service.logout_all(request, user, session)
+
 # refresh token
 @router.post(
     "/refresh",
@@ -104,7 +117,25 @@ async def logout(
 )
 async def refresh(
     request: Request,
-    user: dict = Depends(RefreshTokenBearer()), 
+    user: AuthContext = Depends(RefreshTokenBearer()), 
     session: AsyncSession = Depends(session)
 ):
     return await service.refresh(request, user, session)
+
+# metrics of the local filter of the revoked sessions
+@router.get(
+    "/revocation-filter",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(AccessControlBearer(permissions=["manage:auth"]))],
+)
+async def revocation_filter(request: Request):
+    return await service.revocation_filter(request)
+
+# compiled cache hits and misses of the executed statements
+@router.get(
+    "/statement-cache",
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(AccessControlBearer(permissions=["manage:auth"]))],
+)
+async def statement_cache(request: Request):
+    return await service.statement_cache(request)
@@ -12,7 +12,7 @@ from .schemas import (
     AuthSchema,
     ChangePasswordRequestSchema
 )
-from sqlalchemy import select
+from sqlalchemy import select, update, bindparam
 from .models import Auth
 from src.modules.authentications.roles.models import Role
 from src.modules.authentications.users.models import UserRole
@@ -25,19 +25,25 @@ from src.utils.security import (
 )
 from datetime import timedelta, datetime
 from src.configs import Config
-from src.databases.redis import RedisDB
+from src.databases.redis import RedisDB, revocation_filter
+from src.databases import db
+from src.databases.fastpath import fastpath
+from src.utils.structs import AuthContext
 from src.utils.errors import (
     InvalidCredentials,
     UserAlreadyExists,
     UserNotFound,
     InvalidToken,
+    RevokedToken,
     InvalidConfirmPassword,
     UserIsInactive
 )
 from sqlalchemy.orm import selectinload, joinedload
 from src.utils.logging import Logging, ActivityLog
 from src.utils.actions import ActionType
+from src.utils.permissions import PermissionBitmap
 import re
+import uuid
 
 redisDB = RedisDB()
 
@@ -49,47 +55,122 @@ password_regex = re.compile(
 
 MAX_FAILED_ATTEMPTS = 3
 
+# Login lookup, built once, the email is bound on execute (DB_FASTPATH=false,
+# the fast path runs its own prepared statement)
+USER_EXISTS = (
+    select(
+        Auth.id,
+        Auth.name,
+        Auth.email,
+        Auth.password,
+        Role.id.label("role_id"),
+        Role.name.label("role"),
+        Auth.active,
+        Auth.last_logged_in,
+        Auth.failed_login_attempts
+    )
+    .select_from(Auth)
+    .join(UserRole, UserRole.user_id == Auth.id)
+    .join(Role, UserRole.role_id == Role.id)
+    .where(Auth.email == bindparam("email"))
+)
+
+
+class ProfileCache:
+    """
+    Profile of the token users (name, email, role...), the tokens only carry
+    the user id. Cached on Redis for PROFILE_CACHE_TTL seconds, forget() it
+    when the user or their role changes.
+    """
+
+    async def get(self, user_id: int, session: AsyncSession) -> dict:
+        profile = await redisDB.get_profile(user_id)
+        if profile is not None:
+            return profile
+
+        if Config.DB_FASTPATH:
+            user = await fastpath.user_by_id(user_id)
+            if user is None:
+                raise UserNotFound
+
+            profile = jsonable_encoder(user.dict(), exclude={"password"})
+            await redisDB.set_profile(user_id, profile)
+            return profile
+
+        q = (
+            select(
+                Auth.id,
+                Auth.name,
+                Auth.email,
+                Role.id.label("role_id"),
+                Role.name.label("role"),
+                Auth.active,
+                Auth.last_logged_in,
+                Auth.failed_login_attempts
+            )
+            .select_from(Auth)
+            .join(UserRole, UserRole.user_id == Auth.id)
+            .join(Role, UserRole.role_id == Role.id)
+            .where(Auth.id == user_id)
+        )
+        # Cached until the next forget(), a lagging replica would keep the old role
+        result = await db.use_primary(session).execute(q)
+        response = result.first()
+
+        if response is None:
+            raise UserNotFound
+
+        profile = jsonable_encoder(dict(response._mapping))
+        await redisDB.set_profile(user_id, profile)
+
+        return profile
+
+    async def forget(self, user_id: int) -> None:
+        await redisDB.forget_profile(user_id)
+
+
 class AuthService:
     def __init__(self):
         self.logger = Logging(level="DEBUG")
         self.activity_log = ActivityLog(level="DEBUG")
         self.action_type = ActionType()
+        self.profiles = ProfileCache()
 
     async def login(self, request: Request, body: LoginRequestSchema, session: AsyncSession) -> dict:
         user = await self.user_exists(body.email, session)
 
+        # Failed attempts are counted in Redis, Postgres only keeps the lockout
         if user.failed_login_attempts >= MAX_FAILED_ATTEMPTS:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Your account has been locked. Please contact the administrator or IT support."
             )
         
-        if not await self.is_active(body.email, session):
+        if not user.active:
             raise UserIsInactive
 
+        # The attempt is counted before the password is checked, so concurrent
+        # attempts can't all pass the limit and each get a bcrypt check
+        fails = await redisDB.login_attempt(user.id)
+        if fails > MAX_FAILED_ATTEMPTS:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Your account has been locked. Please contact the administrator or IT support."
+            )
+
         password = verify_password(body.password, user.password)
         if not password:
-            user.failed_login_attempts += 1
-            await self.failed_login(body.email, user.failed_login_attempts, session)
-
-            if user.failed_login_attempts >= MAX_FAILED_ATTEMPTS:
-                user.active = False
-                await session.commit()
+            if fails >= MAX_FAILED_ATTEMPTS:
+                await self.lock_account(user.id, fails, session)
             
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=f"Your remaining login attempts are {MAX_FAILED_ATTEMPTS - user.failed_login_attempts}. If you fail to login {MAX_FAILED_ATTEMPTS} times, your account will be locked." if user.failed_login_attempts < MAX_FAILED_ATTEMPTS else "Your account has been locked. Please contact the administrator or IT support."
+                detail=f"Your remaining login attempts are {MAX_FAILED_ATTEMPTS - fails}. If you fail to login {MAX_FAILED_ATTEMPTS} times, your account will be locked." if fails < MAX_FAILED_ATTEMPTS else "Your account has been locked. Please contact the administrator or IT support."
             )
 
-        user.failed_login_attempts = 0
-        await session.commit()
+        await redisDB.clear_login_failures(user.id)
 
-        access_token = generate_token(data=jsonable_encoder(user))
-        refresh_token = generate_token(
-            data=jsonable_encoder(user),
-            expiry=timedelta(seconds=Config.JWT_REFRESH_EXPIRY),
-            refresh=True,
-        )
+        access_token, refresh_token = await self.start_session(request, user.dict(), session)
 
         await self.activity_log(
             request=request,
@@ -113,20 +194,53 @@ class AuthService:
                     "refresh_token": refresh_token,
                     "token_type": "Bearer",
                     "expires_in": Config.JWT_EXPIRY,
-                    "user": jsonable_encoder(user),
+                    "user": jsonable_encoder(user.dict(), exclude={"password"}),
                 },
             },
             status_code=status.HTTP_200_OK,
         )
 
-    async def refresh(self, request: Request, user: dict, session: AsyncSession) -> dict:
-        expiry_timestamp = user["exp"]
+    async def refresh(self, request: Request, user: AuthContext, session: AsyncSession) -> dict:
+        expiry_timestamp = user.exp
 
         if datetime.fromtimestamp(expiry_timestamp) < datetime.now():
             raise InvalidToken
 
-        access_token = generate_token(
-            data=user["user"],
+        # Rotate the refresh token, the presented one can't be used again
+        refresh_jti = str(uuid.uuid4())
+        rotated = await redisDB.rotate_session(
+            user.sid, user.user.id, user.jti, refresh_jti
+        )
+
+        if rotated < 0:
+            # An already rotated refresh token, the whole session is revoked
+            self.logger.log(
+                "warning",
+                f"Refresh token {user.jti} reused, session {user.sid} revoked",
+            )
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail={
+                    "message": "Refresh token has already been used",
+                    "resolution": "Please login again",
+                    "error_code": "token_reused",
+                },
+            )
+
+        if rotated == 0:
+            raise RevokedToken
+
+        # Role and permission version are read again, changes apply on refresh
+        claims = await self.claims(
+            await self.profiles.get(user.user.id, session), session
+        )
+        access_token = generate_token(data=claims, session_id=user.sid)
+        refresh_token = generate_token(
+            data=claims,
+            expiry=timedelta(seconds=Config.JWT_REFRESH_EXPIRY),
+            refresh=True,
+            session_id=user.sid,
+            jti=refresh_jti,
         )
 
         return JSONResponse(
@@ -135,6 +249,7 @@ class AuthService:
                 "message": "Token refreshed",
                 "data": {
                     "access_token": access_token,
+                    "refresh_token": refresh_token,
                     "token_type": "Bearer",
                     "expires_in": Config.JWT_EXPIRY,
                 },
@@ -142,27 +257,52 @@ class AuthService:
             status_code=status.HTTP_200_OK,
         )
 
-    async def failed_login(self, email: str, fails: int, session: AsyncSession) -> int:
-        async with session.begin():
-            q = (
-                select(Auth)
-                .where(Auth.email == email)
+    async def claims(self, user: dict, session: AsyncSession) -> dict:
+        """Compact token claims: user id, role id and the permission versions of both"""
+        version, *pv = await redisDB.permission_versions(user["role_id"], user["id"])
+        claims = {"sub": str(user["id"]), "rid": user["role_id"], "pv": pv}
+
+        if Config.JWT_PERMISSION_BITMAP:
+            # Permissions of the role and of the user, compiled for this version
+            bitmap = PermissionBitmap()
+            claims["pm"] = bitmap.encode(
+                await bitmap.grants(user["id"], user["role_id"], session, version)
             )
-            result = await session.execute(q)
-            response = result.scalars().first()
 
-            if response is None:
-                raise UserNotFound
+        return claims
 
-            response.failed_login_attempts = fails
+    async def start_session(self, request: Request, user: dict, session: AsyncSession) -> tuple:
+        """Create a login session and return its access and refresh tokens"""
+        session_id = str(uuid.uuid4())
+        refresh_jti = str(uuid.uuid4())
 
-            if response.failed_login_attempts >= MAX_FAILED_ATTEMPTS:
-                response.active = False
+        await redisDB.create_session(
+            session_id, user["id"], refresh_jti, request.client.host
+        )
 
-            session.add(response)
-            await session.commit()
+        claims = await self.claims(user, session)
+        access_token = generate_token(data=claims, session_id=session_id)
+        refresh_token = generate_token(
+            data=claims,
+            expiry=timedelta(seconds=Config.JWT_REFRESH_EXPIRY),
+            refresh=True,
+            session_id=session_id,
+            jti=refresh_jti,
+        )
 
-        return response.failed_login_attempts
+        return access_token, refresh_token
+
+    async def lock_account(self, user_id: int, fails: int, session: AsyncSession) -> None:
+        """Persist the lockout, the only write of the failed login path"""
+        await session.execute(
+            update(Auth)
+            .where(Auth.id == user_id)
+            .values(failed_login_attempts=fails, active=False)
+        )
+        await session.commit()
+
+        await redisDB.clear_login_failures(user_id)
+        await self.profiles.forget(user_id)
 
     async def last_logged_in(self, email: str, session: AsyncSession) -> datetime:
         now = datetime.now()
@@ -185,25 +325,14 @@ class AuthService:
         return now
 
     async def user_exists(self, email: str, session: AsyncSession) -> dict:
+        if Config.DB_FASTPATH:
+            user = await fastpath.user_by_email(email)
+            if user is None:
+                raise UserNotFound
+            return user
+
         async with session.begin():
-            q = (
-                select(
-                    Auth.id,
-                    Auth.name,
-                    Auth.email,
-                    Auth.password,
-                    Role.id.label("role_id"),
-                    Role.name.label("role"),
-                    Auth.active,
-                    Auth.last_logged_in,
-                    Auth.failed_login_attempts
-                )
-                .select_from(Auth)
-                .join(UserRole, UserRole.user_id == Auth.id)
-                .join(Role, UserRole.role_id == Role.id)
-                .where(Auth.email == email)
-            )
-            result = await session.execute(q)
+            result = await session.execute(USER_EXISTS, {"email": email})
             response = result.first()
 
             if response is None:    
@@ -235,48 +364,12 @@ class AuthService:
 
         return response.active
 
-    async def me(self, request: Request, user: dict, session: AsyncSession) -> dict:
-        user_id = user["user"]["id"]
-        async with session.begin():
-            q = (
-                select(
-                    Auth.id,
-                    Auth.name,
-                    Auth.email,
-                    Role.id.label("role_id"),
-                    Role.name.label("role"),
-                    Auth.active,
-                    Auth.last_logged_in,
-                    Auth.failed_login_attempts
-                )
-                .select_from(Auth)
-                .join(UserRole, UserRole.user_id == Auth.id)
-                .join(Role, UserRole.role_id == Role.id)
-                .where(Auth.id == user_id)
-            )
-            result = await session.execute(q)
-            response = result.first()
-
-            if response is None:
-                raise UserNotFound
+    async def me(self, request: Request, user: AuthContext, session: AsyncSession) -> dict:
+        profile = await self.profiles.get(user.user.id, session)
 
-        return AuthSchema(
-            id=response.id,
-            name=response.name,
-            email=response.email,
-            password="xxxxxxxx",
-            role_id=response.role_id,
-            role=response.role,
-            active=response.active,
-            last_logged_in=response.last_logged_in,
-            failed_login_attempts=response.failed_login_attempts
-        )
-
-    async def switch(self, request: Request, user: dict, body: SwitchAccountRequestSchema, session: AsyncSession) -> dict:
-        jti = user["jti"]
-
-        await redisDB.add_jti_to_blocklist(jti)
+        return AuthSchema(**profile, password="xxxxxxxx")
 
+    async def switch(self, request: Request, user: AuthContext, body: SwitchAccountRequestSchema, session: AsyncSession) -> dict:
         q = (
             select(
                 Auth.id,
@@ -297,7 +390,9 @@ class AuthService:
 
         if response is None:
             raise UserNotFound
-        
+
+        # The current session ends once the account is found, the switched account gets its own
+        await redisDB.revoke_session(user.sid)
 
         user = {
             "id": response.id,
@@ -309,7 +404,9 @@ class AuthService:
             "last_logged_in": response.last_logged_in
         }
 
-        access_token = generate_token(data=jsonable_encoder(user))
+        access_token, refresh_token = await self.start_session(
+            request, jsonable_encoder(user), session
+        )
 
         return JSONResponse(
             content={
@@ -317,6 +414,7 @@ class AuthService:
                 "message": "Account switched successfully",
                 "data": {
                     "access_token": access_token,
+                    "refresh_token": refresh_token,
                     "token_type": "Bearer",
                     "expires_in": Config.JWT_EXPIRY,
                     "user": jsonable_encoder(user),
@@ -325,10 +423,10 @@ class AuthService:
             status_code=status.HTTP_200_OK,
         )
 
-    async def change_password(self, request: Request, user: dict, body: ChangePasswordRequestSchema, session: AsyncSession) -> dict:
+    async def change_password(self, request: Request, user: AuthContext, body: ChangePasswordRequestSchema, session: AsyncSession) -> dict:
         q = (
             select(Auth)
-            .where(Auth.id == user["user"]["id"])
+            .where(Auth.id == user.user.id)
         )
         result = await session.execute(q)
         user = result.scalars().first()
@@ -419,26 +517,70 @@ class AuthService:
                 detail=str(e)
             )
 
-    async def logout(self, request: Request, user: str, session: AsyncSession) -> dict:
-        jti = user["jti"]
+    async def logout(self, request: Request, user: AuthContext, session: AsyncSession) -> dict:
+        profile = await self.profiles.get(user.user.id, session)
 
         await self.activity_log(
             request=request,
             body={
-                "user_id": user["user"]["id"],
+                "user_id": user.user.id,
                 "action_id": await self.action_type("LOGOUT", session),
-                "record_id": user["user"]["id"],
+                "record_id": user.user.id,
                 "model_name": Auth.__tablename__,
                 "ip_address": request.client.host,
-                "notes": f"User {user['user']['email']} has logged out"
+                "notes": f"User {profile['email']} has logged out"
             },
             session=session
         )
 
-        await redisDB.add_jti_to_blocklist(jti)
-
+        # Revokes every access and refresh token of this login
+        await redisDB.revoke_session(user.sid)
 
         return JSONResponse(
             content={"success": True, "message": "Logout successful"},
             status_code=status.HTTP_200_OK,
         )
+
+    async def logout_all(self, request: Request, user: AuthContext, session: AsyncSession) -> dict:
+        profile = await self.profiles.get(user.user.id, session)
+
+        await self.activity_log(
+            request=request,
+            body={
+                "user_id": user.user.id,
+                "action_id": await self.action_type("LOGOUT", session),
+                "record_id": user.user.id,
+                "model_name": Auth.__tablename__,
+                "ip_address": request.client.host,
+                "notes": f"User {profile['email']} has logged out from all devices"
+            },
+            session=session
+        )
+
+        # Revokes every session of the user, whatever the number of logins
+        await redisDB.revoke_user_sessions(user.user.id)
+
+        return JSONResponse(
+            content={"success": True, "message": "Logout from all devices successful"},
+            status_code=status.HTTP_200_OK,
+        )
+
+    async def revocation_filter(self, request: Request) -> dict:
+        return JSONResponse(
+            content={
+                "success": True,
+                "message": "Revocation filter metrics",
+                "data": revocation_filter.metrics(),
+            },
+            status_code=status.HTTP_200_OK,
+        )
+
+    async def statement_cache(self, request: Request) -> dict:
+        return JSONResponse(
+            content={
+                "success": True,
+                "message": "Compiled statement cache metrics",
+                "data": db.cache_stats.metrics(),
+            },
+            status_code=status.HTTP_200_OK,
+        )
@@ -19,6 +19,7 @@ from src.databases import db
 from typing import List
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from src.utils.dependency import AccessTokenBearer, AccessControlBearer
+from src.utils.structs import StructResponse
 
 router = APIRouter(
     dependencies=[Depends(AccessTokenBearer())],
@@ -171,7 +172,7 @@ async def get_menu_hierarchy(
     try:
         # Get the hierarchical menu data
         hierarchy_data = await service.hierarchy(request, session)
-        return hierarchy_data
+        return StructResponse(hierarchy_data)  # Encoded as is, MenuHierarchySchema documents it
     except Exception as e:
         # Handle errors and return a HTTP 500 response
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -8,6 +8,7 @@ from typing import List, Optional
 from pydantic import validator
 from src.modules.logs.audit_logs.schemas import AuditLogSchema
 from src.utils.pagination import PaginationSchema
+from src.utils.structs import Struct
 
 class MenuHierarchySchema(BaseModel):
     id: int
@@ -22,6 +23,11 @@ class MenuHierarchySchema(BaseModel):
     class Config:
         orm_mode = True
 
+class MenuNode(Struct):
+    """Node of the hierarchy as served, MenuHierarchySchema documents it"""
+
+    __slots__ = ("id", "parent_id", "name", "alias", "link", "icon", "ordering", "children")
+
 class MenuSchema(BaseModel):
     id: int
     parent_id: Optional[int]
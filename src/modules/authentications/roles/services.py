@@ -3,187 +3,26 @@
 # Copyright 2024 - Ika Raya Sentausa
 
 from sqlmodel.ext.asyncio.session import AsyncSession
-from fastapi.exceptions import HTTPException
-from .schemas import (
-    RoleRequestSchema, 
-    GivePermissionToRoleSchema, 
-    RoleSchema,
-    SelectRoleSchema
-)
+from .schemas import GivePermissionToRoleSchema
 from .models import Role
-from src.modules.logs.audit_logs.models import AuditLog
-from sqlmodel import select, desc, cast, String
-from fastapi import status, Request
-from typing import Optional
+from fastapi import Request
 from sqlalchemy.orm import joinedload
-from src.utils.logging import Logging, ActivityLog
-from src.utils.actions import ActionType
-from sqlalchemy import func
-from src.utils.helper import DuplicateChecker
+from src.utils.services import BaseService
+from src.databases.redis import RedisDB
 
+redisDB = RedisDB()
 
-class RoleService:
-    def __init__(self):
-        self.logger = Logging(level="DEBUG")
-        self.activity_log = ActivityLog(level="DEBUG")
-        self.action_type = ActionType()
 
-    async def all(
-        self,
-        request: Request,
-        session: AsyncSession,
-        keywords: Optional[str] = None,
-        skip: int = 0,
-        limit: int = 10,
-    ) -> dict:
-        # Checking if the record is trashed (deleted)
-        trashed = await AuditLog().is_trashed(Role)
-
-        # Build the query for fetching roles
-        q = (
-            select(Role)
-            .distinct()  # This will ensure only unique Role records are returned
-            .select_from(Role)
-            .outerjoin(AuditLog, AuditLog.record_id == cast(Role.id, String))
-        )
-
-        # Apply search keyword filter
-        if keywords:
-            q = q.filter(Role.name.ilike(f"%{keywords}%"))
-
-        q = (
-            q.options(
-                joinedload(Role.permissions),
-                joinedload(Role.audit_logs),
-                joinedload(Role.audit_logs).joinedload(AuditLog.user),
-                joinedload(Role.audit_logs).joinedload(AuditLog.action),
-            )
-            .filter(~trashed)  # Exclude trashed roles
-            .order_by(desc(Role.id))  # Order by Role.id descending
-            .offset(skip)  # Pagination offset (skip)
-            .limit(limit)  # Pagination limit (number of records per page)
-        )
-
-        # Execute the query for roles data with pagination
-        result = await session.execute(q)
-        response = result.unique().scalars().all()
-
-        # Count the total number of records without pagination
-        count_query = select(func.count(Role.id)).select_from(Role).filter(~trashed)
-        if keywords:
-            count_query = count_query.filter(Role.name.ilike(f"%{keywords}%"))
-        count_response = await session.execute(count_query)
-        total_count = count_response.scalar()
-
-        # Calculate the total number of pages
-        total_pages = (
-            total_count + limit - 1
-        ) // limit  # This is the ceiling of total_count / limit
-
-        # Calculate the current page based on skip and limit
-        current_page = skip // limit + 1 if total_count > 0 else 0
-
-        # Return the roles along with pagination information
-        return {
-            "current_page": current_page,
-            "total_count": total_count,
-            "per_page": limit,
-            "total_pages": total_pages,
-            "data": response,
-        }
-
-    async def find(
-        self, id: int, request: Request, session: AsyncSession
-    ) -> Optional[RoleSchema]:
-        trashed = await AuditLog().is_trashed(Role)
-        q = (
-            select(Role)
-            .options(
-                joinedload(Role.permissions),
-                joinedload(Role.audit_logs),
-                joinedload(Role.audit_logs).joinedload(AuditLog.user),
-                joinedload(Role.audit_logs).joinedload(AuditLog.action),
-            )
-            .where(Role.id == id)
-            .filter(~trashed)
-        )
-        role = await session.execute(q)
-        response = role.scalars().first()
-        if response is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Role not found"
-            )
-        return response
-
-    async def select(self, request: Request, session: AsyncSession) -> list:
-        trashed = await AuditLog().is_trashed(Role)
-        q = select(Role).filter(~trashed)
-        result = await session.execute(q)
-        response = result.scalars().all()
-
-        return response
-
-    async def create(
-        self, request: Request, body: RoleRequestSchema, session: AsyncSession
-    ) -> dict:
-        # Check if the record already exists
-        checker = DuplicateChecker(Role, session)
-        await checker.check({
-                "name": body.name
-            }) # Change the field name if necessary
-        try:
-            body = Role(**body.dict())
-            body.name = body.name.title()
-            session.add(body)
-            await session.commit()
-
-            await self.activity_log(
-                request=request,
-                body={
-                    "action_id": await self.action_type("CREATE", session),
-                    "record_id": body.id,
-                    "model_name": Role.__tablename__,
-                },
-                session=session,
-            )
-            return body
-        except Exception as e:
-            await session.rollback()
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
-            )
-
-    async def update(
-        self, id: int, request: Request, body: RoleRequestSchema, session: AsyncSession
-    ) -> dict:
-        # Check if the record already exists
-        checker = DuplicateChecker(Role, session)
-        await checker.check({
-                "name": body.name
-            }) # Change the field name if necessary
-        response = await self.find(id, request, session)
-        try:
-            body.name = body.name.title()
-            for key, value in body.dict().items():
-                setattr(response, key, value)
-            await session.commit()
+class RoleService(BaseService):
+    model = Role
+    unique_fields = ("name",)  # Change the field name if necessary
 
-            await self.activity_log(
-                request=request,
-                body={
-                    "action_id": await self.action_type("UPDATE", session),
-                    "record_id": id,
-                    "model_name": Role.__tablename__,
-                },
-                session=session,
-            )
+    def options(self) -> list:
+        return [joinedload(Role.permissions), *super().options()]
 
-            return response
-        except Exception as e:
-            await session.rollback()
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
-            )
+    def prepare(self, data: dict) -> dict:
+        data["name"] = data["name"].title()
+        return data
 
     async def give_permission_to_role(
         self, request: Request, body: GivePermissionToRoleSchema, session: AsyncSession
@@ -192,16 +31,14 @@ class RoleService:
         try:
             role = await self.find(body.role_id, request, session)
             # body.permission_id is list of permission_id
-            permissions = []
-            for permission_id in body.permission_id:
-                permission = await PermissionService().find(permission_id, request, session)
-                permissions.append(permission.name)
-                role.permissions.append(permission)
+            permissions = await PermissionService().find_many(body.permission_id, request, session)
+            role.permissions.extend(permissions)
             await session.commit()
+            await redisDB.bump_permission_version(role_id=role.id)
 
             return {
                 "status": "success",
-                "message": f"Permission {permissions} has been assigned to role {body.role_id}",
+                "message": f"Permission {[permission.name for permission in permissions]} has been assigned to role {body.role_id}",
             }
         except Exception as e:
             await session.rollback()
@@ -212,144 +49,18 @@ class RoleService:
     ) -> dict:
         from src.modules.authentications.permissions.services import PermissionService
         try:
-
             role = await self.find(body.role_id, request, session)
             # body.permission_id is list of permission_id
-            permissions = []
-            for permission_id in body.permission_id:
-                permission = await PermissionService().find(permission_id, request, session)
-                permissions.append(permission.name)
+            permissions = await PermissionService().find_many(body.permission_id, request, session)
+            for permission in permissions:
                 role.permissions.remove(permission)
             await session.commit()
+            await redisDB.bump_permission_version(role_id=role.id)
 
             return {
                 "status": "success",
-                "message": f"Permission {permissions} has been revoked from role {body.role_id}",
+                "message": f"Permission {[permission.name for permission in permissions]} has been revoked from role {body.role_id}",
             }
         except Exception as e:
             await session.rollback()
             return {"status": "error", "message": str(e)}
-
-    async def destroy(self, id: int, request: Request, session: AsyncSession) -> dict:
-        response = await self.find(id, request, session)
-
-        if await Role().is_used(id, session):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot delete this data because it is used in other transactions"
-            )
-
-        await self.activity_log(
-            request=request,
-            body={
-                "action_id": await self.action_type("DELETE", session),
-                "record_id": id,
-                "model_name": Role.__tablename__,
-            },
-            session=session,
-        )
-
-        return response
-
-    async def trash(
-        self,
-        request: Request,
-        session: AsyncSession,
-        keywords: Optional[str] = None,
-        skip: int = 0,
-        limit: int = 10,
-    ) -> dict:
-        # Checking if the record is trashed (deleted)
-        trashed = await AuditLog().is_trashed(Role)
-
-        # Build the query for fetching roles
-        q = (
-            select(Role)
-            .distinct()  # This will ensure only unique Role records are returned
-            .select_from(Role)
-            .outerjoin(AuditLog, AuditLog.record_id == cast(Role.id, String))
-        )
-
-        # Apply search keyword filter
-        if keywords:
-            q = q.filter(Role.name.ilike(f"%{keywords}%"))
-
-        q = (
-            q.options(
-                joinedload(Role.permissions),
-                joinedload(Role.audit_logs),
-                joinedload(Role.audit_logs).joinedload(AuditLog.user),
-                joinedload(Role.audit_logs).joinedload(AuditLog.action),
-            )
-            .filter(trashed)  # Just trashed roles
-            .order_by(desc(Role.id))  # Order by Role.id descending
-            .offset(skip)  # Pagination offset (skip)
-            .limit(limit)  # Pagination limit (number of records per page)
-        )
-
-        # Execute the query for roles data with pagination
-        result = await session.execute(q)
-        response = result.unique().scalars().all()
-
-        # Count the total number of records without pagination
-        count_query = select(func.count(Role.id)).select_from(Role).filter(trashed)
-        if keywords:
-            count_query = count_query.filter(Role.name.ilike(f"%{keywords}%"))
-        count_response = await session.execute(count_query)
-        total_count = count_response.scalar()
-
-        # Calculate the total number of pages
-        total_pages = (
-            total_count + limit - 1
-        ) // limit  # This is the ceiling of total_count / limit
-
-        # Calculate the current page based on skip and limit
-        current_page = skip // limit + 1 if total_count > 0 else 0
-
-        # Return the roles along with pagination information
-        return {
-            "current_page": current_page,
-            "total_count": total_count,
-            "per_page": limit,
-            "total_pages": total_pages,
-            "data": response,
-        }
-
-    async def find_trash(
-        self, id: int, request: Request, session: AsyncSession
-    ) -> Optional[RoleSchema]:
-        trashed = await AuditLog().is_trashed(Role)
-        q = (
-            select(Role)
-            .options(
-                joinedload(Role.permissions),
-                joinedload(Role.audit_logs),
-                joinedload(Role.audit_logs).joinedload(AuditLog.user),
-                joinedload(Role.audit_logs).joinedload(AuditLog.action),
-            )
-            .where(Role.id == id)
-            .filter(trashed)
-        )
-        role = await session.execute(q)
-        response = role.scalars().first()
-        if response is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Role not found"
-            )
-        return response
-
-    async def restore(self, id: int, request: Request, session: AsyncSession) -> dict:
-        q = select(Role).filter(Role.id == id)
-        role = await session.execute(q)
-        response = role.scalars().first()
-
-        await self.activity_log(
-            request=request,
-            body={
-                "action_id": await self.action_type("RESTORE", session),
-                "record_id": id,
-                "model_name": Role.__tablename__,
-            },
-            session=session,
-        )
-
-        return response
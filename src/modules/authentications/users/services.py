@@ -5,139 +5,41 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi.exceptions import HTTPException
 from .schemas import UserRequestSchema
-from .models import User, UserRole
+from .models import User
 from .schemas import (
-    UserSchema, 
     AssignRoleSchema, 
     RevokeRoleSchema,
     GivePermissionToUserSchema,
-    SelectUserSchema
 )
-from src.modules.authentications.roles.models import Role
-from src.modules.logs.audit_logs.models import AuditLog
-from sqlmodel import select, desc, cast, String
+from sqlmodel import select
 from fastapi import status, Request
-from typing import Optional
 from sqlalchemy.orm import joinedload
-from src.utils.logging import Logging, ActivityLog
-from src.utils.actions import ActionType
-from sqlalchemy import func
 from src.utils.security import password_hash
+from src.utils.services import BaseService
+from src.databases.redis import RedisDB
 
+redisDB = RedisDB()
 
-class UserService:
-    def __init__(self):
-        self.logger = Logging(level="DEBUG")
-        self.activity_log = ActivityLog(level="DEBUG")
-        self.action_type = ActionType()
 
-    async def all(
-        self,
-        request: Request,
-        session: AsyncSession,
-        keywords: Optional[str] = None,
-        skip: int = 0,
-        limit: int = 10,
-    ) -> dict:
-        # Checking if the record is trashed (deleted)
-        trashed = await AuditLog().is_trashed(User)
-
-        # Build the query for fetching users
-        q = (
-            select(User)
-            .distinct()  # This will ensure only unique User records are returned
-            .select_from(User)
-            .outerjoin(AuditLog, AuditLog.record_id == cast(User.id, String))
-        )
-
-        # Apply search keyword filter
-        if keywords:
-            q = q.filter(User.name.ilike(f"%{keywords}%"))
+class UserService(BaseService):
+    model = User
+    search_columns = (User.name, User.email)
+    unique_fields = ()  # Emails are checked by create()
 
-        q = (
-            q.options(
-                joinedload(User.role),
-                joinedload(User.permissions),
-                joinedload(User.audit_logs),
-                joinedload(User.audit_logs).joinedload(AuditLog.user),
-                joinedload(User.audit_logs).joinedload(AuditLog.action),
-            )
-            .filter(~trashed)  # Exclude trashed users
-            .order_by(desc(User.id))  # Order by User.id descending
-            .offset(skip)  # Pagination offset (skip)
-            .limit(limit)  # Pagination limit (number of records per page)
-        )
-
-        # Execute the query for users data with pagination
-        result = await session.execute(q)
-        response = result.unique().scalars().all()
-
-        # Count the total number of records without pagination
-        count_query = select(func.count(User.id)).select_from(User).filter(~trashed)
-        if keywords:
-            count_query = count_query.filter(User.name.ilike(f"%{keywords}%"))
-        count_response = await session.execute(count_query)
-        total_count = count_response.scalar()
-
-        # Calculate the total number of pages
-        total_pages = (
-            total_count + limit - 1
-        ) // limit  # This is the ceiling of total_count / limit
-
-        # Calculate the current page based on skip and limit
-        current_page = skip // limit + 1 if total_count > 0 else 0
-
-        # Return the users along with pagination information
-        return {
-            "current_page": current_page,
-            "total_count": total_count,
-            "per_page": limit,
-            "total_pages": total_pages,
-            "data": response,
-        }
+    def options(self) -> list:
+        return [joinedload(User.role), joinedload(User.permissions), *super().options()]
 
     async def find(
-        self, id: int, request: Request, session: AsyncSession
-    ) -> Optional[UserSchema]:
-        q = (
-            select(User)
-            .options(
-                joinedload(User.role),
-                joinedload(User.permissions),
-                joinedload(User.audit_logs),
-                joinedload(User.audit_logs).joinedload(AuditLog.user),
-                joinedload(User.audit_logs).joinedload(AuditLog.action),
-            )
-            .where(User.id == id)
-        )
-        user = await session.execute(q)
-        response = user.scalars().first()
-        if response is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-            )
-        return response
-
-    async def select(self, request: Request, session: AsyncSession) -> list:
-        trashed = await AuditLog().is_trashed(User)
-        q = select(User).filter(~trashed)
-        result = await session.execute(q)
-        response = result.scalars().all()
-        
-        return response
+        self, id: int, request: Request, session: AsyncSession, trashed=None
+    ):
+        # Users are found whether they are trashed or not
+        return await super().find(id, request, session, trashed=trashed)
 
     async def find_by_email(
         self, email: str, request: Request, session: AsyncSession
     ) -> bool:
         q = (
             select(User)
-            .options(
-                joinedload(User.role),
-                joinedload(User.permissions),
-                joinedload(User.audit_logs),
-                joinedload(User.audit_logs).joinedload(AuditLog.user),
-                joinedload(User.audit_logs).joinedload(AuditLog.action),
-            )
             .where(User.email == email)
         )
         user = await session.execute(q)
@@ -162,36 +64,13 @@ class UserService:
         session.add(body)
         await session.commit()
 
-        await self.activity_log(
-            request=request,
-            body={
-                "action_id": await self.action_type("CREATE", session),
-                "record_id": body.id,
-                "model_name": User.__tablename__,
-            },
-            session=session,
-        )
+        await self.audit("CREATE", body.id, request, session)
 
         return body
 
-    async def update(
-        self, id: int, request: Request, body: UserRequestSchema, session: AsyncSession
-    ) -> dict:
-        response = await self.find(id, request, session)
-        for key, value in body.dict().items():
-            setattr(response, key, value)
-        await session.commit()
-
-        await self.activity_log(
-            request=request,
-            body={
-                "action_id": await self.action_type("UPDATE", session),
-                "record_id": id,
-                "model_name": User.__tablename__,
-            },
-            session=session,
-        )
-
+    async def update(self, id: int, request: Request, body, session: AsyncSession):
+        response = await super().update(id, request, body, session)
+        await redisDB.forget_profile(id)
         return response
 
     async def assign_role(
@@ -205,6 +84,10 @@ class UserService:
             user.role = role
             await session.commit()
 
+            # The role is part of the profile and of the token claims
+            await redisDB.forget_profile(user.id)
+            await redisDB.bump_permission_version(user_id=user.id)
+
             return {
                 "status": "success",
                 "message": f"Role {role.name} has been assigned to user {user.name}",
@@ -224,6 +107,10 @@ class UserService:
             user.role = None
             await session.commit()
 
+            # The role is part of the profile and of the token claims
+            await redisDB.forget_profile(user.id)
+            await redisDB.bump_permission_version(user_id=user.id)
+
             return {
                 "status": "success",
                 "message": f"Role {role.name} has been revoked from user {user.name}",
@@ -243,19 +130,14 @@ class UserService:
         try:
             user = await self.find(body.user_id, request, session)
             # body.permission_id is list of permission_id
-            permissions = []
-            for permission_id in body.permission_id:
-                permission = await PermissionService().find(permission_id, request, session)
-                permissions.append(permission.name)
-                user.permissions.append(permission)
-            await session.commit()
-
-            user.permissions.append(permission)
+            permissions = await PermissionService().find_many(body.permission_id, request, session)
+            user.permissions.extend(permissions)
             await session.commit()
+            await redisDB.bump_permission_version(user_id=user.id)
 
             return {
                 "status": "success",
-                "message": f"Permission {permissions} has been assigned to user {user.name}",
+                "message": f"Permission {[permission.name for permission in permissions]} has been assigned to user {user.name}",
             }
         except Exception as e:
             await session.rollback()
@@ -271,16 +153,15 @@ class UserService:
         try:
             user = await self.find(body.user_id, request, session)
             # body.permission_id is list of permission_id
-            permissions = []
-            for permission_id in body.permission_id:
-                permission = await PermissionService().find(permission_id, request, session)
-                permissions.append(permission.name)
+            permissions = await PermissionService().find_many(body.permission_id, request, session)
+            for permission in permissions:
                 user.permissions.remove(permission)
             await session.commit()
+            await redisDB.bump_permission_version(user_id=user.id)
 
             return {
                 "status": "success",
-                "message": f"Permission {permissions} has been revoked from user {user.name}",
+                "message": f"Permission {[permission.name for permission in permissions]} has been revoked from user {user.name}",
             }
         except Exception as e:
             await session.rollback()
@@ -290,16 +171,12 @@ class UserService:
         response = await self.find(id, request, session)
         response.active = False
         await session.commit()
+        await redisDB.forget_profile(response.id)
 
-        await self.activity_log(
-            request=request,
-            body={
-                "action_id": await self.action_type("UPDATE", session),
-                "record_id": response.id,
-                "model_name": User.__tablename__,
-            },
-            session=session,
-        )
+        # An inactive user is logged out from every device
+        await redisDB.revoke_user_sessions(response.id)
+
+        await self.audit("UPDATE", response.id, request, session)
 
         return response
 
@@ -308,15 +185,9 @@ class UserService:
         response.active = True
         response.failed_login_attempts = 0
         await session.commit()
+        await redisDB.forget_profile(response.id)
+        await redisDB.clear_login_failures(response.id)
 
-        await self.activity_log(
-            request=request,
-            body={
-                "action_id": await self.action_type("UPDATE", session),
-                "record_id": response.id,
-                "model_name": User.__tablename__,
-            },
-            session=session,
-        )
+        await self.audit("UPDATE", response.id, request, session)
 
         return response
@@ -9,6 +9,9 @@ import sqlalchemy as sa
 from typing import List, Optional
 from sqlmodel import select, cast, String
 
+# {(model, action_id, primary_key): EXISTS clause}, see AuditLog.exists
+EXISTS = {}
+
 
 class AuditLog(SQLModel, table=True):
     __tablename__ = "audit_logs"
@@ -40,77 +43,34 @@ class AuditLog(SQLModel, table=True):
         return f"<AuditLog {self.id}>"
 
     async def is_created(self, model, primary_key=None):
-        if primary_key:
-            primaryKeyModel = getattr(model, primary_key)
-        else:
-            primaryKeyModel = model.id
-
-        created = (
-            select(AuditLog)
-            .filter(
-                AuditLog.record_id == cast(primaryKeyModel, String),
-                AuditLog.action_id == 1,
-                AuditLog.model_name == model.__tablename__,
-            )
-            .exists()
-            .correlate(model)
-        )
-
-        return created
+        return self.exists(model, 1, primary_key)
 
     async def is_updated(self, model, primary_key=None):
-        if primary_key:
-            primaryKeyModel = getattr(model, primary_key)
-        else:
-            primaryKeyModel = model.id
-
-        updated = (
-            select(AuditLog)
-            .filter(
-                AuditLog.record_id == cast(primaryKeyModel, String),
-                AuditLog.action_id == 2,
-                AuditLog.model_name == model.__tablename__,
-            )
-            .exists()
-            .correlate(model)
-        )
-
-        return updated
+        return self.exists(model, 2, primary_key)
 
     async def is_trashed(self, model, primary_key=None):
-        if primary_key:
-            primaryKeyModel = getattr(model, primary_key)
-        else:
-            primaryKeyModel = model.id
-
-        trashed = (
-            select(AuditLog)
-            .filter(
-                AuditLog.record_id == cast(primaryKeyModel, String),
-                AuditLog.action_id == 3,
-                AuditLog.model_name == model.__tablename__,
-            )
-            .exists()
-            .correlate(model)
-        )
-
-        return trashed
+        return self.exists(model, 3, primary_key)
 
     async def is_restored(self, model, primary_key=None):
-        if primary_key:
-            primaryKeyModel = getattr(model, primary_key)
-        else:
-            primaryKeyModel = model.id
-
-        restored = (
-            select(AuditLog)
-            .filter(
-                AuditLog.record_id == cast(primaryKeyModel, String),
-                AuditLog.action_id == 4,
-                AuditLog.model_name == model.__tablename__,
+        return self.exists(model, 4, primary_key)
+
+    def exists(self, model, action_id: int, primary_key=None):
+        """
+        Correlated EXISTS of an audit log of `action_id` for the rows of `model`.
+        The clause only depends on its arguments, it is built once and reused,
+        so its cache key (and the compiled SQL of the statements) stay the same.
+        """
+        key = (model, action_id, primary_key)
+        if key not in EXISTS:
+            primaryKeyModel = getattr(model, primary_key) if primary_key else model.id
+            EXISTS[key] = (
+                select(AuditLog)
+                .filter(
+                    AuditLog.record_id == cast(primaryKeyModel, String),
+                    AuditLog.action_id == action_id,
+                    AuditLog.model_name == model.__tablename__,
+                )
+                .exists()
+                .correlate(model)
             )
-            .exists()
-            .correlate(model)
-        )
-
-        return restored
+        return EXISTS[key]
@@ -10,6 +10,7 @@ from .services import AuditLogService
 from .schemas import AuditLogSchema
 from src.databases import db
 from typing import List
+from datetime import datetime
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from src.utils.dependency import (
     AccessTokenBearer,
@@ -32,11 +33,28 @@ async def index(
     keywords: str = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, le=100),
+    start_date: datetime = Query(None),
+    end_date: datetime = Query(None),
     _: bool = Depends(
         AccessControlBearer(permissions=["manage:audit-logs", "view:audit-logs"])
     ),
 ):
-    return await service.all(request, session, keywords, skip, limit)
+    return await service.all(
+        request, session, keywords, skip, limit, start_date, end_date
+    )
+
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export(
+    request: Request,
+    keywords: str = Query(None),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    start_date: datetime = Query(None),
+    end_date: datetime = Query(None),
+    _: bool = Depends(
+        AccessControlBearer(permissions=["manage:audit-logs", "view:audit-logs"])
+    ),
+):
+    return await service.export(request, keywords, format, start_date, end_date)
 
 @router.get(
     "/own/activities", response_model=AuditLogResponseSchema, status_code=status.HTTP_200_OK
@@ -47,8 +65,12 @@ async def index(
     keywords: str = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, le=100),
+    start_date: datetime = Query(None),
+    end_date: datetime = Query(None),
 ):
-    return await service.own_activities(request, session, keywords, skip, limit)
+    return await service.own_activities(
+        request, session, keywords, skip, limit, start_date, end_date
+    )
 
 @router.get("/own/{id}/activities", response_model=AuditLogSchema, status_code=status.HTTP_200_OK)
 async def show(
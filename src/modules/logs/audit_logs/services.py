@@ -5,13 +5,20 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi.exceptions import HTTPException
 from .models import AuditLog
+from src.modules.authentications.users.models import User
+from src.modules.logs.actions.models import Action
 from sqlmodel import select, desc, cast, String
 from fastapi import status, Request
 from typing import Optional
+from datetime import datetime
 from sqlalchemy.orm import joinedload
 from src.utils.logging import Logging, ActivityLog
 from src.utils.actions import ActionType
+from src.utils.search import Search
+from src.utils.pagination import Paginator
 from sqlalchemy import func
+from fastapi.responses import StreamingResponse
+from src.utils.exports import StreamExporter
 
 
 class AuditLogService:
@@ -20,6 +27,21 @@ class AuditLogService:
         self.logger = Logging(level="DEBUG")
         self.activity_log = ActivityLog(level="DEBUG")
         self.action_type = ActionType()
+        self.paginator = Paginator()
+        self.search = Search(AuditLog.model_name)
+        self.exporter = StreamExporter()
+
+    def filter_period(
+        self,
+        q,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ):
+        if start_date:
+            q = q.filter(AuditLog.actioned_at >= start_date)
+        if end_date:
+            q = q.filter(AuditLog.actioned_at < end_date)
+        return q
 
     async def all(
         self,
@@ -28,6 +50,8 @@ class AuditLogService:
         keywords: Optional[str] = None,
         skip: int = 0,
         limit: int = 10,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
     ) -> dict:
         # Query dasar untuk audit_logs
         q = select(AuditLog).options(
@@ -36,40 +60,46 @@ class AuditLogService:
         )
 
         # Apply search keyword filter
-        if keywords:
-            q = q.filter(AuditLog.model_name.ilike(f"%{keywords}%"))
+        q = self.search.filter(q, keywords)
+
+        # Apply actioned_at range, only the matching monthly partitions are scanned
+        q = self.filter_period(q, start_date, end_date)
+
+        q = q.order_by(*self.search.order(keywords, desc(AuditLog.id)))  # Best match first, then newest
 
+        # Fetch the page and the total count in a single query
+        return await self.paginator(session, q, skip, limit)
+
+    async def export(
+        self,
+        request: Request,
+        keywords: Optional[str] = None,
+        format: str = "csv",
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> StreamingResponse:
+        # Plain columns instead of entities, nothing is loaded into the identity map
         q = (
-            q.order_by(desc(AuditLog.id))  # Order by AuditLog.id descending
-            .offset(skip)  # Pagination offset (skip)
-            .limit(limit)  # Pagination limit (number of records per page)
+            select(
+                AuditLog.id,
+                User.email.label("user"),
+                Action.name.label("action"),
+                AuditLog.record_id,
+                AuditLog.model_name,
+                AuditLog.ip_address,
+                AuditLog.notes,
+                AuditLog.actioned_at,
+            )
+            .outerjoin(User, AuditLog.user_id == User.id)
+            .outerjoin(Action, AuditLog.action_id == Action.id)
         )
 
-        # Execute the query for data with pagination
-        result = await session.execute(q)
-        response = result.scalars().all()
-
-        # Count the total number of records without pagination
-        count_query = select(func.count(AuditLog.id))
-        if keywords:
-            count_query = count_query.filter(AuditLog.model_name.ilike(f"%{keywords}%"))
-        count_response = await session.execute(count_query)
-        total_count = count_response.scalar()
-
-        # Calculate the total number of pages
-        total_pages = (total_count + limit - 1) // limit  # Ceiling of total_count / limit
-
-        # Calculate the current page based on skip and limit
-        current_page = skip // limit + 1 if total_count > 0 else 0
-
-        # Return the data along with pagination information
-        return {
-            "current_page": current_page,
-            "total_count": total_count,
-            "per_page": limit,
-            "total_pages": total_pages,
-            "data": response,
-        }
+        # Apply search keyword filter
+        q = self.search.filter(q, keywords)
+
+        q = self.filter_period(q, start_date, end_date).order_by(*self.search.order(keywords, desc(AuditLog.id)))
+
+        return self.exporter(q, AuditLog.__tablename__, format)
 
     async def own_activities(
         self,
@@ -78,6 +108,8 @@ class AuditLogService:
         keywords: Optional[str] = None,
         skip: int = 0,
         limit: int = 10,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
     ) -> dict:
         # Query dasar untuk audit_logs
         q = select(AuditLog).options(
@@ -86,42 +118,18 @@ class AuditLogService:
         )
 
         # Apply search keyword filter
-        if keywords:
-            q = q.filter(AuditLog.model_name.ilike(f"%{keywords}%"))
+        q = self.search.filter(q, keywords)
+
+        # Apply actioned_at range, only the matching monthly partitions are scanned
+        q = self.filter_period(q, start_date, end_date)
 
         q = (
-            q.order_by(desc(AuditLog.id))  # Order by AuditLog.id descending
-            .filter(AuditLog.user_id == request.state.authorize['user']['id'])  # Filter by user_id
-            .offset(skip)  # Pagination offset (skip)
-            .limit(limit)  # Pagination limit (number of records per page)
+            q.order_by(*self.search.order(keywords, desc(AuditLog.id)))  # Best match first, then newest
+            .filter(AuditLog.user_id == request.state.authorize.user.id)  # Filter by user_id
         )
 
-        # Execute the query for data with pagination
-        result = await session.execute(q)
-        response = result.scalars().all()
-
-        # Count the total number of records without pagination
-        count_query = select(func.count(AuditLog.id))
-        if keywords:
-            count_query = count_query.filter(AuditLog.model_name.ilike(f"%{keywords}%"))
-        count_query = count_query.filter(AuditLog.user_id == request.state.authorize['user']['id'])
-        count_response = await session.execute(count_query)
-        total_count = count_response.scalar()
-
-        # Calculate the total number of pages
-        total_pages = (total_count + limit - 1) // limit  # Ceiling of total_count / limit
-
-        # Calculate the current page based on skip and limit
-        current_page = skip // limit + 1 if total_count > 0 else 0
-
-        # Return the data along with pagination information
-        return {
-            "current_page": current_page,
-            "total_count": total_count,
-            "per_page": limit,
-            "total_pages": total_pages,
-            "data": response,
-        }
+        # Fetch the page and the total count in a single query
+        return await self.paginator(session, q, skip, limit)
 
     async def find(
         self, id: int, request: Request, session: AsyncSession
@@ -148,7 +156,7 @@ class AuditLogService:
         q = select(AuditLog).options(
             joinedload(AuditLog.user),  # Mengambil relasi 'user'
             joinedload(AuditLog.action),  # Mengambil relasi 'action'
-        ).filter(AuditLog.id == id).filter(AuditLog.user_id == request.state.authorize['user']['id'])
+        ).filter(AuditLog.id == id).filter(AuditLog.user_id == request.state.authorize.user.id)
 
         result = await session.execute(q)
         response = result.scalars().first()
@@ -2,7 +2,4 @@
 # -*- coding: utf-8 -*-
 # Copyright 2024 - Ika Raya Sentausa
 
-from . import models
-from . import routers
-from . import services
-from . import schemas
+from . import models  # Routers, services and schemas are imported by src/routers.py when the module is enabled
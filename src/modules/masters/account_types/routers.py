@@ -46,6 +46,18 @@ async def index(
     return await service.all(request, session, keywords, skip, limit)
 
 
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export(
+    request: Request,
+    keywords: str = Query(None),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    _: bool = Depends(
+        AccessControlBearer(permissions=["manage:account-types", "view:account-types"])
+    ),
+):
+    return await service.export(request, keywords, format)
+
+
 @router.get("/{id}", response_model=AccountTypeSchema, status_code=status.HTTP_200_OK)
 async def show(
     id: int,
@@ -2,42 +2,44 @@
 # -*- coding: utf-8 -*-
 # Copyright 2024 - Ika Raya Sentausa
 
+"""
+This module is used to register the routers of the modules.
+The routers, services and schemas of a module are imported only when it
+is enabled by APP_MODULES, so a deployment serving part of the API does
+not pay the import time of the others (the models are always imported).
+"""
+
+import importlib
 from fastapi import APIRouter
-from src.modules.authentications.auth.routers import router as auth_router
-from src.modules.authentications.roles.routers import router as role_router
-from src.modules.authentications.permissions.routers import router as permission_router
-from src.modules.authentications.users.routers import router as user_router
-from src.modules.authentications.menus.routers import router as menu_router
-
-# LOGS
-from src.modules.logs.actions.routers import router as action_router
-from src.modules.logs.audit_logs.routers import router as audit_log_router
-
-# MASTER ACCOUNTS
-from src.modules.masters.account_types.routers import router as account_type_router
-
-routers = APIRouter()  # Test Commit
-
-routers.include_router(auth_router, prefix=f"/auth", tags=["auth"])
-
-# Permissions
-routers.include_router(role_router, prefix=f"/access_controls/roles", tags=["roles"])
-routers.include_router(
-    permission_router, prefix=f"/access_controls/permissions", tags=["permissions"]
-)
-
-routers.include_router(user_router, prefix=f"/access_controls/users", tags=["users"])
-
-# Menus
-routers.include_router(menu_router, prefix=f"/access_controls/menus", tags=["menus"])
-
-# Logs
-routers.include_router(action_router, prefix=f"/logs/actions", tags=["actions"])
-routers.include_router(
-    audit_log_router, prefix=f"/logs/audit_logs", tags=["audit_logs"]
-)
-
-# Masters
-routers.include_router(
-    account_type_router, prefix=f"/masters/account_types", tags=["account_types"]
-)
\ No newline at end of file
+from src.configs import Config
+
+# (module, prefix, tag), in the order of the OpenAPI documentation
+MODULES = [
+    ("src.modules.authentications.auth", "/auth", "auth"),
+    # Permissions
+    ("src.modules.authentications.roles", "/access_controls/roles", "roles"),
+    ("src.modules.authentications.permissions", "/access_controls/permissions", "permissions"),
+    ("src.modules.authentications.users", "/access_controls/users", "users"),
+    # Menus
+    ("src.modules.authentications.menus", "/access_controls/menus", "menus"),
+    # Logs
+    ("src.modules.logs.actions", "/logs/actions", "actions"),
+    ("src.modules.logs.audit_logs", "/logs/audit_logs", "audit_logs"),
+    # Masters
+    ("src.modules.masters.account_types", "/masters/account_types", "account_types"),
+]
+
+
+def enabled(tag: str) -> bool:
+    modules = [module.strip() for module in Config.APP_MODULES.split(",") if module.strip()]
+    return not modules or tag in modules
+
+
+routers = APIRouter()
+
+for module, prefix, tag in MODULES:
+    # The models of every module are mapped, their relationships cross the modules
+    importlib.import_module(module)
+    if enabled(tag):
+        router = importlib.import_module(f"{module}.routers").router
+        routers.include_router(router, prefix=prefix, tags=[tag])
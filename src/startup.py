@@ -4,10 +4,15 @@
 
 import logging
 from src.databases import db  # Ensure db contains engine and session configurations
+from src.databases.fastpath import fastpath
+from src.configs import Config
 from src.databases.redis import (
+    aclient,
     RedisDB,
+    revocation_filter,
 )  # Ensure redisDB contains RedisDB configurations
 from src.utils.logging import Logging  # Import Logger class
+from src.utils.routes import route_permissions
 from datetime import datetime
 
 # Create an instance of the Logger class
@@ -15,7 +20,7 @@ logger = Logging(level="INFO")
 redisDB = RedisDB()
 
 
-async def on_startup():
+async def on_startup(app=None):
     """
     This function is called when the application starts.
     """
@@ -26,9 +31,33 @@ async def on_startup():
                 "info", "Database connected successfully."
             )  # Log success message
 
+        # Resolve the route permissions once, unknown names stop the startup
+        if app is not None:
+            async with db.session_maker() as session:
+                await route_permissions.compile(app, session)
+            logger.log(
+                "info", f"{len(route_permissions.table)} route permissions compiled."
+            )
+
+        # Pool of the raw queries of the authentication, opened before the first request
+        if Config.DB_FASTPATH:
+            await fastpath.connect()
+            logger.log("info", "Fast path pool connected successfully.")
+
+        # Replicas are optional, an unreachable one is skipped until it recovers
+        for index, replica in enumerate(db.replicas.engines):
+            try:
+                async with replica.connect() as conn:
+                    logger.log("info", f"Replica {index} connected successfully.")
+            except Exception as e:
+                db.replicas.mark_down(index, e)
+
         # Attempt to connect to the Redis database
         if redisDB.is_connected:
             logger.log("info", "Redis connected successfully.")
+
+            # Keep the local filter of the revoked sessions in sync
+            revocation_filter.start()
         else:
             logger.log("error", "Failed to connect to Redis.")
 
@@ -42,6 +71,16 @@ async def on_shutdown():
     """
     This function is called when the application stops.
     """
+    revocation_filter.stop()
+    await fastpath.close()
+    await aclient.aclose()
+
+    # A low hit ratio points to statements rebuilt with different SQL on every request
+    logger.log(
+        "info",
+        f"Compiled statement cache: {db.cache_stats.ratio():.1%} hits {dict(db.cache_stats.counts)}.",
+    )
+
     try:
         # Attempt to verify or disconnect the database
         async with db.engine.connect() as conn:
@@ -2,11 +2,5 @@
 # -*- coding: utf-8 -*-
 # Copyright 2024 - Ika Raya Sentausa
 
-from . import actions
-from . import logging
-from . import security
-from . import dependency
-from . import errors
-from . import pagination
-from . import chiper
-from . import parsers
+# The submodules are imported where they are used (from src.utils.security import ...),
+# importing src.utils.logging must not pull in the database and security modules
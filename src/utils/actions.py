@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 # Copyright 2024 - Ika Raya Sentausa
 
+import time
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 from fastapi.exceptions import HTTPException
@@ -10,9 +11,19 @@ from .logging import Logging
 
 
 class ActionType:
+    # Action ids by name, shared by every instance, {name: (expires_at, id)}.
+    # Actions are master data that rarely change, ActionService clears it on
+    # every mutation. The other workers only see the change after ttl seconds
+    ids: dict = {}
+    ttl: int = 300
+
     def __init__(self):
         self.logger = Logging(level="DEBUG")
 
+    @classmethod
+    def clear(cls):
+        cls.ids.clear()
+
     async def __call__(self, action_type: str, session: AsyncSession) -> int:
         from src.modules.logs.actions.models import Action
 
@@ -21,6 +32,10 @@ class ActionType:
         # V2
         action_type = action_type.upper()
 
+        entry = self.ids.get(action_type)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
         # Convert action type to singular
         q = select(Action).where(Action.name == action_type)
         action = await session.execute(q)
@@ -31,5 +46,5 @@ class ActionType:
                 status_code=status.HTTP_404_NOT_FOUND, detail="Action not found"
             )
 
-        # return response.id
+        self.ids[action_type] = (time.monotonic() + self.ttl, response.id)
         return response.id
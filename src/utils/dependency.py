@@ -20,6 +20,10 @@ from typing import List, Optional
 from src.utils.logging import Logging
 import logging
 from src.databases import db
+from src.databases.fastpath import fastpath
+from src.configs import Config
+from src.utils.permissions import PermissionBitmap
+from src.utils.structs import AuthContext
 
 redisDB = RedisDB()
 logger = Logging(level="DEBUG")
@@ -31,17 +35,22 @@ class JWTBearer(HTTPBearer):
 
     async def __call__(self, request: Request) -> HTTPAuthorizationCredentials:
         try:
-            data = await super(JWTBearer, self).__call__(request)
-            token = data.credentials
+            # The token is verified once per request, by the authorization
+            # middleware or the first bearer, the next ones reuse its context
+            user = getattr(request.state, "authorize", None)
+            if user is None:
+                data = await super(JWTBearer, self).__call__(request)
 
-            user = verify_token(token)
+                # Raises on an invalid or expired token
+                claims = verify_token(data.credentials)
+                user = AuthContext.from_claims(claims, request.client.host)
 
-            if not self.is_valid_token(token):
-                raise InvalidToken
+                # One pipelined lookup of the login session of the token
+                if not await redisDB.session_active(user):
+                    logger.log("warning", f"Token {user.jti} is revoked")
+                    raise RevokedToken
 
-            if await redisDB.token_in_blocklist(user["jti"]):
-                logger.log("warning", f"Token {user['jti']} is revoked")
-                raise RevokedToken
+                request.state.authorize = user
 
             self.verify(user)
 
@@ -58,7 +67,8 @@ class JWTBearer(HTTPBearer):
                     "error_code": "token_revoked",
                 },
             )
-        except InvalidToken as e:
+        except (InvalidToken, AccessTokenRequired, RefreshTokenRequired) as e:
+            # Handled by register_all_errors
             raise e
         except Exception as e:
             logging.exception(e)
@@ -67,26 +77,21 @@ class JWTBearer(HTTPBearer):
                 detail="Internal server error",
             )
 
-    def is_valid_token(self, token: str) -> bool:
-        token = verify_token(token)
-
-        return True if token is not None else False
-
-    def verify(self, token: dict) -> None:
+    def verify(self, token: AuthContext) -> None:
         raise NotImplementedError("You must implement this method in your subclass")
 
 
 class AccessTokenBearer(JWTBearer):
-    def verify(self, token: dict) -> None:
-        if token["refresh"]:
+    def verify(self, token: AuthContext) -> None:
+        if token.refresh:
             raise AccessTokenRequired
 
         return True
 
 
 class RefreshTokenBearer(JWTBearer):
-    def verify(self, token: dict) -> None:
-        if not token["refresh"]:
+    def verify(self, token: AuthContext) -> None:
+        if not token.refresh:
             raise RefreshTokenRequired
 
         return True
@@ -102,6 +107,10 @@ class AccessControlBearer(AccessTokenBearer):
         super(AccessControlBearer, self).__init__(auto_error=auto_error)
         self.menu_names = menu_names
         self.permissions = permissions
+        self.permission_ids = None  # Compiled at startup (src/utils/routes.py)
+        self.bitmap = PermissionBitmap()
+        self.mask = 0
+        self.mask_version = None
 
     async def __call__(
         self, request: Request, session: AsyncSession = Depends(db.session)
@@ -109,10 +118,16 @@ class AccessControlBearer(AccessTokenBearer):
         try:
 
             if token := await super(AccessControlBearer, self).__call__(request):
-                # call class UserPermissionBearer if role permission not found
-                access_control = await RolePermissionBearer(
-                    auto_error=True, permissions=self.permissions
-                )(request, session)
+                if Config.JWT_PERMISSION_BITMAP and token.pm is not None:
+                    # Permissions compiled into the token, no database lookup
+                    access_control = await self.bitmap_access(token, session)
+                else:
+                    # call class UserPermissionBearer if role permission not found
+                    access_control = await RolePermissionBearer(
+                        auto_error=True,
+                        permissions=self.permissions,
+                        permission_ids=self.permission_ids,
+                    ).role_access(token, session)
 
                 if not access_control:
                     # access_control = await UserPermissionBearer(
@@ -131,39 +146,75 @@ class AccessControlBearer(AccessTokenBearer):
                 detail=f"Internal server error: {e}",
             )
 
-    def verify(self, token: dict) -> None:
-        if token["refresh"]:
+    async def bitmap_access(self, token: AuthContext, session: AsyncSession):
+        version, *pv = await redisDB.permission_versions(token.user.role_id, token.user.id)
+        if token.pv != pv:
+            # The grants of the role or of the user changed after the token was issued
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail={
+                    "message": "Permissions have changed",
+                    "resolution": "Please refresh your token",
+                    "error_code": "permissions_changed",
+                },
+            )
+
+        # The required mask is compiled once per mst_permissions version, the grants don't change it
+        if self.mask_version != version:
+            self.mask = await self.bitmap.mask(self.permissions, session, version)
+            self.mask_version = version
+
+        if not self.bitmap.decode(token.pm) & self.mask:
+            return False
+
+        return token
+
+    def verify(self, token: AuthContext) -> None:
+        if token.refresh:
             raise AccessTokenRequired
 
         return True
 
 
 class RolePermissionBearer(AccessTokenBearer):
-    def __init__(self, auto_error: bool = True, permissions: List[str] = []):
+    # Permission check statements shared by every bearer, {by_ids: statement},
+    # used with DB_FASTPATH=false (the fast path runs its own prepared statement)
+    statements: dict = {}
+
+    def __init__(
+        self,
+        auto_error: bool = True,
+        permissions: List[str] = [],
+        permission_ids: Optional[List[int]] = None,
+    ):
         super(RolePermissionBearer, self).__init__(auto_error=auto_error)
         self.permissions = permissions
-
-    async def __call__(
-        self, request: Request, session: AsyncSession = Depends(db.session)
-    ) -> HTTPAuthorizationCredentials:
-        try:
-            from src.modules.authentications.roles.models import (
-                RolePermission,
-            )
-            from src.modules.authentications.roles.models import Role
+        self.permission_ids = permission_ids
+
+    def statement(self, by_ids: bool):
+        """
+        The permission check, built on the first request (the models are
+        imported lazily) and reused by every bearer, the role and the
+        permissions are bindparams so the compiled SQL is shared as well.
+        """
+        if by_ids not in self.statements:
+            from src.modules.authentications.roles.models import RolePermission, Role
             from src.modules.authentications.permissions.models import Permission
             from sqlalchemy.orm import joinedload
+            from sqlalchemy import bindparam
             from sqlmodel import select
 
-            # logger.log("warning", f"Permission required: {self.permissions}")
-            # logger.log(
-            #     "warning",
-            #     f"RoleID required: {request.state.authorize['user']['role_id']}",
-            # )
-
-            if token := await super(RolePermissionBearer, self).__call__(request):
+            if by_ids:
+                # Ids compiled at startup, a primary key lookup without joins
+                self.statements[by_ids] = (
+                    select(RolePermission.permission_id)
+                    .where(RolePermission.role_id == bindparam("role_id"))
+                    .where(RolePermission.permission_id.in_(bindparam("permissions", expanding=True)))
+                    .limit(1)
+                )
+            else:
                 # with where in permission
-                q = (
+                self.statements[by_ids] = (
                     select(RolePermission)
                     .join(Role)
                     .join(Permission)
@@ -171,16 +222,23 @@ class RolePermissionBearer(AccessTokenBearer):
                         joinedload(RolePermission.role),
                         joinedload(RolePermission.permission),
                     )
-                    .where(Permission.name.in_(self.permissions))
-                    .where(Role.id == token["user"]["role_id"])
+                    .where(Permission.name.in_(bindparam("permissions", expanding=True)))
+                    .where(Role.id == bindparam("role_id"))
                 )
-                result = await session.execute(q)
-                access = result.scalars().first()
+        return self.statements[by_ids]
 
-                if not access:
-                    return False
+    async def __call__(
+        self, request: Request, session: AsyncSession = Depends(db.session)
+    ) -> HTTPAuthorizationCredentials:
+        try:
+            # logger.log("warning", f"Permission required: {self.permissions}")
+            # logger.log(
+            #     "warning",
+            #     f"RoleID required: {request.state.authorize.user.role_id}",
+            # )
 
-                return token
+            if token := await super(RolePermissionBearer, self).__call__(request):
+                return await self.role_access(token, session)
 
         except HTTPException as e:
             raise e
@@ -191,8 +249,36 @@ class RolePermissionBearer(AccessTokenBearer):
                 detail=f"Internal server error: {e}",
             )
 
-    def verify(self, token: dict) -> None:
-        if token["refresh"]:
+    async def role_access(self, token: AuthContext, session: AsyncSession):
+        """Return the token if its role has one of the permissions, else False"""
+        by_ids = self.permission_ids is not None
+        if Config.DB_FASTPATH:
+            granted = await fastpath.has_permission(
+                token.user.role_id,
+                self.permission_ids if by_ids else self.permissions,
+                by_ids,
+            )
+            return token if granted else False
+
+        result = await session.execute(
+            self.statement(by_ids),
+            {
+                "role_id": token.user.role_id,
+                "permissions": self.permission_ids if by_ids else self.permissions,
+            },
+        )
+        if by_ids:
+            return token if result.first() else False
+
+        access = result.scalars().first()
+
+        if not access:
+            return False
+
+        return token
+
+    def verify(self, token: AuthContext) -> None:
+        if token.refresh:
             raise AccessTokenRequired
 
         return True
@@ -226,7 +312,7 @@ class UserPermissionBearer(JWTBearer):
                         joinedload(UserPermission.permission),
                     )
                     .where(Permission.name.in_(self.permissions))
-                    .where(User.id == token["user"]["id"])
+                    .where(User.id == token.user.id)
                 )
                 result = await session.execute(q)
                 access = result.scalars().first()
@@ -252,8 +338,8 @@ class UserPermissionBearer(JWTBearer):
                 detail=f"Internal server error: {e}",
             )
 
-    def verify(self, token: dict) -> None:
-        if token["refresh"]:
+    def verify(self, token: AuthContext) -> None:
+        if token.refresh:
             raise AccessTokenRequired
 
         return True
@@ -0,0 +1,89 @@
+# src/utils/exports.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used to stream query results as CSV or NDJSON files.
+Rows are fetched from a server-side cursor chunk by chunk, so an export
+uses the same memory whatever the size of the result.
+"""
+
+import io
+import csv
+import json
+from datetime import datetime
+from fastapi.responses import StreamingResponse
+from sqlalchemy.sql import Select
+from src.databases.db import Session
+from src.utils.logging import Logging
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class StreamExporter:
+    def __init__(self, chunk_size: int = 1000):
+        self.chunk_size = chunk_size
+        self.logger = Logging(level="DEBUG")
+
+    async def rows(self, query: Select):
+        """Yield the rows of `query` in chunks of `chunk_size`"""
+        # The request session is closed before a StreamingResponse is sent,
+        # so the stream owns its session (and cursor) until the last chunk,
+        # exports are read-only and may be served by a replica
+        async with Session(info={"read_only": True}) as session:
+            try:
+                result = await session.stream(
+                    query.execution_options(yield_per=self.chunk_size)
+                )
+                async for chunk in result.partitions():
+                    yield chunk
+            except Exception as e:
+                self.logger.log("error", f"Export failed: {e}")
+                raise
+
+    def serialize(self, value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    async def csv(self, query: Select, columns: list):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        writer.writerow(columns)
+        yield buffer.getvalue()
+
+        async for chunk in self.rows(query):
+            buffer.seek(0)
+            buffer.truncate(0)
+            writer.writerows([self.serialize(value) for value in row] for row in chunk)
+            yield buffer.getvalue()
+
+    async def ndjson(self, query: Select, columns: list):
+        async for chunk in self.rows(query):
+            yield "".join(
+                json.dumps(
+                    {key: self.serialize(value) for key, value in zip(columns, row)},
+                    default=str,
+                )
+                + "\n"
+                for row in chunk
+            )
+
+    def __call__(
+        self, query: Select, filename: str, format: str = "csv"
+    ) -> StreamingResponse:
+        """Build a StreamingResponse for the column select `query`"""
+        columns = [column["name"] for column in query.column_descriptions]
+        content = self.csv(query, columns) if format == "csv" else self.ndjson(query, columns)
+
+        return StreamingResponse(
+            content,
+            media_type=EXPORT_FORMATS[format],
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}_{datetime.now().strftime("%Y%m%d%H%M%S")}.{format}"'
+            },
+        )
@@ -0,0 +1,174 @@
+# src/utils/keys.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used to keep the JWT signing keys.
+With an asymmetric JWT_ALGORITHM (RS256, RS384, RS512 or EdDSA) the private
+keys are PEM files `{kid}.pem` on JWT_KEYS_DIR, the kid being their UTC
+creation time (YYYYmmddHHMMSS). The keys are parsed once and cached, the
+public keys are published on /.well-known/jwks.json.
+
+Rotation without downtime: a new key is published right away but only
+signs once it is JWT_KEY_ACTIVATION seconds old, so every instance and
+JWKS consumer knows it before the first token. Older keys still verify
+until they are pruned, after JWT_REFRESH_EXPIRY.
+With HS* algorithms JWT_SECRET_KEY is used and nothing is published.
+"""
+
+import os
+import time
+from datetime import datetime, timezone
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, ed25519
+from src.configs import Config
+from src.utils.logging import Logging
+
+KID_FORMAT = "%Y%m%d%H%M%S"
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "RS384", "RS512", "EdDSA")
+
+
+class KeySet:
+    def __init__(
+        self,
+        algorithm: str = "HS256",
+        directory: str = "storage/keys",
+        secret: str = "secret",
+        activation: int = 300,
+        reload: int = 60,
+    ):
+        self.algorithm = algorithm
+        self.directory = directory
+        self.secret = secret
+        self.activation = activation
+        self.reload = reload
+        self.keys = {}  # {kid: (private key, public key)}
+        self.loaded_at = 0.0
+        self.logger = Logging(level="DEBUG")
+
+    @property
+    def asymmetric(self) -> bool:
+        return self.algorithm in ASYMMETRIC_ALGORITHMS
+
+    def created_at(self, kid: str) -> float:
+        return (
+            datetime.strptime(kid, KID_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+        )
+
+    def load(self) -> None:
+        """Parse the new key files, drop the removed ones"""
+        kids = set()
+        if os.path.isdir(self.directory):
+            kids = {
+                file[:-4] for file in os.listdir(self.directory) if file.endswith(".pem")
+            }
+
+        for kid in kids - self.keys.keys():
+            with open(os.path.join(self.directory, f"{kid}.pem"), "rb") as file:
+                private_key = serialization.load_pem_private_key(file.read(), None)
+            self.keys[kid] = (private_key, private_key.public_key())
+
+        for kid in self.keys.keys() - kids:
+            del self.keys[kid]
+
+        self.loaded_at = time.monotonic()
+
+    def refresh(self, force: bool = False) -> None:
+        elapsed = time.monotonic() - self.loaded_at
+        # A forced reload (unknown kid) is still limited to one per second
+        if elapsed >= self.reload or (force and elapsed >= 1):
+            self.load()
+
+    def signing_key(self) -> tuple:
+        """(kid, key) of the newest active key"""
+        if not self.asymmetric:
+            return None, self.secret
+
+        self.refresh()
+        if not self.keys:
+            raise RuntimeError(
+                f"No JWT signing key on {self.directory}, run python madhai --jwt-key"
+            )
+
+        kids = sorted(self.keys)
+        active = [kid for kid in kids if self.created_at(kid) + self.activation <= time.time()]
+        # The very first key signs right away, nothing else could
+        kid = active[-1] if active else kids[0]
+        return kid, self.keys[kid][0]
+
+    def verification_key(self, kid: str = None):
+        if not self.asymmetric:
+            return self.secret
+
+        self.refresh()
+        if kid not in self.keys:
+            # Another instance may have rotated the key
+            self.refresh(force=True)
+        if kid not in self.keys:
+            raise jwt.InvalidTokenError(f"Unknown key id {kid}")
+
+        return self.keys[kid][1]
+
+    def jwks(self) -> dict:
+        if not self.asymmetric:
+            return {"keys": []}
+
+        self.refresh()
+        algorithm = jwt.algorithms.get_default_algorithms()[self.algorithm]
+        keys = []
+        for kid in sorted(self.keys, reverse=True):
+            jwk = algorithm.to_jwk(self.keys[kid][1], as_dict=True)
+            jwk.update({"kid": kid, "alg": self.algorithm, "use": "sig"})
+            keys.append(jwk)
+        return {"keys": keys}
+
+    def generate(self) -> str:
+        """Write a new private key for the algorithm, return its kid"""
+        if not self.asymmetric:
+            raise ValueError(f"{self.algorithm} does not use key pairs")
+
+        if self.algorithm == "EdDSA":
+            private_key = ed25519.Ed25519PrivateKey.generate()
+        else:
+            private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+        kid = datetime.now(timezone.utc).strftime(KID_FORMAT)
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{kid}.pem")
+        with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as file:
+            file.write(
+                private_key.private_bytes(
+                    encoding=serialization.Encoding.PEM,
+                    format=serialization.PrivateFormat.PKCS8,
+                    encryption_algorithm=serialization.NoEncryption(),
+                )
+            )
+
+        self.load()
+        return kid
+
+    def prune(self, retention: int) -> list:
+        """Remove the keys replaced by an active key more than `retention` seconds ago"""
+        self.load()
+        now = time.time()
+        kids = sorted(self.keys)
+        removed = []
+        for kid, successor in zip(kids, kids[1:]):
+            # The successor signs since its activation, tokens of kid expire after
+            if self.created_at(successor) + self.activation + retention <= now:
+                os.remove(os.path.join(self.directory, f"{kid}.pem"))
+                removed.append(kid)
+
+        self.load()
+        return removed
+
+
+keyset = KeySet(
+    Config.JWT_ALGORITHM,
+    Config.JWT_KEYS_DIR,
+    Config.JWT_SECRET_KEY,
+    Config.JWT_KEY_ACTIVATION,
+    Config.JWT_KEYS_RELOAD,
+)
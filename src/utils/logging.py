@@ -11,18 +11,23 @@ from datetime import datetime
 
 
 class Logging:
+    # Level the global loguru logger is configured with, shared by every instance
+    configured = None
+
     def __init__(self, level="DEBUG"):
         """
         Initializes the Logger instance with a specified log level.
         Default is 'DEBUG'.
         """
         self.level = level
-        self.configure_logger()
+        if Logging.configured != level:
+            self.configure_logger()  # Services create loggers on import, configure only once per level
 
     def configure_logger(self):
         """
         Configures the loguru logger with colorized output and custom log format.
         """
+        Logging.configured = self.level
         logger.remove()  # Remove the default logger configuration (This should be called on the global `logger`)
 
         # Add a new handler for logging to the console with color and custom format
@@ -77,17 +82,26 @@ class ActivityLog(Logging):
 
     async def __call__(self, request: Request, body: dict, session: AsyncSession):
         from src.modules.logs.audit_logs.models import AuditLog
+        from src.modules.authentications.auth.services import ProfileCache
 
         """
         Log an activity performed by a user.
         """
+        user_id = int(body["user_id"]) if "user_id" in body else request.state.authorize.user.id
+        if "notes" in body:
+            notes = body["notes"]
+        else:
+            # The token only carries the user id, the email comes from the profile cache
+            profile = await ProfileCache().get(user_id, session)
+            notes = f"User {profile['email']} has performed an action"
+
         log = dict(
-            user_id=int(body["user_id"]) if "user_id" in body else int(request.state.authorize["user"]["id"]),
+            user_id=user_id,
             action_id=int(body["action_id"]),
             record_id=str(body["record_id"]),
-            ip_address=body["ip_address"] if "ip_address" in body else request.state.authorize["ip_address"],
+            ip_address=body["ip_address"] if "ip_address" in body else request.state.authorize.ip_address,
             model_name=str(body["model_name"]),
-            notes=body["notes"] if "notes" in body else f"User {request.state.authorize['user']['email']} has performed an action",
+            notes=notes,
         )
 
         # First, check if there's already a log for this action_id and record_id
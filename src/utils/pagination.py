@@ -4,6 +4,9 @@
 
 from pydantic import BaseModel
 from typing import List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.sql import Select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 # Schema for pagination
@@ -15,3 +18,52 @@ class PaginationSchema(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class Paginator:
+    """
+    Fetch one page of an ORM select together with the total count.
+    The total comes from count(*) OVER () on the same statement, so a page
+    costs a single round trip. Only an empty page past the first one needs a
+    separate count query.
+    """
+
+    async def __call__(
+        self, session: AsyncSession, query: Select, skip: int = 0, limit: int = 10
+    ) -> dict:
+        q = (
+            query.add_columns(func.count().over().label("total_count"))
+            .offset(skip)  # Pagination offset (skip)
+            .limit(limit)  # Pagination limit (number of records per page)
+        )
+
+        # unique() is required when collections are joined eager loaded
+        result = await session.execute(q)
+        rows = result.unique().all()
+
+        if rows:
+            total_count = rows[0].total_count
+        elif skip > 0:
+            # Skipped past the last row, the window has nothing to count
+            total_count = await session.scalar(
+                select(func.count()).select_from(query.order_by(None).subquery())
+            )
+        else:
+            total_count = 0
+
+        return self.page([row[0] for row in rows], total_count, skip, limit)
+
+    def page(self, data: list, total_count: int, skip: int, limit: int) -> dict:
+        # Calculate the total number of pages
+        total_pages = (total_count + limit - 1) // limit  # Ceiling of total_count / limit
+
+        # Calculate the current page based on skip and limit
+        current_page = skip // limit + 1 if total_count > 0 else 0
+
+        return {
+            "current_page": current_page,
+            "total_count": total_count,
+            "per_page": limit,
+            "total_pages": total_pages,
+            "data": data,
+        }
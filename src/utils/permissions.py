@@ -0,0 +1,73 @@
+# src/utils/permissions.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used to compile the permissions of a user into a bitmap.
+Bit n stands for the n-th row of mst_permissions ordered by id, so new
+permissions are appended and the existing bits keep their meaning. The
+token carries the bitmap (`pm`) with the versions of the grants of its
+role and of its user (`pv`), a required permission list is compiled once
+per mst_permissions version into a mask and checked with a bitwise AND.
+"""
+
+import base64
+from sqlmodel import select
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+
+class PermissionBitmap:
+    # Shared by every instance, {permission name: bit} of one mst_permissions version
+    bits: dict = {}
+    version: int = None
+
+    async def load(self, session: AsyncSession, version: int) -> dict:
+        from src.modules.authentications.permissions.models import Permission
+
+        if PermissionBitmap.version != version:
+            result = await session.execute(
+                select(Permission.name).order_by(Permission.id)
+            )
+            PermissionBitmap.bits = {
+                name: bit for bit, name in enumerate(result.scalars().all())
+            }
+            PermissionBitmap.version = version
+
+        return PermissionBitmap.bits
+
+    async def mask(self, names: list, session: AsyncSession, version: int) -> int:
+        bits = await self.load(session, version)
+        mask = 0
+        for name in names:
+            if name in bits:
+                mask |= 1 << bits[name]
+        return mask
+
+    async def grants(
+        self, user_id: int, role_id: int, session: AsyncSession, version: int
+    ) -> int:
+        """Mask of the role permissions plus the user-level grants"""
+        from src.modules.authentications.permissions.models import Permission
+        from src.modules.authentications.roles.models import RolePermission
+        from src.modules.authentications.users.models import UserPermission
+
+        q = (
+            select(Permission.name)
+            .join(RolePermission, RolePermission.permission_id == Permission.id)
+            .where(RolePermission.role_id == role_id)
+            .union(
+                select(Permission.name)
+                .join(UserPermission, UserPermission.permission_id == Permission.id)
+                .where(UserPermission.user_id == user_id)
+            )
+        )
+        result = await session.execute(q)
+        return await self.mask(result.scalars().all(), session, version)
+
+    def encode(self, mask: int) -> str:
+        data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+    def decode(self, value: str) -> int:
+        data = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        return int.from_bytes(data, "little")
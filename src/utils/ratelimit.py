@@ -0,0 +1,121 @@
+# src/utils/ratelimit.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used to rate limit the routes with Redis sliding windows.
+Every policy keeps the timestamps of the accepted requests of a client in
+a sorted set, one Lua script checks all the policies of a route and only
+records the request when every window has room, so it is atomic across
+the instances. Rejected requests never reach the route (bcrypt, Postgres).
+The script runs on the asyncio client, the middleware doesn't block the
+event loop while it waits for Redis.
+"""
+
+import math
+import uuid
+from fnmatch import fnmatch
+from fastapi import Request
+from src.databases.redis import aclient
+from src.utils.logging import Logging
+
+# (method, path under the API prefix, scope, limit, window in seconds)
+# scope "ip" counts per client address, "user" per token user (or address)
+RATE_LIMITS = [
+    ("POST", "/auth/login", "ip", 10, 60),
+    ("POST", "/auth/login", "ip", 100, 3600),
+    ("POST", "/auth/register", "ip", 5, 3600),
+    ("POST", "/auth/refresh", "ip", 30, 60),
+    ("PATCH", "/*/give-*", "user", 30, 60),
+    ("PATCH", "/*/revoke-*", "user", 30, 60),
+    ("GET", "/*/export", "user", 5, 60),
+]
+
+# KEYS: one sorted set per policy, ARGV: request id, then limit and window (ms) per policy
+# Returns allowed, then remaining (before this request) and reset (ms) per policy
+SLIDING_WINDOW = aclient.register_script(
+    """
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+    local allowed = 1
+    local result = {}
+
+    for i, key in ipairs(KEYS) do
+        local limit = tonumber(ARGV[i * 2])
+        local window = tonumber(ARGV[i * 2 + 1])
+        redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+
+        local count = redis.call('ZCARD', key)
+        local reset = window
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        if oldest[2] then
+            reset = tonumber(oldest[2]) + window - now
+        end
+        if count >= limit then
+            allowed = 0
+        end
+
+        result[#result + 1] = limit - count
+        result[#result + 1] = reset
+    end
+
+    if allowed == 1 then
+        for i, key in ipairs(KEYS) do
+            redis.call('ZADD', key, now, ARGV[1])
+            redis.call('PEXPIRE', key, ARGV[i * 2 + 1])
+        end
+    end
+
+    table.insert(result, 1, allowed)
+    return result
+    """
+)
+
+
+class RateLimiter:
+    def __init__(self, policies: list = RATE_LIMITS):
+        self.policies = policies
+        self.logger = Logging(level="DEBUG")
+
+    def match(self, method: str, path: str) -> list:
+        return [
+            policy
+            for policy in self.policies
+            if policy[0] == method and fnmatch(path, policy[1])
+        ]
+
+    def client_id(self, request: Request, scope: str) -> str:
+        authorize = getattr(request.state, "authorize", None)
+        if scope == "user" and authorize:
+            return f"user:{authorize.user.id}"
+        return f"ip:{request.client.host}"
+
+    async def hit(self, request: Request, policies: list) -> tuple:
+        """(allowed, RateLimit-* headers) of a request"""
+        keys, args = [], [uuid.uuid4().hex]
+        for method, path, scope, limit, window in policies:
+            keys.append(
+                f"ratelimit:{method}:{path}:{window}:{self.client_id(request, scope)}"
+            )
+            args.extend([limit, window * 1000])
+
+        allowed, *windows = await SLIDING_WINDOW(keys=keys, args=args)
+
+        # The headers describe the policy closest to its limit
+        states = [
+            (windows[i * 2] - (1 if allowed else 0), windows[i * 2 + 1], policy)
+            for i, policy in enumerate(policies)
+        ]
+        remaining, reset, policy = min(states, key=lambda state: state[0])
+        reset = math.ceil(reset / 1000)
+
+        headers = {
+            "RateLimit-Limit": str(policy[3]),
+            "RateLimit-Remaining": str(max(remaining, 0)),
+            "RateLimit-Reset": str(reset),
+            "RateLimit-Policy": ", ".join(f"{p[3]};w={p[4]}" for p in policies),
+        }
+        if not allowed:
+            headers["Retry-After"] = str(reset)
+
+        return bool(allowed), headers
@@ -0,0 +1,83 @@
+# src/utils/routes.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used to compile the permissions required by the routes.
+At startup every AccessControlBearer of app.routes gets the ids of its
+permission names, resolved with one query against mst_permissions, so the
+per-request check compares integers. An unknown permission name stops
+the startup. The compiled table is exported with python madhai --routes.
+"""
+
+import csv
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from sqlmodel import select
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+
+class RoutePermissions:
+    def __init__(self):
+        self.table = []  # [{method, path, permission, permission_id}]
+
+    def bearers(self, dependant) -> list:
+        """AccessControlBearer instances of a route, sub-dependencies included"""
+        from src.utils.dependency import AccessControlBearer
+
+        found = []
+        for dependency in dependant.dependencies:
+            if isinstance(dependency.call, AccessControlBearer):
+                found.append(dependency.call)
+            found.extend(self.bearers(dependency))
+        return found
+
+    def collect(self, app: FastAPI) -> list:
+        """(methods, path, bearer) of every route requiring permissions"""
+        routes = []
+        for route in app.routes:
+            if not isinstance(route, APIRoute):
+                continue
+            for bearer in self.bearers(route.dependant):
+                if bearer.permissions:
+                    routes.append((sorted(route.methods), route.path, bearer))
+        return routes
+
+    async def compile(self, app: FastAPI, session: AsyncSession) -> list:
+        from src.modules.authentications.permissions.models import Permission
+
+        routes = self.collect(app)
+        names = {name for _, _, bearer in routes for name in bearer.permissions}
+
+        result = await session.execute(
+            select(Permission.id, Permission.name).where(Permission.name.in_(names))
+        )
+        ids = {name: id for id, name in result.all()}
+
+        missing = sorted(names - ids.keys())
+        if missing:
+            raise RuntimeError(
+                f"Unknown permissions required by the routes: {', '.join(missing)}"
+            )
+
+        self.table = []
+        for methods, path, bearer in routes:
+            bearer.permission_ids = [ids[name] for name in bearer.permissions]
+            self.table.extend(
+                {"method": method, "path": path, "permission": name, "permission_id": ids[name]}
+                for method in methods
+                for name in bearer.permissions
+            )
+
+        return self.table
+
+    def export(self, path: str) -> None:
+        with open(path, "w", newline="") as file:
+            writer = csv.DictWriter(
+                file, fieldnames=["method", "path", "permission", "permission_id"]
+            )
+            writer.writeheader()
+            writer.writerows(self.table)
+
+
+route_permissions = RoutePermissions()
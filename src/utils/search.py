@@ -0,0 +1,46 @@
+# src/utils/search.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used to filter and rank list queries by keywords.
+The condition is a substring ILIKE, served by the pg_trgm GIN indexes of
+the searched columns, and the rank is the pg_trgm similarity. The same
+condition must be applied to the data query and to the count query.
+"""
+
+from typing import Optional
+from sqlalchemy import or_, desc, func
+
+
+class Search:
+    def __init__(self, *columns):
+        self.columns = columns
+
+    def escape(self, keywords: str) -> str:
+        """Escape the LIKE wildcards so keywords are matched literally"""
+        return keywords.replace("/", "//").replace("%", "/%").replace("_", "/_")
+
+    def condition(self, keywords: str):
+        pattern = f"%{self.escape(keywords.strip())}%"
+        return or_(*(column.ilike(pattern, escape="/") for column in self.columns))
+
+    def rank(self, keywords: str):
+        keywords = keywords.strip()
+        if len(self.columns) == 1:
+            return func.similarity(self.columns[0], keywords)
+        return func.greatest(
+            *(func.similarity(column, keywords) for column in self.columns)
+        )
+
+    def filter(self, q, keywords: Optional[str] = None):
+        """Apply the keyword condition to a data or count query"""
+        if keywords and keywords.strip():
+            q = q.filter(self.condition(keywords))
+        return q
+
+    def order(self, keywords: Optional[str] = None, *default) -> list:
+        """Order by best match first when searching, then by `default`"""
+        if keywords and keywords.strip():
+            return [desc(self.rank(keywords)), *default]
+        return list(default)
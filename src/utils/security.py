@@ -13,6 +13,7 @@ import base64
 import jwt
 from datetime import timedelta, datetime
 from src.configs import Config
+from src.utils.keys import keyset
 import uuid
 import logging
 from fastapi.exceptions import HTTPException
@@ -36,21 +37,29 @@ def verify_password(plain_password, hashed_password):
     )
 
 
-def generate_token(data: dict, expiry: timedelta = None, refresh: bool = False):
-    payload = {}
-
-    payload["user"] = data
+def generate_token(
+    data: dict,
+    expiry: timedelta = None,
+    refresh: bool = False,
+    session_id: str = None,
+    jti: str = None,
+):
+    # Compact claims (sub, rid, pv), the profile is looked up server side
+    payload = dict(data)
     payload["exp"] = datetime.now() + (
         expiry if expiry is not None else timedelta(seconds=Config.JWT_EXPIRY)
     )
 
-    payload["jti"] = str(uuid.uuid4())
+    payload["jti"] = jti or str(uuid.uuid4())
+    payload["sid"] = session_id  # Login session (family) of the token
     payload["refresh"] = refresh
 
+    kid, key = keyset.signing_key()
     access_token = jwt.encode(
         payload=payload,
-        key=Config.JWT_SECRET_KEY,
+        key=key,
         algorithm=Config.JWT_ALGORITHM,
+        headers={"kid": kid} if kid else None,
     )
 
     return access_token
@@ -58,11 +67,13 @@ def generate_token(data: dict, expiry: timedelta = None, refresh: bool = False):
 
 def verify_token(token: str):
     try:
+        # The key is parsed once by the key set, not per token
+        kid = jwt.get_unverified_header(token).get("kid")
         payload = jwt.decode(
             jwt=token,
-            key=Config.JWT_SECRET_KEY,
+            key=keyset.verification_key(kid),
             algorithms=[Config.JWT_ALGORITHM],
-            options={"verify_exp": True},
+            options={"verify_exp": True, "require": ["sub", "exp"]},
         )
         return payload
     except jwt.ExpiredSignatureError as e:
@@ -0,0 +1,271 @@
+# src/utils/services.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used as the base of the CRUD services of the modules.
+A service only declares its model (and the optional class attributes
+below) and overrides the hooks it needs, the query building, pagination,
+soft delete filtering, duplicate checks, audit logs and read cache are
+shared by every module.
+"""
+
+import time
+from sqlmodel import SQLModel, select, desc
+from sqlalchemy import bindparam
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm import joinedload
+from fastapi.exceptions import HTTPException
+from fastapi import status, Request
+from typing import Optional
+from src.modules.logs.audit_logs.models import AuditLog
+from src.utils.logging import Logging, ActivityLog
+from src.utils.actions import ActionType
+from src.utils.search import Search
+from src.utils.pagination import Paginator
+from src.utils.helper import DuplicateChecker
+
+
+class BaseService:
+    model: SQLModel = None  # The table model of the module
+    search_columns: tuple = ()  # Columns searched by keywords, default (model.name,)
+    unique_fields: tuple = ("name",)  # Fields checked by DuplicateChecker
+    cache_ttl: int = 0  # Seconds the select() list is cached, 0 disables the cache
+
+    # Read cache shared by the instances of a service, {tablename: (expires_at, data)}.
+    # A mutation only invalidates it in its own worker, the other workers
+    # serve the old list until cache_ttl expires, keep it short
+    cache: dict = {}
+
+    # Prebuilt statements of the services, {(service class, key): statement}
+    statements: dict = {}
+
+    def __init__(self):
+        self.logger = Logging(level="DEBUG")
+        self.activity_log = ActivityLog(level="DEBUG")
+        self.action_type = ActionType()
+        self.paginator = Paginator()
+        self.search = Search(*(self.search_columns or (self.model.name,)))
+        self.name = self.model.__name__
+
+    def options(self) -> list:
+        """Loader options of all/trash/find, override to load more relations"""
+        return [
+            joinedload(self.model.audit_logs),
+            joinedload(self.model.audit_logs).joinedload(AuditLog.user),
+            joinedload(self.model.audit_logs).joinedload(AuditLog.action),
+        ]
+
+    def prepare(self, data: dict) -> dict:
+        """Normalize the request body before create/update, e.g. title-case names"""
+        return data
+
+    async def query(self, trashed: Optional[bool] = False):
+        """Select the model, trashed=None disables the soft delete filter"""
+        q = select(self.model)
+        if trashed is None:
+            return q
+
+        is_trashed = await AuditLog().is_trashed(self.model)
+        return q.filter(is_trashed if trashed else ~is_trashed)
+
+    async def prepared(self, key, build):
+        """
+        Build a statement once per service class and reuse it, the values are
+        bindparams passed on execute. Every request then executes the same
+        statement object, its cache key and compiled SQL are computed once.
+        """
+        key = (self.__class__, key)
+        if key not in self.statements:
+            self.statements[key] = await build()
+        return self.statements[key]
+
+    async def paginate(
+        self,
+        session: AsyncSession,
+        keywords: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 10,
+        trashed: bool = False,
+    ) -> dict:
+        q = self.search.filter(await self.query(trashed), keywords)
+        q = q.options(*self.options()).order_by(
+            *self.search.order(keywords, desc(self.model.id))  # Best match first, then newest
+        )
+
+        # Fetch the page and the total count in a single query
+        return await self.paginator(session, q, skip, limit)
+
+    async def all(
+        self,
+        request: Request,
+        session: AsyncSession,
+        keywords: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 10,
+    ) -> dict:
+        return await self.paginate(session, keywords, skip, limit)
+
+    async def trash(
+        self,
+        request: Request,
+        session: AsyncSession,
+        keywords: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 10,
+    ) -> dict:
+        return await self.paginate(session, keywords, skip, limit, trashed=True)
+
+    async def find_query(self, trashed: Optional[bool] = False):
+        """The statement of find(), the id is bound on execute"""
+        async def build():
+            return (await self.query(trashed)).options(*self.options()).where(self.model.id == bindparam("id"))
+
+        return await self.prepared(("find", trashed), build)
+
+    async def find(
+        self,
+        id: int,
+        request: Request,
+        session: AsyncSession,
+        trashed: Optional[bool] = False,
+    ):
+        result = await session.execute(await self.find_query(trashed), {"id": id})
+        response = result.unique().scalars().first()
+        if response is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=f"{self.name} not found"
+            )
+        return response
+
+    async def find_trash(self, id: int, request: Request, session: AsyncSession):
+        return await self.find(id, request, session, trashed=True)
+
+    async def find_many(self, ids: list, request: Request, session: AsyncSession) -> list:
+        """Fetch several records in one query, 404 when any of them is missing"""
+        q = (await self.query()).where(self.model.id.in_(ids)).order_by(self.model.id)
+        result = await session.execute(q)
+        response = result.scalars().all()
+        if len(response) != len(set(ids)):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=f"{self.name} not found"
+            )
+        return response
+
+    async def select(self, request: Request, session: AsyncSession) -> list:
+        cached = self.cached()
+        if cached is not None:
+            return cached
+
+        async def build():
+            return (await self.query()).order_by(self.model.id)
+
+        q = await self.prepared("select", build)
+        result = await session.execute(q)
+        response = result.scalars().all()
+
+        if self.cache_ttl:
+            # Cache plain column values, ORM instances must not outlive their session
+            columns = [column.name for column in self.model.__table__.columns]
+            response = [
+                {column: getattr(record, column) for column in columns}
+                for record in response
+            ]
+            self.cache[self.model.__tablename__] = (
+                time.monotonic() + self.cache_ttl,
+                response,
+            )
+
+        return response
+
+    def cached(self):
+        entry = self.cache.get(self.model.__tablename__)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def invalidate(self):
+        """Drop the cached reads of the model, called after every mutation"""
+        self.cache.pop(self.model.__tablename__, None)
+
+    async def check_duplicate(self, body, session: AsyncSession):
+        if self.unique_fields:
+            checker = DuplicateChecker(self.model, session)
+            await checker.check({field: getattr(body, field) for field in self.unique_fields})
+
+    async def is_used(self, id: int, session: AsyncSession) -> bool:
+        if hasattr(self.model, "is_used"):
+            return await self.model().is_used(id, session)
+        return False
+
+    async def audit(self, action: str, id: int, request: Request, session: AsyncSession):
+        await self.activity_log(
+            request=request,
+            body={
+                "action_id": await self.action_type(action, session),
+                "record_id": id,
+                "model_name": self.model.__tablename__,
+            },
+            session=session,
+        )
+
+    async def create(self, request: Request, body, session: AsyncSession):
+        # Check if the record already exists
+        await self.check_duplicate(body, session)
+        try:
+            record = self.model(**self.prepare(body.dict()))
+            session.add(record)
+            await session.commit()
+
+            await self.audit("CREATE", record.id, request, session)
+            self.invalidate()
+
+            return record
+        except Exception as e:
+            await session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+            )
+
+    async def update(self, id: int, request: Request, body, session: AsyncSession):
+        # Check if the record already exists
+        await self.check_duplicate(body, session)
+
+        response = await self.find(id, request, session)
+        try:
+            for key, value in self.prepare(body.dict()).items():
+                setattr(response, key, value)
+            await session.commit()
+
+            await self.audit("UPDATE", id, request, session)
+            self.invalidate()
+
+            return response
+        except Exception as e:
+            await session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+            )
+
+    async def destroy(self, id: int, request: Request, session: AsyncSession):
+        response = await self.find(id, request, session)
+
+        if await self.is_used(id, session):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot delete this data because it is used in other transactions",
+            )
+
+        # Soft delete, the record is trashed by its DELETE audit log
+        await self.audit("DELETE", id, request, session)
+        self.invalidate()
+
+        return response
+
+    async def restore(self, id: int, request: Request, session: AsyncSession):
+        response = await self.find_trash(id, request, session)
+
+        await self.audit("RESTORE", id, request, session)
+        self.invalidate()
+
+        return response
@@ -0,0 +1,182 @@
+# src/utils/static.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used to serve the static files (docs/, templates/) and the
+rendered landing page with caching headers. Only the suffixes of ASSETS are
+served, the path can't leave the directory, and the responses carry an
+ETag, Last-Modified and Cache-Control so the browsers revalidate them with
+a 304. The gzip/br variants (<file>.gz, <file>.br) are written at build
+time by precompress() and served as is. A file without a variant is
+compressed per request by CompressionMiddleware up to its BUFFERED bytes,
+a larger one is sent uncompressed. The landing page (Page) is compressed
+once, when it is rendered.
+"""
+
+import os
+import gzip
+import time
+import hashlib
+import mimetypes
+from email.utils import formatdate
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli  # Optional, see requirements.txt
+except ImportError:
+    brotli = None
+
+# Served directories and the suffixes allowed in them (index.html is a template, not an asset)
+ASSETS = {
+    "docs": (".md",),
+    "templates": (".svg", ".png", ".ico", ".css", ".js"),
+}
+
+# Preferred first, <file><suffix> holds the variant
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Highest level, the bodies are compressed once (build or startup), not per request"""
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=11)
+    return None
+
+
+def accepted(header: str, encodings=ENCODINGS) -> list:
+    """Encodings of `encodings` the Accept-Encoding header allows, in our preference order"""
+    allowed = set()
+    for item in header.lower().split(","):
+        name, _, params = item.partition(";")
+        name = name.strip()
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        allowed.add(name)
+    if "*" in allowed:
+        return list(encodings)
+    return [encoding for encoding in encodings if encoding in allowed]
+
+
+def precompress(directories: dict = ASSETS) -> list:
+    """
+    Write the gzip/br variants of the assets next to them (build step), a
+    variant larger than 90% of its file is not kept. Returns the written files.
+    """
+    written = []
+    for directory, suffixes in directories.items():
+        for root, _, files in os.walk(directory):
+            for file in files:
+                if os.path.splitext(file)[1] not in suffixes:
+                    continue
+                path = os.path.join(root, file)
+                stat = os.stat(path)
+                with open(path, "rb") as f:
+                    body = f.read()
+                for encoding, suffix in ENCODINGS.items():
+                    variant = compress(body, encoding)
+                    if variant is None:
+                        continue
+                    if len(variant) > len(body) * 0.9:
+                        if os.path.exists(path + suffix):
+                            os.remove(path + suffix)
+                        continue
+                    with open(path + suffix, "wb") as f:
+                        f.write(variant)
+                    # Same mtime as the file, an edited file is newer than its stale variants
+                    os.utime(path + suffix, (stat.st_atime, stat.st_mtime))
+                    written.append(path + suffix)
+    return written
+
+
+class Assets(StaticFiles):
+    """StaticFiles with a suffix allowlist, Cache-Control and the precompressed variants"""
+
+    def __init__(self, directory: str, suffixes: tuple, max_age: int = 3600):
+        super().__init__(directory=directory)
+        self.suffixes = suffixes
+        self.cache_control = f"public, max-age={max_age}"
+        # {(file, encoding): (variant, stat)}, indexed once, the variants only change on deploy
+        self.variants = {}
+        for root, _, files in os.walk(os.path.realpath(directory)):
+            for file in files:
+                for encoding, suffix in ENCODINGS.items():
+                    if file.endswith(suffix):
+                        path = os.path.join(root, file)
+                        self.variants[(path[: -len(suffix)], encoding)] = (path, os.stat(path))
+
+    async def get_response(self, path: str, scope) -> Response:
+        name = os.path.basename(path)
+        if name.startswith(".") or os.path.splitext(name)[1] not in self.suffixes:
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        headers = {"Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        media_type = mimetypes.guess_type(str(full_path))[0] or "text/plain"
+
+        for encoding in accepted(request_headers.get("accept-encoding", "")):
+            variant = self.variants.get((str(full_path), encoding))
+            if variant is not None and variant[1].st_mtime >= stat_result.st_mtime:
+                full_path, stat_result = variant
+                headers["Content-Encoding"] = encoding
+                break
+
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            stat_result=stat_result,
+            media_type=media_type,
+            headers=headers,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class Page:
+    """A page rendered once and served from memory, with its compressed bodies"""
+
+    def __init__(self, body: bytes, media_type: str = "text/html; charset=utf-8", max_age: int = 3600):
+        self.media_type = media_type
+        self.digest = hashlib.md5(body).hexdigest()
+        self.last_modified = formatdate(time.time(), usegmt=True)
+        self.cache_control = f"public, max-age={max_age}"
+        self.bodies = {None: body}
+        for encoding in ENCODINGS:
+            compressed = compress(body, encoding)
+            if compressed is not None and len(compressed) < len(body):
+                self.bodies[encoding] = compressed
+
+    def response(self, request: Request) -> Response:
+        encoding = next(
+            (encoding for encoding in accepted(request.headers.get("accept-encoding", "")) if encoding in self.bodies),
+            None,
+        )
+        # Every representation has its own ETag
+        etag = f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": self.last_modified,
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        tags = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(self.bodies[encoding], media_type=self.media_type, headers=headers)
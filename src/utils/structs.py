@@ -0,0 +1,96 @@
+# src/utils/structs.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used for the small immutable objects built on every request.
+The auth context of the token (request.state.authorize) is a NamedTuple, a
+tuple without __dict__ that is cheaper to build than a class. The nodes of
+the menu hierarchy are __slots__ structs encoded to JSON directly, without
+a Pydantic model in between.
+"""
+
+import json
+from typing import NamedTuple, Optional
+from fastapi.responses import Response
+
+setattr_ = object.__setattr__  # Bypasses Struct.__setattr__ while an instance is built
+
+
+class Struct:
+    """Immutable record encoded as a JSON object, the fields are the __slots__ of the subclass"""
+
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        if kwargs:
+            args = args + tuple(kwargs.get(name) for name in self.__slots__[len(args):])
+        for name, value in zip(self.__slots__, args):
+            setattr_(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def dict(self) -> dict:
+        """Shallow, the nested structs are left to the encoder"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def encode(value) -> bytes:
+    """JSON of structs, lists and JSON types, the same output as JSONResponse"""
+    return json.dumps(
+        value,
+        default=Struct.dict,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class StructResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return encode(content)
+
+
+class UserContext(NamedTuple):
+    id: int
+    role_id: Optional[int]
+
+
+class AuthContext(NamedTuple):
+    """
+    The verified token of a request (request.state.authorize), the profile
+    (name, email...) is not part of it, see ProfileCache.
+    """
+
+    user: UserContext
+    jti: Optional[str]
+    sid: Optional[str]
+    exp: int
+    refresh: bool
+    pv: Optional[list]  # [role, user] permission versions
+    pm: Optional[str]
+    ip_address: Optional[str] = None
+
+    @classmethod
+    def from_claims(cls, claims: dict, ip_address: str = None) -> "AuthContext":
+        get = claims.get
+        return cls(
+            UserContext(int(claims["sub"]), get("rid")),
+            get("jti"),
+            get("sid"),
+            claims["exp"],
+            bool(get("refresh")),
+            get("pv"),
+            get("pm"),
+            ip_address,
+        )
@@ -0,0 +1,137 @@
+# sync/bulk.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used to bulk seed large volumes of rows through COPY.
+A source streams the rows of one table, either records from a generator
+(copy_records_to_table, binary COPY) or a CSV file with a header row
+(copy_to_table, parsed by PostgreSQL). The tables are loaded level by level
+in foreign key order, read from pg_constraint, and the tables of a level
+are copied concurrently on a small connection pool.
+"""
+
+import os
+import time
+import asyncio
+import asyncpg
+from typing import Callable, Iterable, Optional
+from src.configs import Config
+from src.utils.logging import Logging
+
+logger = Logging(level="DEBUG")
+
+
+class Source:
+    def __init__(
+        self,
+        table: str,
+        columns: Optional[list] = None,
+        rows: Optional[Callable[[], Iterable]] = None,
+        path: Optional[str] = None,
+    ):
+        """
+        rows is a callable returning an iterable of tuples in the order of
+        `columns`, path is a CSV file whose header names the columns.
+        """
+        self.table = table
+        self.columns = columns
+        self.rows = rows
+        self.path = path
+
+    async def copy(self, connection) -> int:
+        if self.path:
+            status = await connection.copy_to_table(
+                self.table, source=self.path, columns=self.columns, format="csv", header=True
+            )
+        else:
+            status = await connection.copy_records_to_table(
+                self.table, records=self.rows(), columns=self.columns
+            )
+        return int(status.split()[-1])  # COPY <rows>
+
+
+def csv_sources(directory: str) -> list:
+    """One source per <table>.csv file of the directory"""
+    sources = []
+    for file in sorted(os.listdir(directory)):
+        if file.endswith(".csv"):
+            path = os.path.join(directory, file)
+            with open(path, newline="") as f:
+                columns = [column.strip() for column in f.readline().strip().split(",")]
+            sources.append(Source(file[:-4], columns, path=path))
+    return sources
+
+
+async def levels(connection, tables: list) -> list:
+    """Group the tables in foreign key order, a level only references the levels before it"""
+    rows = await connection.fetch(
+        """
+        SELECT c.conrelid::regclass::text AS child, c.confrelid::regclass::text AS parent
+        FROM pg_constraint c WHERE c.contype = 'f'
+        """
+    )
+    parents = {table: set() for table in tables}
+    for row in rows:
+        if row["child"] in parents and row["parent"] in parents and row["child"] != row["parent"]:
+            parents[row["child"]].add(row["parent"])
+
+    result = []
+    while parents:
+        level = [table for table, depends in parents.items() if not depends]
+        if not level:
+            raise RuntimeError(f"Circular foreign keys between {', '.join(parents)}")
+        result.append(level)
+        for table in level:
+            del parents[table]
+        for depends in parents.values():
+            depends.difference_update(level)
+    return result
+
+
+async def reset_sequence(connection, table: str):
+    """Move the id sequence past the copied ids, setval(NULL) is a no-op for non serial ids"""
+    await connection.execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), MAX(id)) FROM {table} HAVING MAX(id) IS NOT NULL"
+    )
+
+
+async def copy(sources: list, pool_size: int = 4) -> int:
+    """Copy the sources in foreign key order, return the number of rows copied"""
+    by_table = {}
+    for source in sources:
+        by_table.setdefault(source.table, []).append(source)
+
+    async def load(pool, source: Source) -> int:
+        async with pool.acquire() as connection:
+            start_time = time.perf_counter()
+            count = await source.copy(connection)
+            if source.columns is None or "id" in source.columns:
+                await reset_sequence(connection, source.table)
+            elapsed = time.perf_counter() - start_time
+            logger.log(
+                "info",
+                f"{source.table}: {count} rows in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} rows/sec)",
+            )
+            return count
+
+    start_time = time.perf_counter()
+    total = 0
+    async with asyncpg.create_pool(
+        Config.DATABASE_URL.replace("+asyncpg", ""), min_size=1, max_size=pool_size
+    ) as pool:
+        async with pool.acquire() as connection:
+            order = await levels(connection, list(by_table))
+
+        for level in order:
+            counts = await asyncio.gather(
+                *(load(pool, source) for table in level for source in by_table[table])
+            )
+            total += sum(counts)
+
+    elapsed = time.perf_counter() - start_time
+    logger.log(
+        "info",
+        f"Bulk seed: {total} rows in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} rows/sec)",
+    )
+    return total
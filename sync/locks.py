@@ -0,0 +1,184 @@
+# sync/locks.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used to analyze the lock impact of the pending migrations.
+The SQL of a migration is recorded instead of executed, split into
+statements and matched against the lock rules of PostgreSQL: the lock
+level taken on the table, what it blocks, and whether the table is
+rewritten or scanned while the lock is held. The cost is estimated from the
+size of the table (all its partitions) and SCAN_RATE.
+"""
+
+import re
+from src.utils.logging import Logging
+
+logger = Logging(level="DEBUG")
+
+SCAN_RATE = 50 * 1024 * 1024  # Bytes/s read or written by a rewrite, scan or index build, a rough estimate
+
+# Weakest to strongest
+LEVELS = ["ROW EXCLUSIVE", "SHARE UPDATE EXCLUSIVE", "SHARE", "SHARE ROW EXCLUSIVE", "ACCESS EXCLUSIVE"]
+
+BLOCKS = {
+    "ACCESS EXCLUSIVE": "reads and writes",
+    "SHARE ROW EXCLUSIVE": "writes",
+    "SHARE": "writes",
+    "SHARE UPDATE EXCLUSIVE": "other DDL and vacuum only",
+    "ROW EXCLUSIVE": "writes of the same rows",
+}
+
+TABLE = r'(?:ONLY\s+)?(?:IF\s+EXISTS\s+)?"?(?P<table>[\w.]+)"?'
+VOLATILE = re.compile(r"\b(random|clock_timestamp|timeofday|nextval|gen_random_uuid|uuid_generate_\w+)\s*\(|\b(BIG|SMALL)?SERIAL\b", re.I)
+
+# (pattern, lock, effect, hint), the first matching rule wins
+RULES = [
+    (r"CREATE\s+(UNIQUE\s+)?INDEX\s+CONCURRENTLY\b.*?\bON\s+" + TABLE, "SHARE UPDATE EXCLUSIVE", "build", None),
+    (r"CREATE\s+(UNIQUE\s+)?INDEX\b.*?\bON\s+" + TABLE, "SHARE", "build",
+     "use CREATE INDEX CONCURRENTLY in a migration with transactional = False (on a partitioned table, index each partition concurrently, then CREATE INDEX ON ONLY the parent and ATTACH them)"),
+    (r"DROP\s+INDEX\s+CONCURRENTLY\b", "SHARE UPDATE EXCLUSIVE", "metadata", None),
+    (r"DROP\s+INDEX\b", "ACCESS EXCLUSIVE", "metadata", "use DROP INDEX CONCURRENTLY in a migration with transactional = False"),
+    (r"CREATE\s+TABLE\b.*?\bPARTITION\s+OF\s+" + TABLE, "ACCESS EXCLUSIVE", "metadata",
+     "create the table, then ALTER TABLE ... ATTACH PARTITION (SHARE UPDATE EXCLUSIVE on the parent)"),
+    (r"ALTER\s+TABLE\s+" + TABLE + r".*\bALTER\s+(COLUMN\s+)?\S+\s+(SET\s+DATA\s+)?TYPE\b", "ACCESS EXCLUSIVE", "rewrite",
+     "add a new column, backfill it in batches and swap the columns"),
+    (r"ALTER\s+TABLE\s+" + TABLE + r".*\bSET\s+NOT\s+NULL\b", "ACCESS EXCLUSIVE", "scan",
+     "ADD CONSTRAINT ... CHECK (column IS NOT NULL) NOT VALID, VALIDATE CONSTRAINT, then SET NOT NULL skips the scan"),
+    (r"ALTER\s+TABLE\s+" + TABLE + r".*\bADD\s+(CONSTRAINT\s+\S+\s+)?(PRIMARY\s+KEY|UNIQUE)\b", "ACCESS EXCLUSIVE", "build",
+     "CREATE UNIQUE INDEX CONCURRENTLY, then ADD CONSTRAINT ... USING INDEX"),
+    (r"ALTER\s+TABLE\s+" + TABLE + r"(?!.*\bNOT\s+VALID\b).*\bFOREIGN\s+KEY\b", "SHARE ROW EXCLUSIVE", "scan",
+     "add the constraint NOT VALID, then VALIDATE CONSTRAINT (SHARE UPDATE EXCLUSIVE)"),
+    (r"ALTER\s+TABLE\s+" + TABLE + r"(?!.*\bNOT\s+VALID\b).*\bCHECK\b", "ACCESS EXCLUSIVE", "scan",
+     "add the constraint NOT VALID, then VALIDATE CONSTRAINT (SHARE UPDATE EXCLUSIVE)"),
+    (r"ALTER\s+TABLE\s+" + TABLE + r".*\bVALIDATE\s+CONSTRAINT\b", "SHARE UPDATE EXCLUSIVE", "scan", None),
+    (r"ALTER\s+TABLE\s+" + TABLE + r".*\bDETACH\s+PARTITION\b.*\bCONCURRENTLY\b", "SHARE UPDATE EXCLUSIVE", "metadata", None),
+    (r"ALTER\s+TABLE\s+" + TABLE + r".*\bATTACH\s+PARTITION\b", "SHARE UPDATE EXCLUSIVE", "scan",
+     "add a CHECK constraint matching the bounds to the partition first, the attach then skips the scan"),
+    (r"ALTER\s+TABLE\s+" + TABLE + r".*\bADD\s+(COLUMN\s+)?", "ACCESS EXCLUSIVE", "metadata", None),
+    (r"ALTER\s+TABLE\s+" + TABLE, "ACCESS EXCLUSIVE", "metadata", None),
+    (r"(DROP\s+TABLE|TRUNCATE(\s+TABLE)?)\s+" + TABLE, "ACCESS EXCLUSIVE", "metadata", None),
+    (r"LOCK\s+(TABLE\s+)?" + TABLE + r"(\s+IN\s+(?P<mode>[\w\s]+?)\s+MODE)?", None, "metadata", None),
+    (r"(UPDATE|DELETE\s+FROM)\s+" + TABLE, "ROW EXCLUSIVE", "scan", "backfill in batches outside the migration transaction"),
+    (r"INSERT\s+INTO\s+" + TABLE, "ROW EXCLUSIVE", "metadata", None),
+    (r"DO\s+\$", None, "unknown", "procedural block, review its statements manually"),
+]
+RULES = [(re.compile(pattern, re.I | re.S), lock, effect, hint) for pattern, lock, effect, hint in RULES]
+
+
+def split(sql: str) -> list:
+    """Split SQL on ; outside quotes, dollar quoted bodies and comments"""
+    statements, current, i = [], [], 0
+    quote = None
+    while i < len(sql):
+        if quote:
+            end = sql.find(quote, i)
+            end = len(sql) if end < 0 else end + len(quote)
+            current.append(sql[i:end])
+            i, quote = end, None
+            continue
+        char = sql[i]
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = len(sql) if end < 0 else end
+            continue
+        dollar = re.match(r"\$\w*\$", sql[i:]) if char == "$" else None
+        if dollar:
+            quote = dollar.group()
+            current.append(quote)
+            i += len(quote)
+        elif char == "'":
+            quote = "'"
+            current.append(char)
+            i += 1
+        elif char == ";":
+            statements.append("".join(current).strip())
+            current = []
+            i += 1
+        else:
+            current.append(char)
+            i += 1
+    statements.append("".join(current).strip())
+    return [statement for statement in statements if statement]
+
+
+def analyze(statement: str) -> dict:
+    """Lock, effect and hint of one statement, table is None for the statements touching no existing table"""
+    for pattern, lock, effect, hint in RULES:
+        match = pattern.match(statement)
+        if not match:
+            continue
+        groups = match.groupdict()
+        if groups.get("mode"):
+            lock = " ".join(groups["mode"].upper().split())
+        elif lock is None and effect == "metadata":
+            lock = "ACCESS EXCLUSIVE"  # LOCK TABLE default mode
+        if re.search(r"\bADD\s+(COLUMN\s+)?", statement, re.I) and effect == "metadata" and VOLATILE.search(statement):
+            effect, hint = "rewrite", "add the column without a volatile default, then backfill it in batches"
+        return {"table": groups.get("table"), "lock": lock, "effect": effect, "hint": hint}
+    return {"table": None, "lock": None, "effect": "none", "hint": None}
+
+
+async def sizes(connection, tables: set) -> dict:
+    """{table: (bytes, rows)} summed over the partitions of a partitioned table"""
+    rows = await connection.fetch(
+        """
+        SELECT c.relname, SUM(pg_total_relation_size(t.relid)) AS bytes,
+            SUM(GREATEST(p.reltuples, 0)) AS rows
+        FROM pg_class c
+        CROSS JOIN LATERAL pg_partition_tree(c.oid) t
+        JOIN pg_class p ON p.oid = t.relid
+        WHERE c.relname = ANY($1::text[]) AND c.relkind IN ('r', 'p')
+        GROUP BY c.relname
+        """,
+        list(tables),
+    )
+    return {row["relname"]: (int(row["bytes"] or 0), int(row["rows"] or 0)) for row in rows}
+
+
+async def invalid_indexes(connection) -> list:
+    """Indexes left INVALID by a failed CREATE INDEX CONCURRENTLY, IF NOT EXISTS would skip them"""
+    rows = await connection.fetch(
+        "SELECT indexrelid::regclass::text AS name FROM pg_index WHERE NOT indisvalid"
+    )
+    return [row["name"] for row in rows]
+
+
+def size(value: int) -> str:
+    for unit in ("B", "kB", "MB", "GB"):
+        if value < 1024:
+            return f"{value:.0f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+async def report(connection, file: str, sql: list, transactional: bool = True) -> list:
+    """Log the lock impact of the statements of a migration, return the analyses"""
+    analyses = [dict(analyze(statement), statement=statement) for query in sql for statement in split(query)]
+    tables = await sizes(connection, {analysis["table"].split(".")[-1] for analysis in analyses if analysis["table"]})
+
+    logger.log("info", f"pending {file} ({'one transaction' if transactional else 'no transaction'})")
+    strongest = None
+    for analysis in analyses:
+        if analysis["table"] is None and analysis["effect"] == "none":
+            continue
+        bytes_, rows = tables.get((analysis["table"] or "").split(".")[-1], (0, 0))
+        seconds = bytes_ / SCAN_RATE if analysis["effect"] in ("rewrite", "scan", "build") else 0
+        line = " ".join(analysis["statement"].split())
+        line = f"  {line[:80]}{'...' if len(line) > 80 else ''}"
+        if analysis["lock"] is None:
+            logger.log("warning", line)
+        else:
+            logger.log(
+                "warning" if analysis["lock"] in ("ACCESS EXCLUSIVE", "SHARE", "SHARE ROW EXCLUSIVE") else "info",
+                f"{line}\n    {analysis['table'] or 'index'}: {analysis['lock']} lock (blocks {BLOCKS[analysis['lock']]})"
+                f", {analysis['effect']}, {size(bytes_)} / ~{rows} rows, ~{seconds:.1f}s",
+            )
+        if analysis["hint"]:
+            logger.log("info", f"    hint: {analysis['hint']}")
+        if analysis["lock"] in LEVELS and (strongest is None or LEVELS.index(analysis["lock"]) > LEVELS.index(strongest)):
+            strongest = analysis["lock"]
+
+    if transactional and strongest:
+        logger.log("info", f"  locks up to {strongest} are held until the migration commits")
+    return analyses
@@ -0,0 +1,41 @@
+# sync/migrations/20261019090000_create_index_audit_logs.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+table = "audit_logs"
+
+
+async def upgrade(engine):
+    await engine.execute(
+        f"""
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+        -- ActivityLog lookup, is_trashed/is_created EXISTS and the per-model
+        -- audit_logs relationships all filter on model_name + record_id
+        CREATE INDEX IF NOT EXISTS idx_{table}_model_record_action
+            ON {table} (model_name, record_id, action_id);
+
+        -- AuditLogService.own_activities (user_id = ? ORDER BY id DESC)
+        CREATE INDEX IF NOT EXISTS idx_{table}_user_id_id
+            ON {table} (user_id, id DESC);
+
+        -- Action.is_used and the AuditLog.action join
+        CREATE INDEX IF NOT EXISTS idx_{table}_action_id
+            ON {table} (action_id);
+
+        -- AuditLogService.all keyword filter (model_name ILIKE '%...%')
+        CREATE INDEX IF NOT EXISTS idx_{table}_model_name_trgm
+            ON {table} USING gin (model_name gin_trgm_ops);
+        """
+    )
+
+
+async def downgrade(engine):
+    await engine.execute(
+        f"""
+        DROP INDEX IF EXISTS idx_{table}_model_name_trgm;
+        DROP INDEX IF EXISTS idx_{table}_action_id;
+        DROP INDEX IF EXISTS idx_{table}_user_id_id;
+        DROP INDEX IF EXISTS idx_{table}_model_record_action;
+        """
+    )
@@ -0,0 +1,145 @@
+# sync/migrations/20261019090100_create_partition_audit_logs.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+Convert audit_logs into a table partitioned by month on actioned_at.
+Monthly partitions are named audit_logs_yyyy_mm, rows outside every range
+land in audit_logs_default. Future partitions, archival and retention are
+handled by `python madhai --partitions` (see sync/partitions.py).
+"""
+
+from src.configs import Config
+
+table = "audit_logs"
+
+# Indexes from the create_index_audit_logs migration, recreated on the
+# partitioned parent so every partition gets them
+INDEXES = f"""
+    CREATE INDEX IF NOT EXISTS idx_{table}_model_record_action
+        ON {table} (model_name, record_id, action_id);
+    CREATE INDEX IF NOT EXISTS idx_{table}_user_id_id
+        ON {table} (user_id, id DESC);
+    CREATE INDEX IF NOT EXISTS idx_{table}_action_id
+        ON {table} (action_id);
+    CREATE INDEX IF NOT EXISTS idx_{table}_model_name_trgm
+        ON {table} USING gin (model_name gin_trgm_ops);
+"""
+
+DROP_INDEXES = f"""
+    DROP INDEX IF EXISTS idx_{table}_model_record_action;
+    DROP INDEX IF EXISTS idx_{table}_user_id_id;
+    DROP INDEX IF EXISTS idx_{table}_action_id;
+    DROP INDEX IF EXISTS idx_{table}_model_name_trgm;
+"""
+
+
+async def upgrade(engine):
+    await engine.execute(
+        f"""
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+        DO $$
+        DECLARE
+            partition_month DATE;
+            last_month DATE;
+        BEGIN
+            -- Already partitioned, nothing to do
+            IF EXISTS (
+                SELECT 1 FROM pg_partitioned_table pt
+                JOIN pg_class c ON c.oid = pt.partrelid
+                WHERE c.relname = '{table}'
+            ) THEN
+                RETURN;
+            END IF;
+
+            ALTER TABLE {table} RENAME TO {table}_legacy;
+            {DROP_INDEXES}
+
+            -- The partition key must be part of the primary key
+            CREATE TABLE {table} (
+                id BIGINT NOT NULL DEFAULT nextval('{table}_id_seq'),
+                user_id BIGINT REFERENCES mst_users(id),
+                action_id BIGINT REFERENCES mst_actions(id),
+                record_id VARCHAR(30) NOT NULL,
+                ip_address VARCHAR(20) NOT NULL,
+                model_name VARCHAR(100) NOT NULL,
+                notes TEXT DEFAULT NULL,
+                actioned_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, actioned_at)
+            ) PARTITION BY RANGE (actioned_at);
+
+            -- Keep the sequence alive when the legacy table is dropped
+            ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id;
+
+            CREATE TABLE {table}_default PARTITION OF {table} DEFAULT;
+
+            -- One partition per month from the oldest row up to AUDIT_LOG_PARTITION_AHEAD months ahead
+            SELECT date_trunc('month', COALESCE(min(actioned_at), CURRENT_TIMESTAMP))::date
+            INTO partition_month FROM {table}_legacy;
+            last_month := (date_trunc('month', CURRENT_TIMESTAMP) + make_interval(months => {Config.AUDIT_LOG_PARTITION_AHEAD}))::date;
+
+            WHILE partition_month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF {table} FOR VALUES FROM (%L) TO (%L)',
+                    '{table}_' || to_char(partition_month, 'YYYY_MM'),
+                    partition_month,
+                    (partition_month + INTERVAL '1 month')::date
+                );
+                partition_month := (partition_month + INTERVAL '1 month')::date;
+            END LOOP;
+
+            INSERT INTO {table} (
+                id, user_id, action_id, record_id, ip_address, model_name, notes, actioned_at
+            )
+            SELECT
+                id, user_id, action_id, record_id, ip_address, model_name, notes,
+                COALESCE(actioned_at, CURRENT_TIMESTAMP)
+            FROM {table}_legacy;
+
+            DROP TABLE {table}_legacy;
+        END $$;
+
+        {INDEXES}
+        """
+    )
+
+
+async def downgrade(engine):
+    await engine.execute(
+        f"""
+        DO $$
+        BEGIN
+            -- Not partitioned, nothing to do
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_partitioned_table pt
+                JOIN pg_class c ON c.oid = pt.partrelid
+                WHERE c.relname = '{table}'
+            ) THEN
+                RETURN;
+            END IF;
+
+            ALTER TABLE {table} RENAME TO {table}_partitioned;
+
+            CREATE TABLE {table}_plain (
+                id BIGINT PRIMARY KEY DEFAULT nextval('{table}_id_seq'),
+                user_id BIGINT REFERENCES mst_users(id),
+                action_id BIGINT REFERENCES mst_actions(id),
+                record_id VARCHAR(30) NOT NULL,
+                ip_address VARCHAR(20) NOT NULL,
+                model_name VARCHAR(100) NOT NULL,
+                notes TEXT DEFAULT NULL,
+                actioned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            ALTER SEQUENCE {table}_id_seq OWNED BY {table}_plain.id;
+
+            INSERT INTO {table}_plain SELECT * FROM {table}_partitioned;
+
+            -- Drops every partition together with the parent
+            DROP TABLE {table}_partitioned;
+            ALTER TABLE {table}_plain RENAME TO {table};
+        END $$;
+
+        {INDEXES}
+        """
+    )
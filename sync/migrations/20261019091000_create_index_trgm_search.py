@@ -0,0 +1,41 @@
+# sync/migrations/20261019091000_create_index_trgm_search.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+Trigram GIN indexes for the keyword search of the list endpoints
+(src/utils/search.py). audit_logs.model_name is indexed by the
+create_index_audit_logs migration.
+
+The indexes are built CONCURRENTLY, writes to the hot mst_* tables are not
+blocked, so the migration runs outside a transaction, one statement at a time.
+
+It indexes several tables, so it has no `table` and is never selected by
+--table, it runs with the full upgrade/downgrade/plan.
+"""
+
+transactional = False  # CREATE INDEX CONCURRENTLY cannot run in a transaction block
+
+# (table, column) pairs searched by the services
+COLUMNS = [
+    ("mst_menus", "name"),
+    ("mst_users", "name"),
+    ("mst_users", "email"),
+    ("mst_roles", "name"),
+    ("mst_permissions", "name"),
+    ("mst_actions", "name"),
+    ("mst_account_types", "name"),
+]
+
+
+async def upgrade(engine):
+    await engine.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    for name, column in COLUMNS:
+        await engine.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_{name}_{column}_trgm ON {name} USING gin ({column} gin_trgm_ops);"
+        )
+
+
+async def downgrade(engine):
+    for name, column in COLUMNS:
+        await engine.execute(f"DROP INDEX CONCURRENTLY IF EXISTS idx_{name}_{column}_trgm;")
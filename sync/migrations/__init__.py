@@ -6,114 +6,226 @@
 This module is used to manage database migrations.
 DON'T MODIFY THIS FILE UNLESS YOU KNOW WHAT YOU'RE DOING.
 THIS FILE IS USED TO RUN MIGRATIONS.
+
+The applied migrations are recorded on the schema_migrations table, so an
+upgrade only runs the pending ones, each in its own transaction (a module
+can set `transactional = False`, e.g. for CREATE INDEX CONCURRENTLY).
+A PostgreSQL advisory lock serializes the runners of concurrent deploys.
 """
 
 import os
+import time
 import importlib
 from sync.setup import get_db_connection
+from sync.locks import report, invalid_indexes
 from src.utils.logging import Logging
 
 logger = Logging(level="DEBUG")
 
+MIGRATIONS_TABLE = "schema_migrations"
+LOCK_ID = 20241221  # pg_advisory_lock key of the migration runner
+
+
+def migration_files(reverse=False) -> list:
+    # Ambil semua file Python (.py) dalam folder ini, kecuali __init__.py
+    files = [file for file in os.listdir(os.path.dirname(__file__)) if file.endswith(".py") and file != "__init__.py"]
+
+    # Urutkan file berdasarkan timestamp di awal nama file (asumsi formatnya seperti 20241221082857)
+    files.sort(key=lambda file: int(file.split('_')[0]), reverse=reverse)
+    return files
+
+
+def version(file: str) -> int:
+    return int(file.split('_')[0])
+
+
+def load(file: str):
+    return importlib.import_module(f".{file[:-3]}", "sync.migrations")
+
+
+def matches(module, table_name=None, alter=False) -> bool:
+    """Whether a migration is selected by --table (and --alter)"""
+    if not table_name:
+        return True
+    if alter:
+        return getattr(module, "alter_table", None) == table_name
+    return getattr(module, "table", None) == table_name and not hasattr(module, "alter_table")
+
+
+async def ensure_table(connection) -> None:
+    await connection.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            version BIGINT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            duration_ms INTEGER
+        );
+        """
+    )
+
+
+async def applied(connection) -> dict:
+    """{version: applied_at} of the applied migrations"""
+    rows = await connection.fetch(f"SELECT version, applied_at FROM {MIGRATIONS_TABLE}")
+    return {row["version"]: row["applied_at"] for row in rows}
 
-async def upgrade(table_name=None, alter=False):
+
+async def run(connection, file: str, module, direction: str) -> None:
+    start_time = time.perf_counter()
+
+    async def step():
+        await getattr(module, direction)(connection)
+        if direction == "upgrade":
+            await connection.execute(
+                f"INSERT INTO {MIGRATIONS_TABLE} (version, name, duration_ms) VALUES ($1, $2, $3)",
+                version(file),
+                file[:-3],
+                int((time.perf_counter() - start_time) * 1000),
+            )
+        else:
+            await connection.execute(
+                f"DELETE FROM {MIGRATIONS_TABLE} WHERE version = $1", version(file)
+            )
+
+    if getattr(module, "transactional", True):
+        # The migration and its record are committed (or rolled back) together
+        async with connection.transaction():
+            await step()
+    else:
+        await step()
+
+    logger.log(
+        "info",
+        f"{direction.capitalize()} for {file} has been applied in {time.perf_counter() - start_time:.3f}s.",
+    )
+
+
+class Recorder:
+    """Stands in for the connection of a dry run, records the SQL of a migration instead of running it"""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, query, *args):
+        self.statements.append(query)
+        return "DRY RUN"
+
+    async def fetch(self, query, *args):
+        self.statements.append(query)
+        return []
+
+    async def fetchval(self, query, *args):
+        self.statements.append(query)
+        return None
+
+
+async def locked(callback):
+    """Run callback(connection) holding the migration advisory lock"""
     connection = None
     try:
         connection = await get_db_connection()
+        # Concurrent deploys wait here, then find nothing pending
+        await connection.execute("SELECT pg_advisory_lock($1)", LOCK_ID)
+        await ensure_table(connection)
+        return await callback(connection)
+    finally:
+        if connection:
+            await connection.close()  # Closing the session releases the lock
+            logger.log("info", "Database connection closed after migration.")
+
+
+async def upgrade(table_name=None, alter=False) -> bool:
+    async def callback(connection):
+        done = await applied(connection)
+        pending = 0
+        for file in migration_files():
+            if version(file) in done:
+                continue
+
+            module = load(file)
+            if matches(module, table_name, alter):
+                await run(connection, file, module, "upgrade")
+                pending += 1
 
-        # Ambil semua file Python (.py) dalam folder ini, kecuali __init__.py
-        files = [file for file in os.listdir(os.path.dirname(__file__)) if file.endswith(".py") and file != "__init__.py"]
-
-        # Urutkan file berdasarkan timestamp di awal nama file (asumsi formatnya seperti 20241221082857)
-        files.sort(key=lambda file: int(file.split('_')[0]))  # Mengambil angka di awal nama file dan mengurutkannya
-
-        # Iterasi setiap file yang sudah diurutkan
-        for file in files:
-            # Import module migration
-            module = importlib.import_module(f".{file[:-3]}", "sync.migrations")
-            
-            # Jika table_name diberikan, jalankan upgrade untuk table tersebut
-            if table_name and alter is False:
-                if hasattr(module, "table") and module.table == table_name:
-                    await module.upgrade(connection)
-                    logger.log(
-                        "info",
-                        f"Migration for table {table_name} has been applied.",
-                    )
-            elif alter is True:
-                if (
-                    hasattr(module, "alter_table")
-                    and module.alter_table == table_name
-                ):
-                    await module.upgrade(connection)
-                    logger.log(
-                        "info",
-                        f"Migration for table {table_name} has been applied.",
-                    )
-            else:
-                # Jika table_name tidak diberikan, jalankan semua migration
-                if hasattr(module, "alter_table"):
-                    continue
-                else:
-                    await module.upgrade(connection)
-                    logger.log("info", f"Upgrade for {file} has been applied.")
+        if not pending:
+            logger.log("info", "Nothing to migrate, the database is up to date.")
 
+    try:
+        await locked(callback)
+        return True
     except Exception as e:
         logger.log("error", f"Migration upgrade failed: {e}")
-    finally:
-        if connection:
-            await connection.close()
-            logger.log("info", "Database connection closed after upgrade.")
+        return False
 
-async def downgrade(table_name=None, alter=False):
-    connection = None
-    try:
-        connection = await get_db_connection()
-        
-        # Ambil semua file Python (.py) dalam folder ini, kecuali __init__.py
-        migration_files = [
-            file
-            for file in os.listdir(os.path.dirname(__file__))
-            if file.endswith(".py") and file != "__init__.py"
-        ]
-
-        # Urutkan file berdasarkan timestamp yang ada di awal nama file dalam urutan menurun (descending)
-        migration_files.sort(key=lambda file: int(file.split('_')[0]), reverse=True)  # Mengurutkan dengan reverse=True
-
-        # Iterasi setiap file yang sudah diurutkan
-        for file in migration_files:
-            # Import module migration
-            module = importlib.import_module(f".{file[:-3]}", "sync.migrations")
-
-            # Jika table_name diberikan, jalankan downgrade untuk table tersebut
-            if table_name and alter is False:
-                if hasattr(module, "table") and module.table == table_name:
-                    await module.downgrade(connection)
-                    logger.log(
-                        "info",
-                        f"Downgrade for table {table_name} has been applied.",
-                    )
-            elif alter is True:
-                if (
-                    hasattr(module, "alter_table")
-                    and module.alter_table == table_name
-                ):
-                    await module.downgrade(connection)
-                    logger.log(
-                        "info",
-                        f"Downgrade for table {table_name} has been applied.",
-                    )
-            else:
-                # Jika table_name tidak diberikan, jalankan semua downgrade
-                if hasattr(module, "alter_table"):
-                    continue
-                else:
-                    await module.downgrade(connection)
-                    logger.log("info", f"Downgrade for {file} has been applied.")
 
+async def downgrade(table_name=None, alter=False) -> bool:
+    async def callback(connection):
+        done = await applied(connection)
+        for file in migration_files(reverse=True):
+            if version(file) not in done:
+                continue
+
+            module = load(file)
+            if matches(module, table_name, alter):
+                await run(connection, file, module, "downgrade")
+
+    try:
+        await locked(callback)
+        return True
     except Exception as e:
         logger.log("error", f"Migration downgrade failed: {e}")
-    finally:
-        if connection:
-            await connection.close()
-            logger.log("info", "Database connection closed after downgrade.")
+        return False
+
+
+async def status() -> list:
+    """(file, applied_at or None) of every migration"""
+    async def callback(connection):
+        done = await applied(connection)
+        return [(file, done.get(version(file))) for file in migration_files()]
+
+    migrations = await locked(callback)
+    for file, applied_at in migrations:
+        logger.log(
+            "info" if applied_at else "warning",
+            f"{'applied ' + applied_at.isoformat(sep=' ', timespec='seconds') if applied_at else 'pending':<27} {file}",
+        )
+    return migrations
+
+
+async def plan(table_name=None, alter=False) -> list:
+    """Dry run, the migrations an upgrade would run with the lock impact of their statements"""
+    async def callback(connection):
+        done = await applied(connection)
+        pending = []
+        for file in migration_files():
+            if version(file) in done:
+                continue
+
+            module = load(file)
+            if matches(module, table_name, alter):
+                recorder = Recorder()
+                await module.upgrade(recorder)
+                await report(connection, file, recorder.statements, getattr(module, "transactional", True))
+                pending.append(file)
+
+        for name in await invalid_indexes(connection):
+            logger.log("warning", f"Index {name} is INVALID (failed concurrent build), drop it before retrying its migration.")
+        return pending
+
+    pending = await locked(callback)
+    if not pending:
+        logger.log("info", "Nothing to migrate, the database is up to date.")
+    return pending
+
+
+async def baseline() -> None:
+    """Record every migration as applied without running it (databases migrated before schema_migrations)"""
+    async def callback(connection):
+        await connection.executemany(
+            f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES ($1, $2) ON CONFLICT (version) DO NOTHING",
+            [(version(file), file[:-3]) for file in migration_files()],
+        )
+
+    await locked(callback)
+    logger.log("info", "All migrations have been recorded as applied.")
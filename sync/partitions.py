@@ -0,0 +1,176 @@
+# sync/partitions.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used to maintain the monthly partitions of audit_logs.
+Future partitions are created ahead of time, partitions older than the
+retention window are detached, archived to a gzip compressed CSV and dropped.
+
+The DELETE/RESTORE logs (action_id 3/4) are never archived: they hold the
+soft delete state of the records (AuditLog.is_trashed), ActivityLog flips
+one row per record between 3 and 4. Before an expired partition is
+dropped they are moved into audit_logs_default, where they are kept.
+"""
+
+import os
+import gzip
+from datetime import date
+from sync.setup import get_db_connection
+from src.configs import Config
+from src.utils.logging import Logging
+
+logger = Logging(level="DEBUG")
+
+table = "audit_logs"
+
+# The rows archived and dropped, every log but the DELETE/RESTORE state of the records
+ARCHIVED = "(action_id IS NULL OR action_id NOT IN (3, 4))"
+
+
+def add_months(month: date, months: int) -> date:
+    """Return the first day of the month `months` away from `month`"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{table}_{month.strftime('%Y_%m')}"
+
+
+async def get_partitions(connection) -> dict:
+    """Return the monthly partitions of audit_logs as {month: name}"""
+    rows = await connection.fetch(
+        """
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = $1
+        """,
+        table,
+    )
+
+    partitions = {}
+    for row in rows:
+        suffix = row["relname"][len(table) + 1 :]
+        try:
+            year, month = suffix.split("_")
+            partitions[date(int(year), int(month), 1)] = row["relname"]
+        except ValueError:
+            continue  # audit_logs_default
+    return partitions
+
+
+async def create_partition(connection, month: date):
+    """Create the partition of `month`, moving its rows out of the default partition"""
+    name = partition_name(month)
+    start, end = month.isoformat(), add_months(month, 1).isoformat()
+
+    # Attaching validates the default partition has no rows in the range,
+    # so move them into the new partition in the same transaction
+    async with connection.transaction():
+        await connection.execute(
+            f"""
+            CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+
+            WITH moved AS (
+                DELETE FROM {table}_default
+                WHERE actioned_at >= '{start}' AND actioned_at < '{end}'
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved;
+
+            ALTER TABLE {table} ATTACH PARTITION {name}
+                FOR VALUES FROM ('{start}') TO ('{end}');
+            """
+        )
+
+
+async def archive_partition(connection, name: str, archive_dir: str):
+    """
+    Copy a partition to `archive_dir` as .csv.gz, then detach and drop it.
+    Its DELETE/RESTORE logs are moved into the default partition instead.
+    """
+    # Copied while still attached: a failed copy leaves the partition in
+    # pg_inherits and the next run archives it again
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    with gzip.open(path, "wb") as file:
+        await connection.copy_from_query(
+            f"SELECT * FROM {name} WHERE {ARCHIVED}", output=file, format="csv", header=True
+        )
+
+    # A plain DETACH, CONCURRENTLY is refused while audit_logs_default exists.
+    # The lock is short, the partition is outside the retention window
+    async with connection.transaction():
+        await connection.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+        # The range is no longer attached, the parent routes the rows to the default partition
+        await connection.execute(f"INSERT INTO {table} SELECT * FROM {name} WHERE NOT {ARCHIVED}")
+        await connection.execute(f"DROP TABLE {name}")
+    return path
+
+
+async def archive_default(connection, cutoff: date, archive_dir: str):
+    """Archive and delete rows of the default partition older than `cutoff`, but the DELETE/RESTORE logs"""
+    count = await connection.fetchval(
+        f"SELECT count(*) FROM {table}_default WHERE actioned_at < $1 AND {ARCHIVED}", cutoff
+    )
+    if not count:
+        return None
+
+    path = os.path.join(
+        archive_dir, f"{table}_default_before_{cutoff.strftime('%Y_%m')}.csv.gz"
+    )
+    async with connection.transaction():
+        with gzip.open(path, "wb") as file:
+            await connection.copy_from_query(
+                f"SELECT * FROM {table}_default WHERE actioned_at < $1 AND {ARCHIVED}",
+                cutoff,
+                output=file,
+                format="csv",
+                header=True,
+            )
+        await connection.execute(
+            f"DELETE FROM {table}_default WHERE actioned_at < $1 AND {ARCHIVED}", cutoff
+        )
+    return path
+
+
+async def maintain(
+    months_ahead: int = None, retention: int = None, archive_dir: str = None
+):
+    """Create future partitions and archive the ones outside the retention window"""
+    months_ahead = Config.AUDIT_LOG_PARTITION_AHEAD if months_ahead is None else months_ahead
+    retention = Config.AUDIT_LOG_RETENTION_MONTHS if retention is None else retention
+    archive_dir = archive_dir or Config.AUDIT_LOG_ARCHIVE_DIR
+
+    current_month = date.today().replace(day=1)
+    connection = await get_db_connection()
+    try:
+        partitions = await get_partitions(connection)
+
+        for offset in range(months_ahead + 1):
+            month = add_months(current_month, offset)
+            if month not in partitions:
+                await create_partition(connection, month)
+                logger.log("info", f"Partition {partition_name(month)} created.")
+
+        # A retention of 0 keeps everything
+        if retention <= 0:
+            return
+
+        os.makedirs(archive_dir, exist_ok=True)
+        cutoff = add_months(current_month, -retention)
+
+        for month, name in sorted(partitions.items()):
+            if add_months(month, 1) <= cutoff:
+                path = await archive_partition(connection, name, archive_dir)
+                logger.log("info", f"Partition {name} archived to {path}.")
+
+        path = await archive_default(connection, cutoff, archive_dir)
+        if path:
+            logger.log("info", f"Default partition rows archived to {path}.")
+    except Exception as e:
+        logger.log("error", f"Partition maintenance failed: {e}")
+        raise
+    finally:
+        await connection.close()
@@ -0,0 +1,241 @@
+# sync/synthetic.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+This module is used to generate a large synthetic dataset for performance
+testing (is_trashed, pagination, menu hierarchy, permission checks).
+Every table has its own random generator seeded from the run seed, so the
+same arguments always produce the same rows, and the rows are streamed to
+the database through the COPY sources of sync/bulk.py.
+
+Run it after the regular seeders, mst_actions and mst_subscription_plans
+are read from the database, and the ids continue after the existing rows.
+"""
+
+import random
+from decimal import Decimal
+from datetime import datetime, timedelta
+from sync.setup import get_db_connection
+from sync.bulk import Source, copy
+from src.utils.security import password_hash
+
+# Weights of the audited models and actions, most activity is on a few hot tables
+MODELS = {
+    "mst_users": 30,
+    "mst_account_types": 25,
+    "mst_roles": 10,
+    "mst_permissions": 8,
+    "mst_menus": 7,
+    "ref_user_roles": 5,
+}
+ACTIONS = {"CREATE": 35, "UPDATE": 45, "DELETE": 8, "RESTORE": 3, "LOGIN": 7, "LOGOUT": 2}
+PAYMENT_STATUS = {"completed": 90, "failed": 7, "pending": 3}
+PAYMENT_METHODS = ["credit_card", "bank_transfer", "e_wallet", "virtual_account"]
+
+
+class Synthetic:
+    def __init__(
+        self,
+        users: int = 10000,
+        roles: int = 20,
+        depth: int = 3,
+        width: int = 5,
+        permissions: int = 200,
+        logs: int = 100000,
+        months: int = 12,
+        seed: int = 42,
+    ):
+        self.users = users
+        self.roles = roles
+        self.depth = depth
+        self.width = width
+        self.permissions = permissions
+        self.logs = logs
+        self.months = months
+        self.seed = seed
+        self.now = datetime(2026, 1, 1)  # Fixed, the rows must not depend on the day of the run
+        self.password = password_hash("password")
+
+    def random(self, table: str) -> random.Random:
+        return random.Random(f"{self.seed}:{table}")
+
+    async def prepare(self, connection):
+        """Read the ids to continue from and the reference rows"""
+        self.offset = {}
+        for table in ("mst_users", "mst_roles", "mst_menus", "mst_permissions", "trs_subscriptions"):
+            self.offset[table] = await connection.fetchval(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+
+        self.actions = {
+            row["name"]: row["id"] for row in await connection.fetch("SELECT id, name FROM mst_actions")
+        }
+        self.plans = await connection.fetch("SELECT id, price, billing_cycle FROM mst_subscription_plans ORDER BY id")
+        missing = set(ACTIONS) - set(self.actions)
+        if missing or not self.plans:
+            raise RuntimeError("Run the mst_actions and mst_subscription_plans seeders first")
+
+    def ids(self, table: str, count: int) -> range:
+        return range(self.offset[table] + 1, self.offset[table] + count + 1)
+
+    def menus_count(self) -> int:
+        return sum(self.width**level for level in range(1, self.depth + 1))
+
+    def mst_users(self):
+        rng = self.random("mst_users")
+        for id in self.ids("mst_users", self.users):
+            logged_in = self.now - timedelta(minutes=rng.randrange(90 * 24 * 60)) if rng.random() < 0.8 else None
+            yield (id, f"User {id}", f"user{id}@synthetic.test", self.password, rng.random() < 0.97, logged_in, 0)
+
+    def mst_roles(self):
+        for id in self.ids("mst_roles", self.roles):
+            yield (id, f"Role {id}", f"Synthetic role {id}")
+
+    def ref_user_roles(self):
+        rng = self.random("ref_user_roles")
+        roles = list(self.ids("mst_roles", self.roles))
+        weights = [1 / rank for rank in range(1, len(roles) + 1)]  # A few roles hold most users
+        for user_id in self.ids("mst_users", self.users):
+            for role_id in set(rng.choices(roles, weights, k=2 if rng.random() < 0.1 else 1)):
+                yield (user_id, role_id)
+
+    def mst_menus(self):
+        """Breadth first, `width` children per menu down to `depth` levels"""
+        id = self.offset["mst_menus"]
+        parents = [None]
+        for level in range(1, self.depth + 1):
+            children = []
+            for parent_id in parents:
+                for ordering in range(1, self.width + 1):
+                    id += 1
+                    alias = f"synthetic:{id}"
+                    link = f"/synthetic/{id}" if level == self.depth else None
+                    yield (id, parent_id, f"Menu {id}", alias, link, "MenuIcon", ordering)
+                    children.append(id)
+            parents = children
+
+    def ref_role_menus(self):
+        rng = self.random("ref_role_menus")
+        menus = list(self.ids("mst_menus", self.menus_count()))
+        for role_id in self.ids("mst_roles", self.roles):
+            for menu_id in sorted(rng.sample(menus, max(1, len(menus) * 3 // 10))):
+                yield (role_id, menu_id)
+
+    def ref_user_menus(self):
+        rng = self.random("ref_user_menus")
+        menus = list(self.ids("mst_menus", self.menus_count()))
+        for user_id in self.ids("mst_users", self.users):
+            if rng.random() < 0.05:
+                for menu_id in rng.sample(menus, min(len(menus), rng.randint(1, 3))):
+                    yield (user_id, menu_id)
+
+    def mst_permissions(self):
+        for id in self.ids("mst_permissions", self.permissions):
+            yield (id, f"manage:synthetic-{id}", f"Synthetic permission {id}")
+
+    def ref_role_permissions(self):
+        rng = self.random("ref_role_permissions")
+        permissions = list(self.ids("mst_permissions", self.permissions))
+        for role_id in self.ids("mst_roles", self.roles):
+            for permission_id in sorted(rng.sample(permissions, max(1, len(permissions) // 4))):
+                yield (role_id, permission_id)
+
+    def ref_user_permissions(self):
+        rng = self.random("ref_user_permissions")
+        permissions = list(self.ids("mst_permissions", self.permissions))
+        for user_id in self.ids("mst_users", self.users):
+            if rng.random() < 0.05:
+                for permission_id in rng.sample(permissions, min(len(permissions), rng.randint(1, 5))):
+                    yield (user_id, permission_id)
+
+    def audit_logs(self):
+        """Time ordered over `months`, a RESTORE always follows a DELETE of the same record"""
+        rng = self.random("audit_logs")
+        models, model_weights = list(MODELS), list(MODELS.values())
+        actions, action_weights = list(ACTIONS), list(ACTIONS.values())
+        users = list(self.ids("mst_users", self.users))
+        user_weights = [1 / rank for rank in range(1, len(users) + 1)]
+        records = {
+            "mst_users": self.ids("mst_users", self.users),
+            "mst_roles": self.ids("mst_roles", self.roles),
+            "mst_permissions": self.ids("mst_permissions", self.permissions),
+            "mst_menus": self.ids("mst_menus", self.menus_count()),
+        }
+        deleted = {model: [] for model in models}
+        start = self.now - timedelta(days=30 * self.months)
+        step = (self.now - start) / max(self.logs, 1)
+
+        user_choices = rng.choices(users, user_weights, k=self.logs)
+        for index in range(self.logs):
+            user_id = user_choices[index]
+            action = rng.choices(actions, action_weights)[0]
+            if action in ("LOGIN", "LOGOUT"):
+                model, record_id = "mst_users", user_id
+            else:
+                model = rng.choices(models, model_weights)[0]
+                record_id = rng.choice(records.get(model, range(1, 1001)))
+                if action == "RESTORE":
+                    if deleted[model]:
+                        record_id = deleted[model].pop(rng.randrange(len(deleted[model])))
+                    else:
+                        action = "UPDATE"
+                elif action == "DELETE":
+                    deleted[model].append(record_id)
+
+            ip_address = f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+            actioned_at = start + step * index + timedelta(seconds=rng.random())
+            yield (user_id, self.actions[action], str(record_id), ip_address, model, None, actioned_at)
+
+    def trs_subscriptions(self):
+        """Also replayed by trs_payments, so both see the same subscriptions"""
+        rng = self.random("trs_subscriptions")
+        id = self.offset["trs_subscriptions"]
+        for user_id in self.ids("mst_users", self.users):
+            if rng.random() < 0.6:
+                id += 1
+                plan = rng.choice(self.plans)
+                start_date = self.now - timedelta(days=rng.randrange(30 * self.months))
+                end_date = start_date + timedelta(days=365 if plan["billing_cycle"] == "yearly" else 30)
+                yield (id, user_id, plan["id"], start_date, end_date, end_date > self.now, rng.random() < 0.5)
+
+    def trs_payments(self):
+        rng = self.random("trs_payments")
+        prices = {plan["id"]: Decimal(plan["price"]) for plan in self.plans}
+        statuses, weights = list(PAYMENT_STATUS), list(PAYMENT_STATUS.values())
+        for id, user_id, plan_id, start_date, end_date, is_active, auto_renew in self.trs_subscriptions():
+            yield (
+                f"pay_{self.seed}_{id}",
+                user_id,
+                id,
+                plan_id,
+                prices[plan_id],
+                start_date + timedelta(minutes=rng.randrange(60)),
+                rng.choice(PAYMENT_METHODS),
+                rng.choices(statuses, weights)[0],
+            )
+
+    def sources(self) -> list:
+        columns = {
+            "mst_users": ["id", "name", "email", "password", "active", "last_logged_in", "failed_login_attempts"],
+            "mst_roles": ["id", "name", "description"],
+            "ref_user_roles": ["user_id", "role_id"],
+            "mst_menus": ["id", "parent_id", "name", "alias", "link", "icon", "ordering"],
+            "ref_role_menus": ["role_id", "menu_id"],
+            "ref_user_menus": ["user_id", "menu_id"],
+            "mst_permissions": ["id", "name", "description"],
+            "ref_role_permissions": ["role_id", "permission_id"],
+            "ref_user_permissions": ["user_id", "permission_id"],
+            "audit_logs": ["user_id", "action_id", "record_id", "ip_address", "model_name", "notes", "actioned_at"],
+            "trs_subscriptions": ["id", "user_id", "subscription_plan_id", "start_date", "end_date", "is_active", "auto_renew"],
+            "trs_payments": ["id", "user_id", "subscription_id", "subscription_plan_id", "amount", "payment_date", "payment_method", "status"],
+        }
+        return [Source(table, names, getattr(self, table)) for table, names in columns.items()]
+
+
+async def generate(pool_size: int = 4, **options) -> int:
+    synthetic = Synthetic(**options)
+    connection = await get_db_connection()
+    try:
+        await synthetic.prepare(connection)
+    finally:
+        await connection.close()
+    return await copy(synthetic.sources(), pool_size)
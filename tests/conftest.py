@@ -0,0 +1,63 @@
+# tests/conftest.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""
+Shared fixtures of the tests. They need no server: Redis is replaced by
+fakeredis (with lupa for the Lua scripts) and PostgreSQL runs embedded
+(pgserver, one database per test), see requirements-dev.txt.
+"""
+
+import os
+import uuid
+
+# The settings are read on import, APP_PORT has no valid default without a .env
+os.environ.setdefault("APP_PORT", "8000")
+
+import pytest
+import asyncpg
+import fakeredis
+import src.databases.redis as redis_db
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    """
+    A fakeredis client in place of src.databases.redis.client and its
+    scripts, the asyncio client (aclient) shares its data
+    """
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(redis_db, "client", client)
+    monkeypatch.setattr(redis_db, "aclient", fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(
+        redis_db, "ROTATE_SESSION", client.register_script(redis_db.ROTATE_SESSION.script)
+    )
+    return client
+
+
+@pytest.fixture(scope="session")
+def postgres(tmp_path_factory):
+    """An embedded PostgreSQL server, started once for the session"""
+    pgserver = pytest.importorskip("pgserver")
+    server = pgserver.get_server(tmp_path_factory.mktemp("postgres"), cleanup_mode="stop")
+    yield server
+    server.cleanup()
+
+
+@pytest.fixture
+async def database(postgres):
+    """The URI of an empty database, dropped after the test"""
+    name = f"test_{uuid.uuid4().hex[:12]}"
+    admin = await asyncpg.connect(postgres.get_uri())
+    await admin.execute(f"CREATE DATABASE {name}")
+    try:
+        yield postgres.get_uri(database=name)
+    finally:
+        await admin.execute(f"DROP DATABASE {name} WITH (FORCE)")
+        await admin.close()
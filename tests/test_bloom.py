@@ -0,0 +1,57 @@
+# tests/test_bloom.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""The bloom filter of the revoked sessions (src/utils/bloom.py, RevocationFilter)"""
+
+import pytest
+from src.utils.bloom import BloomFilter
+from src.databases.redis import RedisDB, RevocationFilter
+
+pytestmark = pytest.mark.anyio
+
+
+def test_no_false_negatives():
+    bloom = BloomFilter(capacity=10000, error_rate=0.01)
+    items = [f"sid:{index}" for index in range(10000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    assert bloom.count == len(items)
+
+
+def test_false_positive_rate_at_capacity():
+    bloom = BloomFilter(capacity=10000, error_rate=0.01)
+    for index in range(10000):
+        bloom.add(f"sid:{index}")
+
+    others = [f"sid:other:{index}" for index in range(20000)]
+    rate = sum(item in bloom for item in others) / len(others)
+    assert rate < 0.02
+    assert bloom.estimated_error_rate() < 0.02
+
+
+def test_empty_filter():
+    bloom = BloomFilter(capacity=100)
+    assert "sid:1" not in bloom
+    assert bloom.estimated_error_rate() == 0.0
+
+
+def test_unsynced_filter_falls_through_to_redis():
+    revoked = RevocationFilter(capacity=100)
+    assert revoked.may_contain("sid:1")
+
+
+async def test_snapshot_holds_every_revocation(redis):
+    db = RedisDB()
+    for index in range(50):
+        await db.revoke_session(f"s{index}")
+    await db.revoke_user_sessions(7)
+
+    revoked = RevocationFilter(capacity=100)
+    revoked.snapshot()
+
+    assert all(revoked.may_contain(f"sid:s{index}") for index in range(50))
+    assert revoked.may_contain("sid:active", "user:7")
+    assert revoked.filter.count == 51
@@ -0,0 +1,133 @@
+# tests/test_compression.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""Response compression and its ETags (src/midlewares/compression.py)"""
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from src.midlewares.compression import CompressionMiddleware
+from src.utils.static import accepted
+
+ROWS = {"data": [{"id": id, "name": f"Account Type {id}"} for id in range(200)]}
+
+
+def app(**options) -> TestClient:
+    routes = [
+        Route("/rows", lambda request: JSONResponse(ROWS)),
+        Route("/tagged", lambda request: JSONResponse(ROWS, headers={"ETag": '"v1"'})),
+        Route("/small", lambda request: JSONResponse({"detail": "ok"})),
+        Route("/text", lambda request: Response("x" * 4096, media_type="text/plain")),
+        Route("/vary", lambda request: JSONResponse(ROWS, headers={"Vary": "Origin, accept-encoding"})),
+        Route("/origin", lambda request: JSONResponse(ROWS, headers={"Vary": "Origin"})),
+        Route("/rows", lambda request: JSONResponse(ROWS), methods=["POST"]),
+    ]
+    return TestClient(CompressionMiddleware(Starlette(routes=routes), **options))
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, deflate, br", ["br", "gzip"]),
+        ("gzip", ["gzip"]),
+        ("br;q=0, gzip;q=0.5", ["gzip"]),
+        ("GZIP", ["gzip"]),
+        ("*", ["br", "gzip"]),
+        ("identity", []),
+        ("", []),
+        ("gzip;q=abc", []),
+    ],
+)
+def test_accepted(header, expected):
+    assert accepted(header) == expected
+
+
+def test_accepted_follows_our_preference():
+    assert accepted("gzip, zstd", ("zstd", "br", "gzip")) == ["zstd", "gzip"]
+
+
+def test_compressed_with_an_etag_per_encoding():
+    client = app(encodings=("gzip",))
+    response = client.get("/rows", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"].endswith('-gzip"')
+    assert response.json() == ROWS  # decompressed by the client
+
+    identity = client.get("/rows", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert "etag" not in identity.headers
+    assert identity.json() == ROWS
+
+
+def test_etag_of_the_route_gets_the_encoding():
+    client = app(encodings=("gzip",))
+    response = client.get("/tagged", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["etag"] == '"v1-gzip"'
+
+
+def test_vary_is_not_repeated():
+    client = app(encodings=("gzip",))
+    gzip_only = {"Accept-Encoding": "gzip"}
+
+    # Already set by the route (the static files), whatever its case
+    assert client.get("/vary", headers=gzip_only).headers["vary"] == "Origin, accept-encoding"
+    assert client.get("/origin", headers=gzip_only).headers["vary"] == "Origin, Accept-Encoding"
+
+
+def test_not_modified():
+    client = app(encodings=("gzip",))
+    etag = client.get("/rows", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+
+    response = client.get("/rows", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == etag
+
+    # Weak comparison, several tags
+    response = client.get("/rows", headers={"Accept-Encoding": "gzip", "If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+
+    response = client.get("/rows", headers={"Accept-Encoding": "gzip", "If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+
+def test_cached_body_is_reused():
+    middleware = CompressionMiddleware(
+        Starlette(routes=[Route("/rows", lambda request: JSONResponse(ROWS))]), encodings=("gzip",)
+    )
+    client = TestClient(middleware)
+    first = client.get("/rows", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/rows", headers={"Accept-Encoding": "gzip"})
+
+    assert first.headers["etag"] == second.headers["etag"]
+    assert middleware.cache.hits == 1 and middleware.cache.misses == 1
+
+
+def test_passed_through():
+    client = app(encodings=("gzip",))
+    gzip_only = {"Accept-Encoding": "gzip"}
+
+    # Under the minimum size, outside the types
+    assert "content-encoding" not in client.get("/small", headers=gzip_only).headers
+    assert "content-encoding" not in client.get("/text", headers=gzip_only).headers
+
+    # Compressed but never cached or tagged, not a GET
+    response = client.post("/rows", headers=gzip_only)
+    assert response.headers["content-encoding"] == "gzip"
+    assert "etag" not in response.headers
+
+
+def test_cache_is_bounded():
+    middleware = CompressionMiddleware(None, cache_size=100)
+    middleware.cache.set(("a", "gzip"), b"x" * 60)
+    middleware.cache.set(("b", "gzip"), b"x" * 60)
+    middleware.cache.set(("c", "gzip"), b"x" * 200)  # Larger than the cache
+
+    assert list(middleware.cache.entries) == [("b", "gzip")]
+    assert middleware.cache.used == 60
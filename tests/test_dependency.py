@@ -0,0 +1,68 @@
+# tests/test_dependency.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""The bearers verify the token once per request (src/utils/dependency.py)"""
+
+import pytest
+from fastapi.exceptions import HTTPException
+from starlette.requests import Request
+import src.utils.dependency as dependency
+from src.databases.redis import RedisDB
+from src.utils.errors import AccessTokenRequired, RefreshTokenRequired
+from src.utils.security import generate_token
+
+pytestmark = pytest.mark.anyio
+
+SID = "b71c"
+
+
+@pytest.fixture
+def verified(redis, monkeypatch):
+    """Count the signature checks of the bearers"""
+    calls = []
+
+    def verify_token(token):
+        calls.append(token)
+        return verify(token)
+
+    verify = dependency.verify_token
+    monkeypatch.setattr(dependency, "verify_token", verify_token)
+    return calls
+
+
+def request(token: str) -> Request:
+    headers = [(b"authorization", f"Bearer {token}".encode())]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "client": ("10.0.0.1", 1234)})
+
+
+async def test_token_verified_once_per_request(verified):
+    await RedisDB().create_session(SID, 1, "jti-1", "10.0.0.1")
+    req = request(generate_token({"sub": "1", "rid": 2}, session_id=SID))
+
+    # The authorization middleware, then the bearer of the route
+    user = await dependency.AccessTokenBearer()(req)
+    assert await dependency.AccessTokenBearer()(req) is user
+    assert req.state.authorize is user
+    assert len(verified) == 1
+
+    # The type of the token is still checked against the bearer
+    with pytest.raises(RefreshTokenRequired):
+        await dependency.RefreshTokenBearer()(req)
+
+
+async def test_refresh_token_is_not_an_access_token(verified):
+    await RedisDB().create_session(SID, 1, "jti-1", "10.0.0.1")
+    req = request(generate_token({"sub": "1", "rid": 2}, refresh=True, session_id=SID, jti="jti-1"))
+
+    with pytest.raises(AccessTokenRequired):
+        await dependency.AccessTokenBearer()(req)
+
+
+async def test_revoked_session(verified):
+    req = request(generate_token({"sub": "1", "rid": 2}, session_id="missing"))
+
+    with pytest.raises(HTTPException) as error:
+        await dependency.AccessTokenBearer()(req)
+    assert error.value.detail["error_code"] == "token_revoked"
+    assert not hasattr(req.state, "authorize")
@@ -0,0 +1,108 @@
+# tests/test_partitions.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""Retention of the audit_logs partitions (sync/partitions.py)"""
+
+import gzip
+import pytest
+import asyncpg
+from datetime import date, datetime
+import sync.partitions as partitions
+from sync.partitions import add_months, create_partition, get_partitions, maintain
+
+pytestmark = pytest.mark.anyio
+
+CURRENT_MONTH = date.today().replace(day=1)
+EXPIRED = add_months(CURRENT_MONTH, -14)  # Outside a retention of 12 months
+KEPT = add_months(CURRENT_MONTH, -2)
+
+
+@pytest.fixture
+async def connect(database, monkeypatch):
+    async def connect():
+        return await asyncpg.connect(database)
+
+    # The schema of the create_partition_audit_logs migration, without its
+    # indexes (pg_trgm is not bundled with the embedded server)
+    connection = await connect()
+    await connection.execute(
+        """
+        CREATE TABLE audit_logs (
+            id BIGSERIAL,
+            user_id BIGINT,
+            action_id BIGINT,
+            record_id VARCHAR(30) NOT NULL,
+            ip_address VARCHAR(20) NOT NULL,
+            model_name VARCHAR(100) NOT NULL,
+            notes TEXT DEFAULT NULL,
+            actioned_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, actioned_at)
+        ) PARTITION BY RANGE (actioned_at);
+
+        CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT;
+        """
+    )
+    for month in (EXPIRED, KEPT):
+        await create_partition(connection, month)
+    await connection.close()
+
+    monkeypatch.setattr(partitions, "get_db_connection", connect)
+    return connect
+
+
+async def log(connection, action_id: int, record_id: int, actioned_at: datetime):
+    await connection.execute(
+        """
+        INSERT INTO audit_logs (user_id, action_id, record_id, ip_address, model_name, actioned_at)
+        VALUES (1, $1, $2, '10.0.0.1', 'mst_account_types', $3)
+        """,
+        action_id,
+        str(record_id),
+        actioned_at,
+    )
+
+
+async def actions(connection, record_id: int) -> list:
+    """The action ids logged for a record, AuditLog.is_trashed is EXISTS action_id 3"""
+    rows = await connection.fetch(
+        "SELECT action_id FROM audit_logs WHERE model_name = 'mst_account_types' AND record_id = $1 ORDER BY action_id",
+        str(record_id),
+    )
+    return [row["action_id"] for row in rows]
+
+
+async def test_trashed_before_the_cutoff_stays_trashed(connect, tmp_path):
+    connection = await connect()
+    expired = datetime(EXPIRED.year, EXPIRED.month, 10)
+    # Record 1 created and trashed, record 2 trashed then restored, record 3 only created
+    await log(connection, 1, 1, expired)
+    await log(connection, 3, 1, expired)
+    await log(connection, 1, 2, expired)
+    await log(connection, 4, 2, expired)
+    await log(connection, 1, 3, expired)
+    # Older than every partition, in the default partition
+    await log(connection, 3, 4, datetime(2000, 1, 1))
+    await log(connection, 2, 4, datetime(2000, 1, 1))
+    await log(connection, 3, 5, datetime(KEPT.year, KEPT.month, 10))
+
+    await maintain(months_ahead=1, retention=12, archive_dir=str(tmp_path))
+
+    assert EXPIRED not in await get_partitions(connection)
+    assert await actions(connection, 1) == [3]
+    assert await actions(connection, 2) == [4]
+    assert await actions(connection, 3) == []
+    assert await actions(connection, 4) == [3]
+    assert await actions(connection, 5) == [3]
+
+    # The archives hold the other logs, not the DELETE/RESTORE state
+    with gzip.open(tmp_path / f"{partitions.partition_name(EXPIRED)}.csv.gz", "rt") as file:
+        archived = file.read().splitlines()
+    assert len(archived) == 1 + 3
+    # Records 1 and 2 moved out of the dropped partition, record 4 kept in place
+    assert len(await connection.fetch("SELECT 1 FROM audit_logs_default")) == 3
+
+    # A second run archives nothing more and keeps the state
+    await maintain(months_ahead=1, retention=12, archive_dir=str(tmp_path))
+    assert await actions(connection, 1) == [3] and await actions(connection, 4) == [3]
+    await connection.close()
@@ -0,0 +1,109 @@
+# tests/test_ratelimit.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""Sliding window rate limits and their headers (src/utils/ratelimit.py), the login attempts"""
+
+import time
+import pytest
+from starlette.requests import Request
+import src.databases.redis as redis_db
+import src.utils.ratelimit as ratelimit
+from src.utils.ratelimit import RateLimiter
+from src.configs import Config
+from src.databases.redis import RedisDB
+from src.utils.structs import AuthContext
+
+pytestmark = pytest.mark.anyio
+
+LOGIN = ("POST", "/auth/login", "ip", 3, 60)
+LOGIN_HOURLY = ("POST", "/auth/login", "ip", 5, 3600)
+
+
+@pytest.fixture
+def limiter(redis, monkeypatch):
+    monkeypatch.setattr(
+        ratelimit, "SLIDING_WINDOW", redis_db.aclient.register_script(ratelimit.SLIDING_WINDOW.script)
+    )
+    return RateLimiter([LOGIN, LOGIN_HOURLY, ("GET", "/*/export", "user", 2, 60)])
+
+
+def request(host: str = "10.0.0.1", user_id: int = None) -> Request:
+    request = Request({"type": "http", "method": "POST", "path": "/", "headers": [], "client": (host, 1234)})
+    if user_id is not None:
+        request.state.authorize = AuthContext.from_claims({"sub": str(user_id), "exp": 0})
+    return request
+
+
+def test_match(limiter):
+    assert limiter.match("POST", "/auth/login") == [LOGIN, LOGIN_HOURLY]
+    assert limiter.match("GET", "/audit-logs/export")[0][1] == "/*/export"
+    assert limiter.match("GET", "/auth/login") == []
+
+
+async def test_limit_and_headers(limiter):
+    policies = limiter.match("POST", "/auth/login")
+    for remaining in (2, 1, 0):
+        allowed, headers = await limiter.hit(request(), policies)
+        assert allowed
+        # The headers describe the policy closest to its limit
+        assert headers["RateLimit-Limit"] == "3"
+        assert headers["RateLimit-Remaining"] == str(remaining)
+        assert 0 < int(headers["RateLimit-Reset"]) <= 60
+        assert headers["RateLimit-Policy"] == "3;w=60, 5;w=3600"
+        assert "Retry-After" not in headers
+
+    allowed, headers = await limiter.hit(request(), policies)
+    assert not allowed
+    assert headers["RateLimit-Remaining"] == "0"
+    assert 0 < int(headers["Retry-After"]) <= 60
+    assert headers["Retry-After"] == headers["RateLimit-Reset"]
+
+
+async def test_rejected_requests_are_not_counted(limiter, redis):
+    policies = limiter.match("POST", "/auth/login")
+    for _ in range(10):
+        await limiter.hit(request(), policies)
+
+    assert redis.zcard("ratelimit:POST:/auth/login:3600:ip:10.0.0.1") == 3
+
+
+async def test_window_slides(limiter, redis):
+    policies = [LOGIN]
+    key = "ratelimit:POST:/auth/login:60:ip:10.0.0.1"
+    for _ in range(3):
+        await limiter.hit(request(), policies)
+    assert not (await limiter.hit(request(), policies))[0]
+
+    # The oldest request leaves the window, one more fits
+    oldest = redis.zrange(key, 0, 0)[0]
+    redis.zadd(key, {oldest: (time.time() - 61) * 1000})
+
+    allowed, headers = await limiter.hit(request(), policies)
+    assert allowed and headers["RateLimit-Remaining"] == "0"
+    assert not (await limiter.hit(request(), policies))[0]
+
+
+async def test_scopes(limiter):
+    login = limiter.match("POST", "/auth/login")
+    for _ in range(3):
+        await limiter.hit(request("10.0.0.1"), login)
+    assert not (await limiter.hit(request("10.0.0.1"), login))[0]
+    assert (await limiter.hit(request("10.0.0.2"), login))[0]
+
+    # "user" scope counts per token user, whatever the address
+    export = limiter.match("GET", "/audit-logs/export")
+    for host in ("10.0.0.1", "10.0.0.2"):
+        assert (await limiter.hit(request(host, user_id=1), export))[0]
+    assert not (await limiter.hit(request("10.0.0.3", user_id=1), export))[0]
+    assert (await limiter.hit(request("10.0.0.3", user_id=2), export))[0]
+
+
+async def test_login_attempts(redis):
+    db = RedisDB()
+    assert [await db.login_attempt(1) for _ in range(3)] == [1, 2, 3]
+    assert 0 < redis.ttl("login_failures:1") <= Config.LOGIN_FAILURE_WINDOW
+
+    await db.clear_login_failures(1)
+    assert not redis.exists("login_failures:1")
+    assert await db.login_attempt(1) == 1
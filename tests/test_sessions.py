@@ -0,0 +1,112 @@
+# tests/test_sessions.py
+# -*- coding: utf-8 -*-
+# Copyright 2024 - Ika Raya Sentausa
+
+"""Refresh token rotation of the session families (ROTATE_SESSION)"""
+
+import pytest
+from src.databases.redis import RedisDB, REVOCATIONS
+from src.utils.structs import AuthContext
+
+pytestmark = pytest.mark.anyio
+
+SID = "a93e"
+USER_ID = 1
+
+
+@pytest.fixture
+async def session(redis):
+    db = RedisDB()
+    await db.create_session(SID, USER_ID, "jti-1", "10.0.0.1")
+    return db
+
+
+async def test_rotate(session, redis):
+    assert await session.rotate_session(SID, USER_ID, "jti-1", "jti-2") == 1
+    assert redis.hget(session.session_key(SID), "refresh") == "jti-2"
+
+
+async def test_reused_refresh_token_revokes_the_family(session, redis):
+    assert await session.rotate_session(SID, USER_ID, "jti-1", "jti-2") == 1
+
+    # The rotated token presented again
+    assert await session.rotate_session(SID, USER_ID, "jti-1", "jti-3") == -1
+    assert not redis.exists(session.session_key(SID))
+    assert redis.zscore(REVOCATIONS, f"sid:{SID}") is not None
+
+    # The current token of the family is revoked with it
+    assert await session.rotate_session(SID, USER_ID, "jti-2", "jti-4") == 0
+    token = AuthContext.from_claims({"sub": str(USER_ID), "sid": SID, "exp": 0})
+    assert not await session.session_active(token)
+
+
+async def test_log_out_everywhere_revokes_the_family(session, redis):
+    await session.revoke_user_sessions(USER_ID)
+
+    assert await session.rotate_session(SID, USER_ID, "jti-1", "jti-2") == 0
+    assert not redis.exists(session.session_key(SID))
+
+
+async def test_unknown_session(redis):
+    assert await RedisDB().rotate_session("missing", USER_ID, "jti-1", "jti-2") == 0
+
+
+@pytest.fixture
+def client(session, redis, monkeypatch):
+    """The application over HTTP, without its startup (database) events"""
+    import src.databases.redis as redis_db
+    import src.utils.ratelimit as ratelimit
+    from fastapi.testclient import TestClient
+    from src.main import app
+
+    monkeypatch.setattr(
+        ratelimit, "SLIDING_WINDOW", redis_db.aclient.register_script(ratelimit.SLIDING_WINDOW.script)
+    )
+    # The refresh reads the claims from the cached profile of the user
+    redis.set(f"profile:{USER_ID}", '{"id": 1, "role_id": 2, "email": "user@example.com"}')
+    return TestClient(app)
+
+
+def refresh(client, token: str):
+    return client.post("/api/v1/auth/refresh", headers={"Authorization": f"Bearer {token}"})
+
+
+async def test_refresh_over_http(client):
+    from src.utils.security import generate_token, verify_token
+
+    token = generate_token({"sub": str(USER_ID), "rid": 2}, refresh=True, session_id=SID, jti="jti-1")
+    response = refresh(client, token)
+    assert response.status_code == 200, response.text
+    assert response.headers["RateLimit-Limit"] == "30"
+
+    rotated = response.json()["data"]["refresh_token"]
+    assert verify_token(rotated)["sid"] == SID
+    assert verify_token(response.json()["data"]["access_token"])["refresh"] is False
+
+    # The presented token was rotated, using it again revokes the family
+    response = refresh(client, token)
+    assert response.status_code == 401
+    assert response.json()["detail"]["error_code"] == "token_reused"
+    assert refresh(client, rotated).status_code == 401
+
+
+async def test_refresh_requires_a_refresh_token(client):
+    from src.utils.security import generate_token
+
+    access = generate_token({"sub": str(USER_ID), "rid": 2}, session_id=SID)
+    assert refresh(client, access).status_code == 403
+
+
+async def test_refresh_fails_open_without_the_rate_limit(client, monkeypatch):
+    import redis
+    import src.utils.ratelimit as ratelimit
+    from src.utils.security import generate_token
+
+    async def unavailable(keys, args):
+        raise redis.ConnectionError("Redis is down")
+
+    monkeypatch.setattr(ratelimit, "SLIDING_WINDOW", unavailable)
+    token = generate_token({"sub": str(USER_ID), "rid": 2}, refresh=True, session_id=SID, jti="jti-1")
+    response = refresh(client, token)
+    assert response.status_code == 200, response.text
+    assert "RateLimit-Limit" not in response.headers